@@ -5,30 +5,74 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
 from flask import Flask
-from database import init_database, add_sample_data
+from database import ensure_schema, initialize_database
+from instrumentation.metrics import register_metrics
+from instrumentation.sql_timing import register_sql_timing
+from instrumentation.query_count import register_query_counting
+from instrumentation.profiling import register_profiling
+from instrumentation.tracing import register_tracing
 from routes import register_blueprints
+from routes.admin import register_admin
+from routes.compression import register_compression
+from routes.json_provider import RecordJSONProvider
+from services.search_log import register_search_log
 
 
-def create_app():
+def create_app(fast_startup: bool = None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        fast_startup: Skip sample data and only verify the schema version with a
+            single query. Defaults to the LIBRARY_FAST_STARTUP environment variable.
+    
     Returns:
         Flask: Configured Flask application instance
     """
+    if fast_startup is None:
+        fast_startup = os.environ.get('LIBRARY_FAST_STARTUP', '0') == '1'
+    
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
-    # Initialize the database
-    init_database()
+    # Serialize book and loan records in jsonify and streamed JSON
+    app.json = RecordJSONProvider(app)
+    
+    if fast_startup:
+        # Only create/migrate the schema if it is out of date
+        ensure_schema()
+    else:
+        # Initialize the database and add sample data for testing and demonstration.
+        # Runs under a file lock so concurrently starting workers don't race.
+        initialize_database()
+    
+    # Record per-endpoint latency, error and database metrics (served at /metrics)
+    register_metrics(app)
+    
+    # Time SQL statements and log slow ones with their query plans (dashboard at /dev/sql)
+    register_sql_timing(app)
     
-    # Add sample data for testing and demonstration
-    add_sample_data()
+    # Count statements per request and flag likely N+1 queries in development
+    register_query_counting(app)
+    
+    # Administrator token, and on-demand request profiling (off unless asked for)
+    register_admin(app)
+    register_profiling(app)
+    
+    # Trace spans across routes, services, SQL and the payment gateway (off unless exported)
+    register_tracing(app)
     
     # Register all route blueprints
     register_blueprints(app)
     
+    # Compress HTML and JSON responses for clients that accept it
+    register_compression(app)
+    
+    # Count searches, and prewarm the search indexes in each worker
+    register_search_log(app)
+    
     return app
 
 
@@ -0,0 +1,166 @@
+"""
+Library Service Benchmark - library_service functions against synthetic catalogs
+
+Builds a synthetic catalog and loan history at each requested scale, times
+the main service functions, writes the results as JSON and optionally
+compares them with a saved baseline.
+
+    python -m benchmarks.bench_library_service --scales 1000 10000 100000
+    python -m benchmarks.bench_library_service --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_library_service --baseline benchmarks/baseline.json --tolerance 0.25
+
+The comparison fails (exit status 1) when any operation's median time is
+more than `tolerance` slower than the baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+import database
+from services.library_service import (
+    borrow_book_by_patron, get_patron_status_report, return_book_by_patron,
+    search_books_in_catalog
+)
+from services.catalog_snapshot import get_all_books
+from tools.datagen import generate_library
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+def build_dataset(path: str, books: int, seed: int = 0) -> List[str]:
+    """
+    Create a database with `books` books, about two loans per book (a tenth
+    still open) and books/10 patrons. Returns the patron IDs.
+    """
+    database.DATABASE = path
+    summary = generate_library(path, books=books, patrons=max(books // 10, 10), loans=books * 2,
+                               open_ratio=0.1, seed=seed)
+    return summary['patrons']
+
+def time_operation(operation: Callable[[], object], repeat: int) -> Dict:
+    """Run operation `repeat` times and summarize the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'median': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'min': timings[0],
+        'runs': repeat,
+    }
+
+def run_scale(books: int, repeat: int, seed: int) -> Dict[str, Dict]:
+    """Benchmark every operation against a fresh dataset of the given size."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        patrons = build_dataset(os.path.join(workdir, 'library.db'), books, seed)
+        conn = sqlite3.connect(database.DATABASE)
+        isbns = [row[0] for row in conn.execute('SELECT isbn FROM books ORDER BY RANDOM() LIMIT 100')]
+        conn.close()
+        # Fewer repeats for whole-catalog operations on large catalogs
+        scan_repeat = max(3, min(repeat, 1000000 // books))
+
+        def borrow_random():
+            """Borrow a random book for a new patron; the loan, or None if refused."""
+            patron_id = f'{900000 + rng.randint(0, 99999):06d}'
+            book_id = rng.randint(1, books)
+            success, _ = borrow_book_by_patron(patron_id, book_id)
+            return (patron_id, book_id) if success else None
+
+        # Loans made by the borrow benchmark, returned by the return benchmark
+        pending = []
+
+        def borrow():
+            loan = borrow_random()
+            if loan is not None:
+                pending.append(loan)
+
+        def return_book():
+            loan = pending.pop() if pending else None
+            while loan is None:
+                loan = borrow_random()
+            return_book_by_patron(*loan)
+
+        operations = {
+            'get_all_books': (lambda: list(get_all_books()), scan_repeat),
+            'search_books_in_catalog[title]': (lambda: search_books_in_catalog('river', 'title'), scan_repeat),
+            'search_books_in_catalog[author]': (lambda: search_books_in_catalog('chen', 'author'), scan_repeat),
+            'search_books_in_catalog[isbn]': (
+                lambda: search_books_in_catalog(rng.choice(isbns), 'isbn'), scan_repeat),
+            'borrow_book_by_patron': (borrow, repeat),
+            'return_book_by_patron': (return_book, repeat),
+            'get_patron_status_report': (lambda: get_patron_status_report(rng.choice(patrons)), repeat),
+        }
+        return {name: time_operation(operation, count) for name, (operation, count) in operations.items()}
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of more than `tolerance` (fractional) in median time versus the baseline."""
+    regressions = []
+    for scale, operations in results['results'].items():
+        for name, timing in operations.items():
+            base = baseline.get('results', {}).get(scale, {}).get(name)
+            if base is None:
+                continue
+            ratio = timing['median'] / base['median'] if base['median'] else float('inf')
+            if ratio > 1 + tolerance:
+                regressions.append(f'{name} @ {scale} books: {base["median"] * 1000:.3f} ms -> '
+                                   f'{timing["median"] * 1000:.3f} ms ({ratio:.2f}x)')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help='catalog sizes to benchmark (e.g. 1000 10000 100000 1000000)')
+    parser.add_argument('--repeat', type=int, default=50, help='runs per operation')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for data and operations')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the results')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs. baseline (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', help='also write the results to this baseline file')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+    for books in args.scales:
+        print(f'--- {books} books ---')
+        timings = run_scale(books, args.repeat, args.seed)
+        results['results'][str(books)] = timings
+        for name, timing in timings.items():
+            print(f'  {name:<34} median {timing["median"] * 1000:10.3f} ms   p95 {timing["p95"] * 1000:10.3f} ms')
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('\nRegressions:')
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print(f'\nNo regressions beyond {args.tolerance:.0%} of the baseline.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Records Benchmark - memory and build time of book/loan records versus dicts
+
+Loads every book (and every open loan) of a synthetic database both the old
+way, as dicts with parsed datetimes, and as BookRecord/LoanRecord, and reports
+the memory held by each result list (tracemalloc) and the time to build it.
+
+    python -m benchmarks.bench_records --books 100000 --loans 200000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, List, Tuple
+from records import BOOK_COLUMNS, LOAN_COLUMNS, BookRecord, LoanRecord
+from tools.datagen import generate_library
+
+def measure(build: Callable[[], List]) -> Tuple[int, float]:
+    """Bytes still allocated by build()'s result, and seconds it took."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size, seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--loans', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'library.db')
+        generate_library(path, books=args.books, patrons=max(args.books // 10, 10), loans=args.loans,
+                         open_ratio=0.3)
+        conn = sqlite3.connect(path)
+        books_sql = f'SELECT {BOOK_COLUMNS} FROM books'
+        loans_sql = f'''
+            SELECT {LOAN_COLUMNS} FROM borrow_records br JOIN books b ON br.book_id = b.id
+            WHERE br.return_date IS NULL
+        '''
+
+        def book_dicts():
+            return [dict(zip(BookRecord.fields, row)) for row in conn.execute(books_sql)]
+
+        def book_records():
+            return [BookRecord(row) for row in conn.execute(books_sql)]
+
+        def loan_dicts():
+            now = datetime.now()
+            return [{'book_id': book_id, 'title': title, 'author': author,
+                     'borrow_date': datetime.fromisoformat(borrowed), 'due_date': datetime.fromisoformat(due),
+                     'is_overdue': now > datetime.fromisoformat(due)}
+                    for book_id, title, author, borrowed, due in conn.execute(loans_sql)]
+
+        def loan_records():
+            return [LoanRecord(row) for row in conn.execute(loans_sql)]
+
+        # Everything the result keeps alive is counted: row values, tuples and wrappers
+        print(f"{'':<22} {'rows':>8} {'memory MB':>10} {'bytes/row':>10} {'build ms':>10}")
+        for name, build in (('books as dicts', book_dicts), ('books as records', book_records),
+                            ('loans as dicts', loan_dicts), ('loans as records', loan_records)):
+            rows = len(build())
+            size, seconds = measure(build)
+            print(f'{name:<22} {rows:>8} {size / 2 ** 20:>10.1f} {size / max(rows, 1):>10.0f} {seconds * 1000:>10.1f}')
+        conn.close()
+
+if __name__ == '__main__':
+    main()
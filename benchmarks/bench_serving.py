@@ -0,0 +1,105 @@
+"""
+Serving Benchmark - throughput of the development server vs. gunicorn
+
+Starts each server against a fresh database in a temporary directory, drives
+it with concurrent HTTP clients for a fixed time and reports requests per
+second and mean latency.
+
+    python -m benchmarks.bench_serving --clients 16 --duration 10
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_until_up(url: str, timeout: float = 20.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not start")
+
+def _dev_server(port: int, args):
+    return [sys.executable, '-c',
+            f"from app import create_app; create_app().run(host='127.0.0.1', port={port}, threaded=True)"]
+
+def _gunicorn(port: int, args):
+    return [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+            '--threads', str(args.threads), '--access-logfile', '/dev/null', 'wsgi:app']
+
+# Servers under test, as functions building their command line
+SERVERS = {'dev server': _dev_server, 'gunicorn': _gunicorn}
+
+def drive(url: str, clients: int, duration: float):
+    """Hit url from `clients` threads for `duration` seconds; return (requests, errors, latencies)."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def worker():
+        local = []
+        failed = 0
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(url, timeout=10).read()
+                local.append(time.perf_counter() - start)
+            except OSError:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return len(latencies), errors[0], latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to drive each server')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--path', default='/catalog', help='URL path to request')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    print(f"{'server':<12} {'req/s':>10} {'mean ms':>10} {'errors':>8}")
+    for name, build_command in SERVERS.items():
+        port = _free_port()
+        with tempfile.TemporaryDirectory() as workdir:
+            server = subprocess.Popen(build_command(port, args), cwd=workdir, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                url = f'http://127.0.0.1:{port}{args.path}'
+                _wait_until_up(url)
+                count, errors, latencies = drive(url, args.clients, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+        mean_ms = 1000 * sum(latencies) / len(latencies) if latencies else float('nan')
+        print(f"{name:<12} {count / args.duration:>10.1f} {mean_ms:>10.2f} {errors:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Startup Benchmark - import time and create_app() time in fresh interpreters
+
+Each measurement runs in a new Python process, so module caches are cold the
+way they are for a newly started worker. Reports the median over several runs
+for importing `app`, a full create_app() (schema + sample data) and a fast
+create_app(fast_startup=True) against an already initialized database.
+
+    python -m benchmarks.bench_startup --runs 7 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Snippets timed in a fresh interpreter; each prints elapsed seconds
+SCENARIOS = {
+    'import app': (
+        "import time; t = time.perf_counter(); import app; "
+        "print(time.perf_counter() - t)"
+    ),
+    'create_app (full)': (
+        "import app, time; t = time.perf_counter(); app.create_app(fast_startup=False); "
+        "print(time.perf_counter() - t)"
+    ),
+    'create_app (fast)': (
+        "import app, time; t = time.perf_counter(); app.create_app(fast_startup=True); "
+        "print(time.perf_counter() - t)"
+    ),
+}
+
+def _run(code: str, workdir: str, env: dict) -> float:
+    output = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+def slowest_imports(workdir: str, env: dict, top: int = 10):
+    """Modules with the largest cumulative import time, from python -X importtime."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir,
+                            env=env, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5, help='interpreter launches per scenario')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Initialize once so the fast path sees a current schema
+        _run(SCENARIOS['create_app (full)'], workdir, env)
+        for name, code in SCENARIOS.items():
+            timings = [_run(code, workdir, env) for _ in range(args.runs)]
+            results[name] = {'median_ms': 1000 * statistics.median(timings),
+                             'min_ms': 1000 * min(timings)}
+            print(f"{name:<20} median {results[name]['median_ms']:8.2f} ms   min {results[name]['min_ms']:8.2f} ms")
+
+        print("\nSlowest imports (cumulative):")
+        for cumulative_us, name in slowest_imports(workdir, env):
+            print(f"  {cumulative_us / 1000:8.2f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
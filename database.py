@@ -3,23 +3,104 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import os
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from records import BOOK_COLUMNS, LOAN_COLUMNS, BookRecord, LoanRecord
 
 # Database configuration
 DATABASE = 'library.db'
 
-def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+# Version of the schema created by init_database, stored in PRAGMA user_version.
+# Bump it whenever init_database changes so existing databases get migrated.
+SCHEMA_VERSION = 6
+
+# Callbacks notified with the IDs of books changed by a committed write
+_book_change_listeners = []
+
+# Catalog version that the current write transaction will commit as; used to
+# stamp books.row_version in the same statement that changes the row
+_NEXT_VERSION = '(SELECT version + 1 FROM catalog_version WHERE id = 1)'
+
+# Callbacks notified of every executed statement as
+# (sql, parameters, seconds, connection)
+_statement_listeners = []
+
+def add_statement_listener(callback) -> None:
+    """
+    Register a callback called after every SQL statement with the statement,
+    its parameters, the seconds spent executing it and the connection it ran
+    on. For queries the time is to produce the first row, which includes any
+    sorting or aggregation.
+    """
+    _statement_listeners.append(callback)
+
+def remove_statement_listener(callback) -> None:
+    """Unregister a callback added with add_statement_listener."""
+    _statement_listeners.remove(callback)
+
+class _TimedCursor(sqlite3.Cursor):
+    """Cursor that reports statements to the statement listeners."""
+
+    def execute(self, sql, parameters=()):
+        if not _statement_listeners:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            for callback in _statement_listeners:
+                callback(sql, parameters, elapsed, self.connection)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _statement_listeners:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            for callback in _statement_listeners:
+                callback(sql, None, elapsed, self.connection)
+
+class _TimedConnection(sqlite3.Connection):
+    """Connection whose execute shortcuts go through _TimedCursor."""
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def get_db_connection(path: Optional[str] = None):
+    """Get a database connection (to DATABASE unless another path is given)."""
+    conn = sqlite3.connect(path or DATABASE, factory=_TimedConnection)
     conn.row_factory = sqlite3.Row  # This enables column access by name
     return conn
 
+def _execute_plain(conn, sql: str, parameters=()):
+    """Execute on a cursor returning plain tuples, for building records."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(sql, parameters)
+
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
     
+    # Write-ahead logging lets readers in other worker processes run while a
+    # write is in progress; the setting is stored in the database file
+    conn.execute('PRAGMA journal_mode=WAL')
+    
     # Create books table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS books (
@@ -28,10 +109,28 @@ def init_database():
             author TEXT NOT NULL,
             isbn TEXT UNIQUE NOT NULL,
             total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
+            available_copies INTEGER NOT NULL,
+            row_version INTEGER NOT NULL DEFAULT 0,
+            reserved_copies INTEGER NOT NULL DEFAULT 0
         )
     ''')
     
+    # Databases created before row versioning or holds need the columns added
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(books)')]
+    if 'row_version' not in columns:
+        conn.execute('ALTER TABLE books ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0')
+    if 'reserved_copies' not in columns:
+        conn.execute('ALTER TABLE books ADD COLUMN reserved_copies INTEGER NOT NULL DEFAULT 0')
+    
+    # Finds the books changed since a given catalog version
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_row_version ON books (row_version)')
+    
+    # Sort orders and filters of search_books: rows come out of an index already
+    # ordered, so a LIMIT stops reading early instead of sorting every match
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_title ON books (title, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_author ON books (author, title, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_available ON books (available_copies, title, id)')
+    
     # Create borrow_records table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS borrow_records (
@@ -45,9 +144,123 @@ def init_database():
         )
     ''')
     
+    # Open loans by patron, for borrowing limits and hold assignment
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open
+        ON borrow_records (patron_id, book_id) WHERE return_date IS NULL
+    ''')
+    
+    # Create holds table: patrons waiting for a copy, served first come first served
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            placed_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'waiting',
+            closed_at TEXT,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    # Each book's queue in order (the next hold is one index seek), and at most
+    # one waiting hold per patron and book
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_holds_queue ON holds (book_id, id) WHERE status = 'waiting'
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_patron
+        ON holds (patron_id, book_id) WHERE status = 'waiting'
+    ''')
+    # A patron who borrows a book they were waiting for leaves its queue,
+    # whichever way the loan was made
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS close_hold_on_borrow AFTER INSERT ON borrow_records
+        BEGIN
+            UPDATE holds SET status = 'fulfilled', closed_at = NEW.borrow_date
+            WHERE patron_id = NEW.patron_id AND book_id = NEW.book_id AND status = 'waiting';
+        END
+    ''')
+    
+    # Create catalog_version table: a single row bumped by every write to books,
+    # used to answer conditional requests without querying the catalog
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO catalog_version (id, version, updated_at) VALUES (1, 0, ?)
+    ''', (datetime.now(timezone.utc).isoformat(),))
+    
+    # Create search_queries table: how often each normalized search was run
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_queries (
+            search_type TEXT NOT NULL,
+            query TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            last_searched TEXT NOT NULL,
+            PRIMARY KEY (search_type, query)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_search_queries_count ON search_queries (count)')
+    
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
     conn.close()
 
+@contextmanager
+def _init_lock():
+    """
+    Hold an exclusive lock on a file next to the database while initializing,
+    so concurrently starting worker processes run the schema setup one at a time.
+    """
+    with open(DATABASE + '.init.lock', 'a+b') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def schema_is_current() -> bool:
+    """Check with a single query whether the database already has the current schema."""
+    conn = get_db_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    conn.close()
+    return version == SCHEMA_VERSION
+
+def ensure_schema():
+    """
+    Create or migrate the schema only if the database is not already current.
+    Used for fast startup: an up-to-date database costs one PRAGMA query.
+    """
+    if schema_is_current():
+        return
+    with _init_lock():
+        init_database()
+
+def initialize_database(sample_data: bool = True):
+    """
+    Create the schema (and optionally the sample data) under an exclusive file
+    lock. Safe to call from every worker process at startup: the first one to
+    get the lock does the work and the rest find it already done.
+    """
+    with _init_lock():
+        init_database()
+        if sample_data:
+            add_sample_data()
+
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
@@ -62,9 +275,9 @@ def add_sample_data():
         ]
         
         for title, author, isbn, copies in sample_books:
-            conn.execute('''
-                INSERT INTO books (title, author, isbn, total_copies, available_copies)
-                VALUES (?, ?, ?, ?, ?)
+            conn.execute(f'''
+                INSERT INTO books (title, author, isbn, total_copies, available_copies, row_version)
+                VALUES (?, ?, ?, ?, ?, {_NEXT_VERSION})
             ''', (title, author, isbn, copies, copies))
         
         # Make 1984 unavailable by adding a borrow record
@@ -76,40 +289,320 @@ def add_sample_data():
               (datetime.now() + timedelta(days=9)).isoformat()))
         
         # Update available copies for 1984
-        conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
+        conn.execute(f'UPDATE books SET available_copies = 0, row_version = {_NEXT_VERSION} WHERE id = 3')
         
+        _bump_catalog_version(conn)
         conn.commit()
     
     conn.close()
+    if book_count == 0:
+        _notify_book_changed([1, 2, 3])
+
+def _bump_catalog_version(conn) -> None:
+    """
+    Record a change to the books table. Must run in the writer's transaction,
+    after the changed rows were stamped with _NEXT_VERSION.
+    """
+    conn.execute('''
+        UPDATE catalog_version SET version = version + 1, updated_at = ? WHERE id = 1
+    ''', (datetime.now(timezone.utc).isoformat(),))
+
+def add_book_change_listener(callback) -> None:
+    """
+    Register a callback called with a list of book IDs after a write to those
+    books commits. Only writes made by this process are reported; readers that
+    must see other processes' writes should compare row versions instead.
+    """
+    _book_change_listeners.append(callback)
+
+def _notify_book_changed(book_ids: List[int]) -> None:
+    """Tell registered listeners that the given books changed."""
+    for callback in _book_change_listeners:
+        callback(book_ids)
+
+class CatalogWatcher:
+    """
+    Notices committed changes to the books table, from this or any other
+    process, through PRAGMA data_version on a connection kept open for the
+    purpose; the catalog version is only read when data_version moves.
+    Not thread-safe: owners call it under their own lock.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._data_version = None
+        # (path, pid) being watched, and the catalog version seen at the last poll
+        self.database = None
+        self.version = None
+
+    def poll(self) -> bool:
+        """
+        True if the catalog version moved since the last poll, or the watched
+        database changed (new path or forked process); `version` then holds
+        the new catalog version. Raises sqlite3.Error.
+        """
+        key = (DATABASE, os.getpid())
+        if key != self.database:
+            self.close()
+            self._conn = sqlite3.connect(DATABASE, check_same_thread=False, isolation_level=None)
+            self.database = key
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+        version = self._conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()[0]
+        if version == self.version:
+            return False
+        self.version = version
+        return True
+
+    def changed_book_ids(self, since_version: int) -> List[int]:
+        """IDs of the books written after the given catalog version."""
+        rows = self._conn.execute('SELECT id FROM books WHERE row_version > ?', (since_version,)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = self._data_version = self.database = self.version = None
+
+# Default number of book records kept by the read-through cache; 0 disables it
+BOOK_CACHE_SIZE = 10000
+
+class _BookCache:
+    """
+    Read-through LRU cache of book records for get_book_by_id/get_book_by_isbn.
+
+    Writes made by this process invalidate entries through the book change
+    listener. Writes from other processes are noticed by a CatalogWatcher:
+    when the catalog version has changed, the books whose row_version is
+    newer than the last version seen are dropped.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._isbn_ids = {}
+        self._lock = threading.Lock()
+        self._watcher = CatalogWatcher()
+        # (database, catalog version) the entries are known to be current for
+        self._synced = None
+        # Bumped by every invalidation, so a lookup that raced with a write does not store its stale row
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self) -> None:
+        """Drop entries changed by other connections since the last check. Call with the lock held."""
+        try:
+            if not self._watcher.poll():
+                return
+            if self._synced is None or self._synced[0] != self._watcher.database:
+                self._drop_all()
+            else:
+                self._drop(self._watcher.changed_book_ids(self._synced[1]))
+            self._synced = (self._watcher.database, self._watcher.version)
+        except sqlite3.Error:
+            self._watcher.close()
+            self._synced = None
+            self._drop_all()
+
+    def _drop(self, book_ids: List[int]) -> None:
+        self._generation += 1
+        for book_id in book_ids:
+            book = self._entries.pop(book_id, None)
+            if book is not None:
+                self._isbn_ids.pop(book['isbn'], None)
+
+    def _drop_all(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self._isbn_ids.clear()
+
+    def lookup(self, column: str, value, query) -> Optional[BookRecord]:
+        """Return the book whose column ('id' or 'isbn') equals value, querying on a miss."""
+        if BOOK_CACHE_SIZE <= 0:
+            return query()
+        with self._lock:
+            self._sync()
+            book_id = value if column == 'id' else self._isbn_ids.get(value)
+            book = self._entries.get(book_id)
+            if book is not None:
+                self._entries.move_to_end(book_id)
+                self.hits += 1
+                return book
+            self.misses += 1
+            generation = self._generation
+
+        book = query()
+        if book is None:
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._entries[book['id']] = book
+                self._isbn_ids[book['isbn']] = book['id']
+                while len(self._entries) > BOOK_CACHE_SIZE:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._isbn_ids.pop(evicted['isbn'], None)
+        return book
+
+    def invalidate(self, book_ids: List[int]) -> None:
+        """Book change listener: forget the given books."""
+        with self._lock:
+            self._drop(book_ids)
+
+    def clear(self) -> None:
+        """Forget every cached book and close the watcher connection."""
+        with self._lock:
+            self._drop_all()
+            self._watcher.close()
+            self._synced = None
+
+_book_cache = _BookCache()
+add_book_change_listener(_book_cache.invalidate)
+
+def clear_book_cache() -> None:
+    """Empty this process's book cache (e.g. before removing the database file)."""
+    _book_cache.clear()
 
 # Helper Functions for Database Operations
 
-def get_all_books() -> List[Dict]:
+def get_catalog_version() -> Tuple[int, datetime]:
+    """Get the current catalog version and the (UTC) time it last changed."""
+    conn = get_db_connection()
+    row = conn.execute('SELECT version, updated_at FROM catalog_version WHERE id = 1').fetchone()
+    conn.close()
+    return row['version'], datetime.fromisoformat(row['updated_at'])
+
+def get_all_books() -> List[BookRecord]:
     """Get all books from the database."""
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    books = _execute_plain(conn, f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title').fetchall()
     conn.close()
-    return [dict(book) for book in books]
+    return [BookRecord(book) for book in books]
+
+# Sort orders of search_books, as ORDER BY clauses
+BOOK_SORTS = {
+    'title': 'title, id',
+    'author': 'author, title, id',
+    'available': 'available_copies DESC, title, id',
+    'newest': 'id DESC',
+}
+
+def _text_condition(column: str, text: str) -> Tuple[str, str]:
+    """
+    Condition and parameter matching `text` case-insensitively anywhere in
+    `column`, the way str.lower() does for the snapshot search. LIKE only
+    folds ASCII letters, so other text is lowered by Python (py_lower).
+    """
+    if text.isascii():
+        return f"{column} LIKE ? ESCAPE '\\'", _like_pattern(text)
+    return f'instr(py_lower({column}), ?) > 0', text.lower()
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
-    """Get a specific book by ID."""
+def register_sql_functions(conn) -> None:
+    """Add the SQL functions used by _book_search_query to a connection."""
+    conn.create_function('py_lower', 1, str.lower, deterministic=True)
+
+def _search_connection():
+    """Connection with the SQL functions used by _book_search_query."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    register_sql_functions(conn)
+    return conn
+
+def _like_pattern(text: str) -> str:
+    """LIKE pattern matching `text` anywhere, with wildcards in it escaped."""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def _book_search_query(title: Optional[str] = None, author: Optional[str] = None,
+                       isbn: Optional[str] = None, available: Optional[bool] = None,
+                       min_copies: Optional[int] = None, max_copies: Optional[int] = None,
+                       sort: str = 'title', limit: Optional[int] = None,
+                       offset: int = 0) -> Tuple[str, Tuple]:
+    """Compile search criteria into one parameterized SELECT."""
+    conditions = []
+    parameters = []
+    for column, text in (('title', title), ('author', author)):
+        if text is not None:
+            condition, parameter = _text_condition(column, text)
+            conditions.append(condition)
+            parameters.append(parameter)
+    if isbn is not None:
+        conditions.append('isbn = ?')
+        parameters.append(isbn)
+    if available is not None:
+        conditions.append('available_copies > 0' if available else 'available_copies <= 0')
+    if min_copies is not None:
+        conditions.append('total_copies >= ?')
+        parameters.append(min_copies)
+    if max_copies is not None:
+        conditions.append('total_copies <= ?')
+        parameters.append(max_copies)
+    sql = f'SELECT {BOOK_COLUMNS} FROM books'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += f' ORDER BY {BOOK_SORTS[sort]}'
+    if limit is not None or offset:
+        sql += ' LIMIT ? OFFSET ?'
+        parameters.extend((-1 if limit is None else limit, offset))
+    return sql, tuple(parameters)
+
+def iter_search_books(batch_size: int = 500, **criteria) -> Iterator[BookRecord]:
+    """
+    Yield the books matching all given criteria (see search_books), fetching
+    rows from the cursor in batches so memory use does not grow with the
+    number of matches.
+    """
+    sql, parameters = _book_search_query(**criteria)
+    conn = _search_connection()
+    try:
+        cursor = _execute_plain(conn, sql, parameters)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield BookRecord(row)
+    finally:
+        conn.close()
+
+def search_books(title: Optional[str] = None, author: Optional[str] = None,
+                 isbn: Optional[str] = None, available: Optional[bool] = None,
+                 min_copies: Optional[int] = None, max_copies: Optional[int] = None,
+                 sort: str = 'title', limit: Optional[int] = None, offset: int = 0) -> List[BookRecord]:
+    """
+    Get the books matching all given criteria in a single query.
+
+    title and author match case-insensitively anywhere in the text, as the
+    snapshot search does, isbn exactly. available selects
+    books with or without a free copy; min_copies and max_copies bound
+    total_copies. sort is a key of BOOK_SORTS.
+    """
+    sql, parameters = _book_search_query(title, author, isbn, available, min_copies,
+                                         max_copies, sort, limit, offset)
+    conn = _search_connection()
+    books = _execute_plain(conn, sql, parameters).fetchall()
     conn.close()
-    return dict(book) if book else None
+    return [BookRecord(book) for book in books]
 
-def get_book_by_isbn(isbn: str) -> Optional[Dict]:
-    """Get a specific book by ISBN."""
+def _query_book(column: str, value) -> Optional[BookRecord]:
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    book = _execute_plain(conn, f'SELECT {BOOK_COLUMNS} FROM books WHERE {column} = ?', (value,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    return BookRecord(book) if book else None
+
+def get_book_by_id(book_id: int) -> Optional[BookRecord]:
+    """Get a specific book by ID (served from the book cache when possible)."""
+    return _book_cache.lookup('id', book_id, lambda: _query_book('id', book_id))
+
+def get_book_by_isbn(isbn: str) -> Optional[BookRecord]:
+    """Get a specific book by ISBN (served from the book cache when possible)."""
+    return _book_cache.lookup('isbn', isbn, lambda: _query_book('isbn', isbn))
 
-def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
+def get_patron_borrowed_books(patron_id: str) -> List[LoanRecord]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+    records = _execute_plain(conn, f'''
+        SELECT {LOAN_COLUMNS}
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
@@ -117,18 +610,7 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     ''', (patron_id,)).fetchall()
     conn.close()
     
-    borrowed_books = []
-    for record in records:
-        borrowed_books.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
-        })
-    
-    return borrowed_books
+    return [LoanRecord(record) for record in records]
 
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
@@ -144,17 +626,43 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
     """Insert a new book into the database."""
     conn = get_db_connection()
     try:
-        conn.execute('''
-            INSERT INTO books (title, author, isbn, total_copies, available_copies)
-            VALUES (?, ?, ?, ?, ?)
+        cursor = conn.execute(f'''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies, row_version)
+            VALUES (?, ?, ?, ?, ?, {_NEXT_VERSION})
         ''', (title, author, isbn, total_copies, available_copies))
+        _bump_catalog_version(conn)
         conn.commit()
         conn.close()
+        _notify_book_changed([cursor.lastrowid])
         return True
     except Exception as e:
         conn.close()
         return False
 
+def insert_books(books: Iterable[Tuple[str, str, str, int, int]], path: Optional[str] = None) -> List[int]:
+    """
+    Insert many books in one transaction, stamped with the next catalog
+    version like insert_book. `books` holds (title, author, isbn,
+    total_copies, available_copies) tuples.
+
+    Returns:
+        list: IDs of the inserted books, in the order given
+    """
+    conn = get_db_connection(path)
+    try:
+        conn.executemany(f'''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies, row_version)
+            VALUES (?, ?, ?, ?, ?, {_NEXT_VERSION})
+        ''', books)
+        book_ids = [row[0] for row in _execute_plain(
+            conn, f'SELECT id FROM books WHERE row_version = {_NEXT_VERSION} ORDER BY id')]
+        _bump_catalog_version(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    _notify_book_changed(book_ids)
+    return book_ids
+
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
     conn = get_db_connection()
@@ -174,11 +682,14 @@ def update_book_availability(book_id: int, change: int) -> bool:
     """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
     conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
+        conn.execute(f'''
+            UPDATE books SET available_copies = available_copies + ?, row_version = {_NEXT_VERSION}
+            WHERE id = ?
         ''', (change, book_id))
+        _bump_catalog_version(conn)
         conn.commit()
         conn.close()
+        _notify_book_changed([book_id])
         return True
     except Exception as e:
         conn.close()
@@ -199,3 +710,371 @@ def update_borrow_record_return_date(patron_id: str, book_id: int, return_date:
     except Exception as e:
         conn.close()
         return False
+
+def get_books_by_ids(book_ids: List[int]) -> Dict[int, BookRecord]:
+    """Get several books by ID in a single query, keyed by book ID."""
+    if not book_ids:
+        return {}
+    conn = get_db_connection()
+    placeholders = ', '.join('?' for _ in book_ids)
+    books = _execute_plain(
+        conn, f'SELECT {BOOK_COLUMNS} FROM books WHERE id IN ({placeholders})', tuple(book_ids)
+    ).fetchall()
+    conn.close()
+    return {book[0]: BookRecord(book) for book in books}
+
+def record_search_queries(counts: Dict[Tuple[str, str], int], searched_at: datetime,
+                          path: Optional[str] = None) -> bool:
+    """
+    Add {(search_type, query): count} to the search query counters in one
+    transaction, in DATABASE or the database at `path`.
+    """
+    conn = get_db_connection(path)
+    try:
+        conn.executemany('''
+            INSERT INTO search_queries (search_type, query, count, last_searched) VALUES (?, ?, ?, ?)
+            ON CONFLICT (search_type, query) DO UPDATE
+            SET count = count + excluded.count, last_searched = excluded.last_searched
+        ''', [(search_type, query, count, searched_at.isoformat())
+              for (search_type, query), count in counts.items()])
+        conn.commit()
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+def get_top_search_queries(limit: int = 20, search_type: Optional[str] = None) -> List[Dict]:
+    """Get the most frequently run searches, optionally of one type only."""
+    conn = get_db_connection()
+    sql = 'SELECT search_type, query, count, last_searched FROM search_queries'
+    parameters = ()
+    if search_type is not None:
+        sql += ' WHERE search_type = ?'
+        parameters = (search_type,)
+    rows = conn.execute(sql + ' ORDER BY count DESC, query LIMIT ?', parameters + (limit,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+# Values bound per IN (...) query; stays well below SQLite's limit on
+# parameters per statement (999 before SQLite 3.32)
+IN_QUERY_CHUNK_SIZE = 500
+
+def get_books_by_isbns(isbns: List[str]) -> Dict[str, BookRecord]:
+    """
+    Get the books with the given ISBNs, keyed by ISBN, using one
+    IN (...) query per IN_QUERY_CHUNK_SIZE ISBNs on a single connection.
+    """
+    isbns = list(dict.fromkeys(isbns))
+    if not isbns:
+        return {}
+    books = {}
+    conn = get_db_connection()
+    try:
+        for start in range(0, len(isbns), IN_QUERY_CHUNK_SIZE):
+            chunk = isbns[start:start + IN_QUERY_CHUNK_SIZE]
+            placeholders = ', '.join('?' for _ in chunk)
+            for book in _execute_plain(
+                    conn, f'SELECT {BOOK_COLUMNS} FROM books WHERE isbn IN ({placeholders})', tuple(chunk)):
+                books[book[3]] = BookRecord(book)
+    finally:
+        conn.close()
+    return books
+
+def borrow_books_batch(patron_id: str, book_ids: List[int], borrow_date: datetime, due_date: datetime,
+                       max_borrowed: int) -> Optional[Dict[str, List[int]]]:
+    """
+    Borrow several books for a patron in a single transaction.
+
+    The write lock is taken before the patron's open loans are counted, so
+    concurrent requests for the same patron cannot both pass max_borrowed.
+    A copy is only taken if one is still available when the transaction
+    runs, so books that were checked out in the meantime are skipped.
+
+    Returns:
+        dict: 'borrowed' (IDs of the books that were borrowed) and
+        'over_limit' (IDs skipped because the patron reached max_borrowed),
+        or None if the transaction failed and was rolled back
+    """
+    conn = get_db_connection()
+    borrowed = []
+    over_limit = []
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        open_loans = conn.execute('''
+            SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL
+        ''', (patron_id,)).fetchone()[0]
+        for book_id in book_ids:
+            if open_loans + len(borrowed) >= max_borrowed:
+                over_limit.append(book_id)
+                continue
+            cursor = conn.execute(f'''
+                UPDATE books SET available_copies = available_copies - 1, row_version = {_NEXT_VERSION}
+                WHERE id = ? AND available_copies > 0
+            ''', (book_id,))
+            if cursor.rowcount == 0:
+                continue
+            conn.execute('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+            borrowed.append(book_id)
+        if borrowed:
+            _bump_catalog_version(conn)
+        conn.commit()
+        conn.close()
+        if borrowed:
+            _notify_book_changed(borrowed)
+        return {'borrowed': borrowed, 'over_limit': over_limit}
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return None
+
+# The oldest waiting hold on a book whose patron does not have it already and
+# is below a borrowing limit; parameters (book_id, limit)
+_NEXT_HOLD = '''
+    SELECT h.id, h.patron_id FROM holds h
+    WHERE h.book_id = ? AND h.status = 'waiting'
+      AND NOT EXISTS (SELECT 1 FROM borrow_records r
+                      WHERE r.patron_id = h.patron_id AND r.book_id = h.book_id AND r.return_date IS NULL)
+      AND (SELECT COUNT(*) FROM borrow_records r
+           WHERE r.patron_id = h.patron_id AND r.return_date IS NULL) < ?
+    ORDER BY h.id LIMIT 1
+'''
+
+# Books with copies reserved for a patron's waiting holds, in queue order;
+# parameters (patron_id,)
+_RESERVED_FOR_PATRON = '''
+    SELECT h.book_id FROM holds h JOIN books b ON b.id = h.book_id
+    WHERE h.patron_id = ? AND h.status = 'waiting' AND b.reserved_copies > 0
+    ORDER BY h.id
+'''
+
+def _lend_to_hold(conn, hold, book_id: int, now: datetime, hold_due_date: datetime) -> None:
+    """Fulfil a hold by lending the book to its patron, in the caller's transaction."""
+    conn.execute("UPDATE holds SET status = 'fulfilled', closed_at = ? WHERE id = ?",
+                 (now.isoformat(), hold['id']))
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES (?, ?, ?, ?)
+    ''', (hold['patron_id'], book_id, now.isoformat(), hold_due_date.isoformat()))
+
+def _release_copy(conn, book_id: int, now: datetime, hold_due_date: datetime,
+                  max_borrowed: int) -> Tuple[Optional[str], bool]:
+    """
+    Hand a returned copy to the next eligible hold, lending it to that patron.
+    If patrons are waiting but all of them are at max_borrowed, the copy is
+    reserved for the queue (books.reserved_copies) instead of shelved, so a
+    walk-in cannot take it; _serve_reserved_copies lends it later. Only with
+    nobody waiting does it go back on the shelf. Runs in the caller's
+    transaction.
+
+    Returns:
+        tuple: (patron the copy was lent to or None, whether it was shelved)
+    """
+    cursor = conn.execute(f'''
+        UPDATE books SET available_copies = available_copies + 1, row_version = {_NEXT_VERSION}
+        WHERE id = ? AND NOT EXISTS (SELECT 1 FROM holds WHERE book_id = ? AND status = 'waiting')
+    ''', (book_id, book_id))
+    if cursor.rowcount:
+        return None, True
+    hold = conn.execute(_NEXT_HOLD, (book_id, max_borrowed)).fetchone()
+    if hold is None:
+        conn.execute('UPDATE books SET reserved_copies = reserved_copies + 1 WHERE id = ?', (book_id,))
+        return None, False
+    _lend_to_hold(conn, hold, book_id, now, hold_due_date)
+    return hold['patron_id'], False
+
+def _serve_reserved_copies(conn, book_ids: Iterable[int], now: datetime, hold_due_date: datetime,
+                           max_borrowed: int) -> List[int]:
+    """
+    Lend the copies reserved for these books' queues to the oldest holds whose
+    patrons can borrow again, and shelve them once nobody is waiting. Runs in
+    the caller's transaction. Returns the IDs of the books a copy was shelved for.
+    """
+    shelved = []
+    for book_id in book_ids:
+        reserved = conn.execute('SELECT reserved_copies FROM books WHERE id = ?', (book_id,)).fetchone()[0]
+        for _ in range(reserved):
+            hold = conn.execute(_NEXT_HOLD, (book_id, max_borrowed)).fetchone()
+            if hold is not None:
+                conn.execute('UPDATE books SET reserved_copies = reserved_copies - 1 WHERE id = ?', (book_id,))
+                _lend_to_hold(conn, hold, book_id, now, hold_due_date)
+                continue
+            cursor = conn.execute(f'''
+                UPDATE books SET available_copies = available_copies + 1, reserved_copies = reserved_copies - 1,
+                                 row_version = {_NEXT_VERSION}
+                WHERE id = ? AND NOT EXISTS (SELECT 1 FROM holds WHERE book_id = ? AND status = 'waiting')
+            ''', (book_id, book_id))
+            if cursor.rowcount == 0:
+                break
+            shelved.append(book_id)
+    return shelved
+
+def return_book_to_next_hold(patron_id: str, book_id: int, return_date: datetime,
+                             hold_due_date: datetime, max_borrowed: int) -> Optional[Dict]:
+    """
+    Close the patron's oldest open loan of a book and, in the same transaction,
+    lend the copy to the patron with the oldest waiting hold on it (skipping
+    patrons at max_borrowed loans); with nobody waiting the copy is available
+    again. Copies reserved for the patron's own holds while they were at
+    max_borrowed are then lent to them, queue order permitting.
+
+    Returns:
+        dict: 'returned' (False if the patron had no open loan of the book)
+        and 'lent_to' (patron ID of the fulfilled hold, or None), or None if
+        the transaction failed and was rolled back
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE borrow_records SET return_date = ?
+            WHERE id = (
+                SELECT id FROM borrow_records
+                WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+                ORDER BY borrow_date LIMIT 1
+            )
+        ''', (return_date.isoformat(), patron_id, book_id))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            conn.close()
+            return {'returned': False, 'lent_to': None}
+        lent_to, shelved = _release_copy(conn, book_id, return_date, hold_due_date, max_borrowed)
+        shelved = [book_id] if shelved else []
+        reserved = [row[0] for row in conn.execute(_RESERVED_FOR_PATRON, (patron_id,))]
+        if reserved:
+            shelved += _serve_reserved_copies(conn, reserved, return_date, hold_due_date, max_borrowed)
+        if shelved:
+            _bump_catalog_version(conn)
+        conn.commit()
+        conn.close()
+        if shelved:
+            _notify_book_changed(shelved)
+        return {'returned': True, 'lent_to': lent_to}
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return None
+
+def insert_hold(patron_id: str, book_id: int, placed_at: datetime) -> Optional[int]:
+    """
+    Add a patron to the end of a book's hold queue.
+
+    Returns:
+        int: the patron's position in the queue, or None if they already
+        have a waiting hold on the book or the insert failed
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO holds (patron_id, book_id, placed_at) VALUES (?, ?, ?)
+        ''', (patron_id, book_id, placed_at.isoformat()))
+        position = conn.execute('''
+            SELECT COUNT(*) FROM holds WHERE book_id = ? AND status = 'waiting' AND id <= ?
+        ''', (book_id, cursor.lastrowid)).fetchone()[0]
+        conn.commit()
+        conn.close()
+        return position
+    except sqlite3.Error:
+        conn.rollback()
+        conn.close()
+        return None
+
+def cancel_waiting_hold(patron_id: str, book_id: int, cancelled_at: datetime,
+                        hold_due_date: datetime, max_borrowed: int) -> bool:
+    """
+    Take a patron out of a book's hold queue. A copy reserved for the queue
+    goes to the next patron who can borrow it, or back on the shelf once
+    nobody is waiting. Returns False if the patron was not in the queue.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE holds SET status = 'cancelled', closed_at = ?
+            WHERE patron_id = ? AND book_id = ? AND status = 'waiting'
+        ''', (cancelled_at.isoformat(), patron_id, book_id))
+        cancelled = cursor.rowcount > 0
+        shelved = []
+        if cancelled:
+            shelved = _serve_reserved_copies(conn, [book_id], cancelled_at, hold_due_date, max_borrowed)
+            if shelved:
+                _bump_catalog_version(conn)
+        conn.commit()
+        conn.close()
+        if shelved:
+            _notify_book_changed(shelved)
+        return cancelled
+    except sqlite3.Error:
+        conn.rollback()
+        conn.close()
+        return False
+
+def get_patron_holds(patron_id: str) -> List[Dict]:
+    """Get a patron's waiting holds with their book and position in each queue."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT h.book_id, b.title, b.author, h.placed_at,
+               (SELECT COUNT(*) FROM holds q
+                WHERE q.book_id = h.book_id AND q.status = 'waiting' AND q.id <= h.id) AS position
+        FROM holds h JOIN books b ON b.id = h.book_id
+        WHERE h.patron_id = ? AND h.status = 'waiting'
+        ORDER BY h.id
+    ''', (patron_id,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def return_books_batch(patron_id: str, book_ids: List[int], return_date: datetime,
+                       hold_due_date: Optional[datetime] = None, max_borrowed: int = 0) -> Optional[List[int]]:
+    """
+    Return several books for a patron in a single transaction.
+
+    For each book the patron's oldest open borrow record is closed and a copy
+    is given back to the catalog, or, with hold_due_date, lent to the next
+    hold (or reserved for the queue) as in return_book_to_next_hold.
+
+    Returns:
+        list: IDs of the books that were returned, or None if the transaction
+        failed and was rolled back
+    """
+    conn = get_db_connection()
+    returned = []
+    # Returned books whose copy went back on the shelf
+    shelved = []
+    try:
+        for book_id in book_ids:
+            cursor = conn.execute('''
+                UPDATE borrow_records SET return_date = ?
+                WHERE id = (
+                    SELECT id FROM borrow_records
+                    WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+                    ORDER BY borrow_date LIMIT 1
+                )
+            ''', (return_date.isoformat(), patron_id, book_id))
+            if cursor.rowcount == 0:
+                continue
+            returned.append(book_id)
+            if hold_due_date is not None:
+                if _release_copy(conn, book_id, return_date, hold_due_date, max_borrowed)[1]:
+                    shelved.append(book_id)
+                continue
+            conn.execute(f'''
+                UPDATE books SET available_copies = available_copies + 1, row_version = {_NEXT_VERSION}
+                WHERE id = ?
+            ''', (book_id,))
+            shelved.append(book_id)
+        if hold_due_date is not None and returned:
+            reserved = [row[0] for row in conn.execute(_RESERVED_FOR_PATRON, (patron_id,))]
+            if reserved:
+                shelved += _serve_reserved_copies(conn, reserved, return_date, hold_due_date, max_borrowed)
+        if shelved:
+            _bump_catalog_version(conn)
+        conn.commit()
+        conn.close()
+        if shelved:
+            _notify_book_changed(shelved)
+        return returned
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return None
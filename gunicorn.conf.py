@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for serving the Library Management System in production.
+
+Every setting can be overridden through the environment, e.g. WEB_WORKERS=8.
+Send SIGHUP to the master for a graceful reload: new workers are started
+before the old ones finish their in-flight requests and exit. With
+preload_app enabled the application is imported once in the master, so a
+reload re-forks workers but does not pick up code changes; restart the
+master (or set WEB_PRELOAD=0) to deploy new code.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5001')
+
+# Worker processes, each running several request threads
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app (and initialize the database) once in the master before forking
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+
+# Seconds a worker may spend on one request, and to finish requests on reload/shutdown
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers periodically so slow leaks can't accumulate
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+
+def pre_fork(server, worker):
+    """Close a preloaded app's catalog connections so no worker inherits them."""
+    if server.cfg.preload_app:
+        from services.search_log import close_before_fork
+        close_before_fork()
+
+def post_fork(server, worker):
+    """With a preloaded app, start prewarming the worker's search caches right away."""
+    if server.cfg.preload_app:
+        from services.search_log import prewarm_in_background
+        if server.app.wsgi().config['SEARCH_PREWARM']:
+            prewarm_in_background()
@@ -0,0 +1 @@
+# Instrumentation package - metrics, SQL timing and other request diagnostics
@@ -0,0 +1,162 @@
+"""
+Metrics Module - per-endpoint request latency, counts, errors and database time
+
+Metrics are kept in memory per process and rendered in the Prometheus text
+exposition format by the /metrics endpoint. Under gunicorn each worker keeps
+its own numbers; scrape every worker or aggregate on the Prometheus side.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from flask import current_app, request
+from database import add_statement_listener
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds, as used by Prometheus."""
+
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """Counts of observations <= each bound."""
+        running = 0
+        result = []
+        for count in self.counts:
+            running += count
+            result.append(running)
+        return result
+
+class RequestStats:
+    """Database work done while handling one request."""
+
+    __slots__ = ('start', 'db_time', 'db_queries')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.db_queries = 0
+
+# Stats of the request being handled in the current thread/context
+_current_request = ContextVar('current_request_stats', default=None)
+
+def _record_statement(sql: str, parameters, seconds: float, connection=None) -> None:
+    stats = _current_request.get()
+    if stats is not None:
+        stats.db_time += seconds
+        stats.db_queries += 1
+
+add_statement_listener(_record_statement)
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Database stats for the request being handled, if any."""
+    return _current_request.get()
+
+class MetricsRegistry:
+    """Thread-safe store of per-endpoint request metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}          # (endpoint, method, status) -> count
+        self.errors = {}            # endpoint -> count of 5xx responses
+        self.latency = {}           # endpoint -> Histogram of seconds
+        self.db_time = {}           # endpoint -> Histogram of seconds
+        self.db_queries = {}        # endpoint -> Histogram of statements per request
+
+    def observe(self, endpoint: str, method: str, status: int, stats: RequestStats, seconds: float) -> None:
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status >= 500:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            self._histogram(self.latency, endpoint, LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.db_time, endpoint, LATENCY_BUCKETS).observe(stats.db_time)
+            self._histogram(self.db_queries, endpoint, QUERY_COUNT_BUCKETS).observe(stats.db_queries)
+
+    @staticmethod
+    def _histogram(histograms: Dict, endpoint: str, bounds) -> Histogram:
+        histogram = histograms.get(endpoint)
+        if histogram is None:
+            histogram = histograms[endpoint] = Histogram(bounds)
+        return histogram
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append('# HELP library_http_requests_total Requests handled, by endpoint, method and status.')
+            lines.append('# TYPE library_http_requests_total counter')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'library_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            lines.append('# HELP library_http_request_errors_total Requests that ended in a 5xx response.')
+            lines.append('# TYPE library_http_request_errors_total counter')
+            for endpoint, count in sorted(self.errors.items()):
+                lines.append(f'library_http_request_errors_total{{endpoint="{endpoint}"}} {count}')
+
+            self._render_histogram(lines, 'library_http_request_duration_seconds',
+                                   'Time to handle a request, including streamed bodies.', self.latency)
+            self._render_histogram(lines, 'library_db_request_duration_seconds',
+                                   'Time spent executing SQL statements per request.', self.db_time)
+            self._render_histogram(lines, 'library_db_queries_per_request',
+                                   'SQL statements executed per request.', self.db_queries)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(lines: List[str], name: str, help_text: str, histograms: Dict) -> None:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for endpoint, histogram in sorted(histograms.items()):
+            for bound, count in zip(histogram.bounds, histogram.cumulative()):
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound:g}"}} {count}')
+            lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.total:.6f}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+def _start_request() -> None:
+    _current_request.set(RequestStats())
+
+def _finish_request(response):
+    stats = _current_request.get()
+    if stats is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    method = request.method
+    registry = current_app.extensions['metrics']
+
+    def finish():
+        registry.observe(endpoint, method, response.status_code, stats, time.perf_counter() - stats.start)
+        _current_request.set(None)
+
+    if response.is_streamed:
+        # The body is still to be generated; measure once it has been sent
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+def register_metrics(app) -> MetricsRegistry:
+    """Instrument every request handled by the app and return its registry."""
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    return registry
@@ -0,0 +1,89 @@
+"""
+Profiling Module - on-demand cProfile capture of individual requests
+
+Profiling is off by default. A request is profiled when an administrator
+sends `X-Profile: 1` together with a valid admin token, or when it is picked
+by random sampling (PROFILE_SAMPLE_RATE, 0.0 - 1.0). The profile covers the
+whole request path - route, library_service and database functions - and is
+written to PROFILE_DIR as a .prof file (load with pstats or snakeviz) plus a
+.txt call tree of the application's own functions.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+import uuid
+from flask import current_app, g, request
+from routes.admin import is_admin_request
+
+PROFILE_HEADER = 'X-Profile'
+
+# Path fragments identifying the application's own modules in the call tree
+APP_MODULES = ('routes', 'services', 'database.py', 'library_service.py')
+
+def _should_profile() -> bool:
+    if request.headers.get(PROFILE_HEADER) == '1' and is_admin_request():
+        return True
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+def _start_profile() -> None:
+    if not _should_profile():
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this thread
+        return
+    g.profiler = profiler
+
+def _finish_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unmatched'}-{uuid.uuid4().hex[:8]}"
+    directory = current_app.config['PROFILE_DIR']
+    title = f'{request.method} {request.full_path} -> {response.status_code}'
+
+    def finish():
+        profiler.disable()
+        write_profile(profiler, directory, name, title)
+
+    response.headers['X-Profile-Id'] = name
+    if response.is_streamed:
+        # Keep profiling while the body is generated
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+def write_profile(profiler: cProfile.Profile, directory: str, name: str, title: str) -> str:
+    """Write the raw profile and a call-tree summary; return the .prof path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + '.prof')
+    profiler.dump_stats(path)
+
+    summary = io.StringIO()
+    summary.write(f'{title}\n\n')
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats('cumulative').print_stats(30)
+    stats.print_callees('|'.join(module.replace('.', r'\.') for module in APP_MODULES))
+    with open(os.path.join(directory, name + '.txt'), 'w') as f:
+        f.write(summary.getvalue())
+    return path
+
+def register_profiling(app) -> None:
+    """
+    Add the per-request profiling hook. Configured through PROFILE_DIR and
+    PROFILE_SAMPLE_RATE (or the LIBRARY_PROFILE_DIR / LIBRARY_PROFILE_SAMPLE_RATE
+    environment variables).
+    """
+    app.config.setdefault('PROFILE_DIR', os.environ.get('LIBRARY_PROFILE_DIR', 'profiles'))
+    app.config.setdefault('PROFILE_SAMPLE_RATE', float(os.environ.get('LIBRARY_PROFILE_SAMPLE_RATE', 0.0)))
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
@@ -0,0 +1,157 @@
+"""
+Query Count Module - SQL statement budgets and N+1 detection
+
+A QueryCounter records the statements executed in the current context
+(thread or request) while it is active. Statements of the same shape run
+repeatedly with different parameters are reported as likely N+1 patterns:
+one query per row where a single query would do.
+
+In tests:
+
+    with assert_max_queries(5):
+        borrow_book_by_patron('123456', 1)
+
+In development (app.debug or DEV_TOOLS), every response carries an
+X-Query-Count header and requests with likely N+1 patterns are logged.
+"""
+
+import logging
+from contextvars import ContextVar
+from typing import List, Tuple
+from flask import current_app, g, request
+from database import add_statement_listener
+from instrumentation.sql_timing import normalize_sql
+
+logger = logging.getLogger('library.sql')
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+# Repetitions of one statement shape that count as a likely N+1 pattern
+DEFAULT_REPEAT_THRESHOLD = 3
+
+# Statements that are bookkeeping rather than queries
+_IGNORED_PREFIXES = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'EXPLAIN')
+
+# Counters active in the current context, innermost last
+_active = ContextVar('active_query_counters', default=())
+
+class QueryCounter:
+    """Records the SQL statements executed while it is active."""
+
+    def __init__(self, repeat_threshold: int = DEFAULT_REPEAT_THRESHOLD):
+        self.repeat_threshold = repeat_threshold
+        self.statements = []
+        self._token = None
+
+    def record(self, sql: str, parameters) -> None:
+        self.statements.append((normalize_sql(sql), parameters))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        """
+        Statement shapes run at least repeat_threshold times with more than
+        one set of parameters, with their counts: likely N+1 patterns.
+        """
+        runs = {}
+        for sql, parameters in self.statements:
+            entry = runs.setdefault(sql, [0, set()])
+            entry[0] += 1
+            entry[1].add(repr(parameters))
+        return [(sql, count) for sql, (count, distinct) in runs.items()
+                if count >= self.repeat_threshold and len(distinct) > 1]
+
+    def report(self) -> str:
+        """The recorded statements, one per line, for assertion messages and logs."""
+        lines = [f'{self.count} statements:']
+        lines.extend(f'  {sql}  {parameters!r}' for sql, parameters in self.statements)
+        for sql, count in self.repeated():
+            lines.append(f'  likely N+1: {count}x {sql}')
+        return '\n'.join(lines)
+
+    def start(self) -> 'QueryCounter':
+        self._token = _active.set(_active.get() + (self,))
+        return self
+
+    def stop(self) -> None:
+        if self._token is not None:
+            try:
+                _active.reset(self._token)
+            except ValueError:
+                # Stopped from a different context than the one that started it
+                _active.set(tuple(c for c in _active.get() if c is not self))
+            self._token = None
+
+    def __enter__(self) -> 'QueryCounter':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+def _record_statement(sql: str, parameters, seconds: float, connection=None) -> None:
+    """Statement listener: hand the statement to every active counter."""
+    counters = _active.get()
+    if not counters or sql.lstrip().upper().startswith(_IGNORED_PREFIXES):
+        return
+    for counter in counters:
+        counter.record(sql, parameters)
+
+add_statement_listener(_record_statement)
+
+class assert_max_queries(QueryCounter):
+    """
+    Context manager failing with an AssertionError if the block runs more
+    than `budget` statements, or (with allow_repeats=False) shows a likely
+    N+1 pattern.
+    """
+
+    def __init__(self, budget: int, allow_repeats: bool = True,
+                 repeat_threshold: int = DEFAULT_REPEAT_THRESHOLD):
+        super().__init__(repeat_threshold)
+        self.budget = budget
+        self.allow_repeats = allow_repeats
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        self.stop()
+        if exc_type is not None:
+            return
+        if self.count > self.budget:
+            raise AssertionError(f'Statement budget of {self.budget} exceeded. {self.report()}')
+        if not self.allow_repeats and self.repeated():
+            raise AssertionError(f'Likely N+1 query pattern. {self.report()}')
+
+def _start_request_counter() -> None:
+    if current_app.debug or current_app.config.get('DEV_TOOLS'):
+        g.query_counter = QueryCounter(current_app.config['QUERY_REPEAT_THRESHOLD']).start()
+
+def _finish_request_counter(response):
+    counter = g.pop('query_counter', None)
+    if counter is None:
+        return response
+    response.headers[QUERY_COUNT_HEADER] = str(counter.count)
+    endpoint = request.endpoint
+
+    def finish():
+        counter.stop()
+        patterns = counter.repeated()
+        if patterns:
+            logger.warning('Likely N+1 queries in %s: %s', endpoint,
+                           '; '.join(f'{count}x {sql}' for sql, count in patterns))
+
+    if response.is_streamed:
+        # Statements run while the body streams are still counted for the log
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+def register_query_counting(app) -> None:
+    """
+    Count statements per request in development (app.debug or DEV_TOOLS):
+    adds an X-Query-Count header and logs likely N+1 patterns.
+    """
+    app.config.setdefault('QUERY_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+    app.before_request(_start_request_counter)
+    app.after_request(_finish_request_counter)
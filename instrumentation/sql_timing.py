@@ -0,0 +1,144 @@
+"""
+SQL Timing Module - per-statement timing, slow-query log and EXPLAIN QUERY PLAN capture
+
+Statements are aggregated by their normalized text (whitespace collapsed,
+IN lists folded), so the same query with different parameters is
+counted once. Statements slower than the configured threshold are logged
+together with their query plan, and plans that scan a whole table are flagged.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+from typing import List
+import database
+from database import add_statement_listener
+
+logger = logging.getLogger('library.sql')
+
+# Default slow statement threshold in milliseconds
+DEFAULT_SLOW_QUERY_MS = 100.0
+
+# Statements that have no query plan
+_NO_PLAN_PREFIXES = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'CREATE', 'ALTER', 'DROP', 'EXPLAIN')
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and fold `IN (?, ?, ?)` lists so statement shapes group together."""
+    return _PLACEHOLDER_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql).strip())
+
+def explain_query_plan(sql: str, parameters, connection=None) -> List[str]:
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a statement.
+
+    Runs on `connection` (the one the statement ran on, so its database and
+    SQL functions apply) through a plain cursor, so the explain itself is not
+    timed; without one, on a plain connection to DATABASE.
+    """
+    if connection is not None:
+        rows = connection.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + sql, parameters or ()).fetchall()
+        return [row[-1] for row in rows]
+    conn = sqlite3.connect(database.DATABASE)
+    try:
+        database.register_sql_functions(conn)
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, parameters or ()).fetchall()
+    finally:
+        conn.close()
+    return [row[-1] for row in rows]
+
+def is_full_scan(plan: List[str]) -> bool:
+    """True if any step of the plan reads a whole table rather than using an index."""
+    return any(step.startswith('SCAN') and 'USING' not in step for step in plan)
+
+class StatementStats:
+    """Aggregated timings for one normalized statement."""
+
+    __slots__ = ('sql', 'count', 'total', 'max', 'plan', 'full_scan')
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.plan = None
+        self.full_scan = False
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+class StatementTimer:
+    """Process-wide statement statistics and slow-query log."""
+
+    def __init__(self, slow_threshold: float = DEFAULT_SLOW_QUERY_MS / 1000, max_slow: int = 100):
+        self.slow_threshold = slow_threshold
+        self.enabled = False
+        self.slow_queries = deque(maxlen=max_slow)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, parameters, seconds: float, connection=None) -> None:
+        """Statement listener: aggregate timings and log slow statements."""
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats(key)
+            stats.count += 1
+            stats.total += seconds
+            if seconds > stats.max:
+                stats.max = seconds
+        if seconds >= self.slow_threshold:
+            self._log_slow(stats, sql, parameters, seconds, connection)
+
+    def _log_slow(self, stats: StatementStats, sql: str, parameters, seconds: float, connection) -> None:
+        if stats.plan is None and parameters is not None and not stats.sql.upper().startswith(_NO_PLAN_PREFIXES):
+            try:
+                stats.plan = explain_query_plan(sql, parameters, connection)
+                stats.full_scan = is_full_scan(stats.plan)
+            except sqlite3.Error as e:
+                stats.plan = [f'EXPLAIN failed: {e}']
+        plan = stats.plan or []
+        self.slow_queries.append({
+            'sql': stats.sql,
+            'seconds': seconds,
+            'plan': plan,
+            'full_scan': stats.full_scan,
+        })
+        logger.warning('Slow SQL statement (%.1f ms)%s: %s | plan: %s',
+                       seconds * 1000, ' [FULL SCAN]' if stats.full_scan else '',
+                       stats.sql, '; '.join(plan))
+
+    def top(self, limit: int = 20, order_by: str = 'total') -> List[StatementStats]:
+        """The statements with the highest total (or mean, max, count) time."""
+        with self._lock:
+            stats = list(self._stats.values())
+        return sorted(stats, key=lambda s: getattr(s, order_by), reverse=True)[:limit]
+
+    def reset(self) -> None:
+        """Forget all collected statistics."""
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries.clear()
+
+# Statement statistics for this process
+statement_timer = StatementTimer()
+
+def register_sql_timing(app) -> StatementTimer:
+    """
+    Start timing SQL statements. The slow threshold comes from the
+    SLOW_QUERY_THRESHOLD_MS config (or LIBRARY_SLOW_QUERY_MS environment variable).
+    """
+    threshold_ms = app.config.setdefault(
+        'SLOW_QUERY_THRESHOLD_MS', float(os.environ.get('LIBRARY_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)))
+    statement_timer.slow_threshold = threshold_ms / 1000
+    if not statement_timer.enabled:
+        add_statement_listener(statement_timer.record)
+        statement_timer.enabled = True
+    app.extensions['sql_timing'] = statement_timer
+    return statement_timer
@@ -0,0 +1,243 @@
+"""
+Tracing Module - lightweight nested spans for routes, services, SQL and the payment gateway
+
+A trace is a tree of spans sharing a trace ID. The current span is kept in a
+context variable, so spans opened while handling a request nest under the
+route span automatically. Incoming W3C `traceparent` (or `X-Trace-Id`)
+headers are continued, and the trace ID is echoed in the response.
+
+Tracing is off until an exporter is configured: set TRACE_FILE (or the
+LIBRARY_TRACE_FILE environment variable) to write finished spans as JSON
+lines, or call tracer.set_exporter() with an InMemoryCollector.
+"""
+
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from flask import g, request
+from database import add_statement_listener
+
+# Function arguments recorded as span attributes by @traced
+TRACED_ARGUMENTS = ('patron_id', 'book_id', 'book_ids', 'search_term', 'search_type',
+                    'transaction_id', 'amount')
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+def _new_trace_id() -> str:
+    return '%032x' % random.getrandbits(128)
+
+def _new_span_id() -> str:
+    return '%016x' % random.getrandbits(64)
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'duration', 'attributes', 'status')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = None
+        self.attributes = attributes
+        self.status = 'ok'
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+class JsonlExporter:
+    """Append finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', buffering=1)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+class InMemoryCollector:
+    """Collector stand-in that keeps finished spans in memory."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def trace(self, trace_id: str) -> List[Span]:
+        """All spans of one trace, in the order they finished."""
+        with self._lock:
+            return [span for span in self.spans if span.trace_id == trace_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+# The span that new spans in this context become children of
+_current_span = ContextVar('current_span', default=None)
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter."""
+
+    def __init__(self):
+        self.exporter = None
+        self.enabled = False
+
+    def set_exporter(self, exporter) -> None:
+        """Start exporting spans to exporter; None turns tracing off."""
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    def start_span(self, name: str, attributes: Dict = None, trace_id: str = None,
+                   parent_id: str = None) -> Span:
+        parent = _current_span.get()
+        if trace_id is None:
+            if parent is not None:
+                trace_id, parent_id = parent.trace_id, parent.span_id
+            else:
+                trace_id = _new_trace_id()
+        return Span(name, trace_id, parent_id, attributes or {})
+
+    def end_span(self, span: Span) -> None:
+        if span.duration is None:
+            span.duration = time.time() - span.start
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block as a child of the current span."""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = 'error'
+            span.set_attribute('error', repr(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def record_statement(self, sql: str, parameters, seconds: float, connection=None) -> None:
+        """Statement listener: add a finished span for an SQL statement."""
+        if not self.enabled or _current_span.get() is None:
+            return
+        span = self.start_span('sql', {'db.statement': ' '.join(sql.split())})
+        span.start -= seconds
+        span.duration = seconds
+        self.end_span(span)
+
+# Process-wide tracer
+tracer = Tracer()
+add_statement_listener(tracer.record_statement)
+
+def traced(func):
+    """Record each call of a service function as a span, with its ID arguments as attributes."""
+    signature = inspect.signature(func)
+    recorded = [name for name in signature.parameters if name in TRACED_ARGUMENTS]
+    name = f'{func.__module__}.{func.__name__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not tracer.enabled:
+            return func(*args, **kwargs)
+        bound = signature.bind_partial(*args, **kwargs).arguments
+        attributes = {key: bound[key] for key in recorded if key in bound}
+        with tracer.span(name, **attributes):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+def _incoming_trace():
+    """Trace and parent span IDs from the request headers, if present."""
+    match = _TRACEPARENT.match(request.headers.get('traceparent', '').strip().lower())
+    if match:
+        return match.group(1), match.group(2)
+    trace_id = request.headers.get('X-Trace-Id', '').strip().lower()
+    if re.fullmatch(r'[0-9a-f]{32}', trace_id):
+        return trace_id, None
+    return None, None
+
+def _start_request_span() -> None:
+    if not tracer.enabled:
+        return
+    trace_id, parent_id = _incoming_trace()
+    span = tracer.start_span(f'{request.method} {request.endpoint or "unmatched"}', {
+        'http.method': request.method,
+        'http.path': request.path,
+    }, trace_id=trace_id or _new_trace_id(), parent_id=parent_id)
+    g.trace_span = span
+    g.trace_token = _current_span.set(span)
+
+def _finish_request_span(response):
+    span = g.pop('trace_span', None)
+    if span is None:
+        return response
+    token = g.pop('trace_token')
+    span.set_attribute('http.status_code', response.status_code)
+    if response.status_code >= 500:
+        span.status = 'error'
+    response.headers['X-Trace-Id'] = span.trace_id
+    response.headers['traceparent'] = f'00-{span.trace_id}-{span.span_id}-01'
+
+    def finish():
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Closed from a different context than the one that opened it
+            _current_span.set(None)
+        tracer.end_span(span)
+
+    if response.is_streamed:
+        # The body (and its SQL) is produced after this hook returns
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+def register_tracing(app) -> Tracer:
+    """Trace every request; export to TRACE_FILE (or LIBRARY_TRACE_FILE) if set."""
+    trace_file = app.config.setdefault('TRACE_FILE', os.environ.get('LIBRARY_TRACE_FILE'))
+    if trace_file and not isinstance(tracer.exporter, JsonlExporter):
+        tracer.set_exporter(JsonlExporter(trace_file))
+    app.before_request(_start_request_span)
+    app.after_request(_finish_request_span)
+    return tracer
@@ -0,0 +1,109 @@
+"""
+Record types for Library Management System
+Compact, read-only rows for books and loans
+"""
+
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Sequence, Tuple
+
+class Record(Mapping):
+    """
+    Read-only mapping over one result row, stored as the row's tuple.
+
+    Behaves like the dict it replaces for reading: record['title'], .get(),
+    `in`, iteration, dict(record) and comparison with dicts all work, and
+    templates can use record.title. Subclasses list their keys in `fields`,
+    and in `internal_fields` those that are left out of API responses.
+    """
+
+    __slots__ = ('_values',)
+
+    fields: Tuple[str, ...] = ()
+    internal_fields: Tuple[str, ...] = ()
+    public_fields: Tuple[str, ...] = ()
+    _positions: Dict[str, int] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._positions = {name: index for index, name in enumerate(cls.fields)}
+        cls.public_fields = tuple(name for name in cls.fields if name not in cls.internal_fields)
+
+    def __init__(self, values: Sequence):
+        self._values = values
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._positions[key]]
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+    def __reduce__(self):
+        return type(self), (self._values,)
+
+    def to_dict(self) -> Dict:
+        """A plain dict copy, e.g. for JSON serialization."""
+        return {name: self[name] for name in self.fields}
+
+    def public_dict(self) -> Dict:
+        """A plain dict of the fields shown in API responses."""
+        return {name: self[name] for name in self.public_fields}
+
+class BookRecord(Record):
+    """A row of the books table."""
+
+    __slots__ = ()
+
+    fields = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies', 'row_version')
+
+    # Catalog version of the row's last change, for cache invalidation only
+    internal_fields = ('row_version',)
+
+# Column list matching BookRecord.fields, for SELECTs building book records
+BOOK_COLUMNS = ', '.join(BookRecord.fields)
+
+class LoanRecord(Record):
+    """
+    An open loan with its book's title and author.
+
+    The dates are kept as stored (ISO text) and parsed into datetimes only
+    when first read; is_overdue is worked out when it is read.
+    """
+
+    __slots__ = ('_borrow_date', '_due_date')
+
+    # Values are (book_id, title, author, borrow_date, due_date) as stored
+    fields = ('book_id', 'title', 'author', 'borrow_date', 'due_date', 'is_overdue')
+
+    def __init__(self, values: Sequence):
+        super().__init__(values)
+        self._borrow_date = None
+        self._due_date = None
+
+    def __getitem__(self, key):
+        if key == 'borrow_date':
+            if self._borrow_date is None:
+                self._borrow_date = datetime.fromisoformat(self._values[3])
+            return self._borrow_date
+        if key == 'due_date':
+            if self._due_date is None:
+                self._due_date = datetime.fromisoformat(self._values[4])
+            return self._due_date
+        if key == 'is_overdue':
+            return datetime.now() > self['due_date']
+        return super().__getitem__(key)
+
+# Column list matching the stored values of LoanRecord
+LOAN_COLUMNS = 'br.book_id, b.title, b.author, br.borrow_date, br.due_date'
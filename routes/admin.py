@@ -0,0 +1,22 @@
+"""
+Admin Access - shared-secret check for administrator-only features
+"""
+
+import hmac
+import os
+from flask import current_app, request
+
+# Header carrying the administrator token
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+
+def register_admin(app) -> None:
+    """Read the admin token from the LIBRARY_ADMIN_TOKEN environment variable unless configured."""
+    app.config.setdefault('ADMIN_TOKEN', os.environ.get('LIBRARY_ADMIN_TOKEN'))
+
+def is_admin_request() -> bool:
+    """True if the request carries the configured admin token. Always False when none is set."""
+    token = current_app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get(ADMIN_TOKEN_HEADER)
+    if not token or not supplied:
+        return False
+    return hmac.compare_digest(token.encode(), supplied.encode())
@@ -3,7 +3,16 @@ API Routes - JSON API endpoints
 """
 
 from flask import Blueprint, jsonify, request
-from library_service import calculate_late_fee_for_book, search_books_in_catalog
+from database import BOOK_SORTS, get_top_search_queries
+from services.library_service import (
+    calculate_late_fee_for_book, iter_search_books_in_catalog, search_books_batch, suggest_search_terms,
+    borrow_books_by_patron, return_books_by_patron, SEARCH_CRITERIA, SUGGESTION_LIMIT,
+    place_hold, cancel_hold, get_patron_hold_positions
+)
+from services.search_log import logs_search, search_log
+from .admin import is_admin_request
+from .conditional import catalog_conditional
+from .streaming import stream_json_list, stream_ndjson, wants_ndjson
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -16,24 +25,239 @@ def get_late_fee(patron_id, book_id):
     result = calculate_late_fee_for_book(patron_id, book_id)
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
+_INTEGER_CRITERIA = ('min_copies', 'max_copies', 'limit', 'offset')
+_BOOLEANS = {'1': True, 'true': True, 'yes': True, '0': False, 'false': False, 'no': False}
+
+def _parse_search_criteria():
+    """
+    Read the search criteria given in the query string.
+    Returns (criteria, error message).
+    """
+    criteria = {}
+    for name in SEARCH_CRITERIA:
+        value = request.args.get(name, '').strip()
+        if not value:
+            continue
+        if name in _INTEGER_CRITERIA:
+            if not value.isdigit():
+                return None, f'{name} must be a non-negative integer'
+            criteria[name] = int(value)
+        elif name == 'available':
+            if value.lower() not in _BOOLEANS:
+                return None, 'available must be true or false'
+            criteria[name] = _BOOLEANS[value.lower()]
+        else:
+            criteria[name] = value
+    return criteria, None
+
+def _search_request_error():
+    """The 400 response for invalid /api/search arguments, or None if they are valid."""
+    search_term = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'title')
+    fuzzy = request.args.get('fuzzy', '') in ('1', 'true')
+    criteria, error = _parse_search_criteria()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if not search_term and not criteria:
+        return jsonify({'error': 'Search term is required'}), 400
+    
+    if search_term and search_type not in ('title', 'author', 'isbn'):
+        return jsonify({'error': 'type must be one of title, author, isbn'}), 400
+    
+    if criteria and (fuzzy or (search_term and search_type in criteria)
+                     or criteria.get('sort', 'title') not in BOOK_SORTS):
+        return jsonify({'error': 'Invalid combination of search criteria'}), 400
+    return None
+
 @api_bp.route('/search')
+@logs_search
+@catalog_conditional(validate=_search_request_error)
 def search_books_api():
     """
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
+
+    Besides q and type, the criteria title, author, isbn, available,
+    min_copies, max_copies, sort, limit and offset can be combined;
+    they are filtered by the database. Arguments are checked by
+    _search_request_error before the view runs.
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    fuzzy = request.args.get('fuzzy', '') in ('1', 'true')
+    criteria, _ = _parse_search_criteria()
     
-    if not search_term:
-        return jsonify({'error': 'Search term is required'}), 400
+    # Use business logic function; matches are streamed as they are read
+    books = iter_search_books_in_catalog(search_term, search_type, fuzzy, **criteria)
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    if wants_ndjson():
+        return stream_ndjson(books)
     
-    return jsonify({
+    fields = {
         'search_term': search_term,
         'search_type': search_type,
-        'results': books,
-        'count': len(books)
+        'fuzzy': fuzzy
+    }
+    if criteria:
+        fields['criteria'] = criteria
+    return stream_json_list(fields, books)
+
+@api_bp.route('/search/batch', methods=['POST'])
+def search_books_batch_api():
+    """
+    Run many searches in one request, e.g. for catalog reconciliation.
+    Batch API interface for R5: Book Search Functionality
+
+    The body is {"queries": [{"q": ..., "type": "title"|"author"|"isbn"}, ...]};
+    results come back in the same order, each with its input index.
+    """
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+        return jsonify({'error': 'queries must be a list of {"q": ..., "type": ...} objects'}), 400
+
+    success, message, results = search_books_batch(
+        [(query.get('q'), query.get('type', 'title')) for query in queries])
+    if not results:
+        return jsonify({'error': message}), 400
+
+    return jsonify({
+        'success': success,
+        'message': message,
+        'count': len(results),
+        'results': results
+    })
+
+@api_bp.route('/search/top')
+def top_searches_api():
+    """
+    Most frequent searches, for administrators (X-Admin-Token).
+    Optional type restricts them to title, author or isbn searches.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Administrator token required'}), 403
+
+    limit = request.args.get('limit', 20, type=int)
+    search_type = request.args.get('type') or None
+    if limit <= 0 or search_type not in (None, 'title', 'author', 'isbn'):
+        return jsonify({'error': 'limit must be positive and type one of title, author, isbn'}), 400
+
+    # Include this process's searches that are not flushed yet
+    search_log.flush()
+    return jsonify({'queries': get_top_search_queries(min(limit, 1000), search_type)})
+
+def _suggest_request_error():
+    """The 400 response for a missing /api/suggest prefix, or None."""
+    if not request.args.get('q', '').strip():
+        return jsonify({'error': 'Search term is required'}), 400
+    return None
+
+@api_bp.route('/suggest')
+@catalog_conditional(validate=_suggest_request_error)
+def suggest_api():
+    """
+    Autocomplete titles or authors from a typed prefix.
+    Companion to R5: Book Search Functionality
+    """
+    prefix = request.args.get('q', '')
+    search_type = request.args.get('type', 'title')
+    limit = request.args.get('limit', SUGGESTION_LIMIT, type=int)
+
+    return jsonify({
+        'query': prefix,
+        'search_type': search_type,
+        'suggestions': suggest_search_terms(prefix, search_type, limit)
+    })
+
+
+def _parse_batch_request():
+    """Read patron_id and book_ids from a JSON batch request body."""
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    book_ids = data.get('book_ids')
+    if not isinstance(book_ids, list):
+        return patron_id, None
+    try:
+        return patron_id, [int(book_id) for book_id in book_ids]
+    except (ValueError, TypeError):
+        return patron_id, None
+
+@api_bp.route('/borrow', methods=['POST'])
+def borrow_books_api():
+    """
+    Borrow several books in one request.
+    Batch API interface for R3: Book Borrowing
+    """
+    patron_id, book_ids = _parse_batch_request()
+    if book_ids is None:
+        return jsonify({'error': 'book_ids must be a list of book IDs'}), 400
+
+    success, message, results = borrow_books_by_patron(patron_id, book_ids)
+    if not results:
+        return jsonify({'error': message}), 400
+
+    return jsonify({
+        'patron_id': patron_id,
+        'success': success,
+        'message': message,
+        'results': results
     })
+
+@api_bp.route('/return', methods=['POST'])
+def return_books_api():
+    """
+    Return several books in one request.
+    Batch API interface for R4: Book Return Processing
+    """
+    patron_id, book_ids = _parse_batch_request()
+    if book_ids is None:
+        return jsonify({'error': 'book_ids must be a list of book IDs'}), 400
+
+    success, message, results = return_books_by_patron(patron_id, book_ids)
+    if not results:
+        return jsonify({'error': message}), 400
+
+    return jsonify({
+        'patron_id': patron_id,
+        'success': success,
+        'message': message,
+        'results': results
+    })
+
+def _parse_hold_request():
+    """Read patron_id and book_id from a JSON hold request body."""
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    try:
+        return patron_id, int(data.get('book_id'))
+    except (ValueError, TypeError):
+        return patron_id, None
+
+@api_bp.route('/holds', methods=['POST', 'DELETE'])
+def holds_api():
+    """
+    Place (POST) or cancel (DELETE) a patron's hold on a book.
+    Body: {"patron_id": ..., "book_id": ...}
+    """
+    patron_id, book_id = _parse_hold_request()
+    if book_id is None:
+        return jsonify({'error': 'book_id must be a book ID'}), 400
+
+    if request.method == 'POST':
+        success, message = place_hold(patron_id, book_id)
+    else:
+        success, message = cancel_hold(patron_id, book_id)
+
+    return jsonify({
+        'patron_id': patron_id,
+        'book_id': book_id,
+        'success': success,
+        'message': message
+    }), 200 if success else 400
+
+@api_bp.route('/holds/<patron_id>')
+def hold_positions_api(patron_id):
+    """A patron's waiting holds with their position in each book's queue."""
+    result = get_patron_hold_positions(patron_id)
+    return jsonify(result), 400 if 'error' in result else 200
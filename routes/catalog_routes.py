@@ -2,9 +2,16 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
-from library_service import add_book_to_catalog
+from itertools import chain
+from flask import (
+    Blueprint, Response, current_app, render_template, stream_template,
+    request, redirect, url_for, flash
+)
+from .conditional import catalog_conditional
+from .fragment_cache import render_catalog_row
+from .streaming import chunked
+from services.catalog_snapshot import get_all_books
+from services.library_service import add_book_to_catalog
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -14,13 +21,28 @@ def index():
     return redirect(url_for('catalog.catalog'))
 
 @catalog_bp.route('/catalog')
+@catalog_conditional
 def catalog():
     """
     Display all books in the catalog.
     Implements R2: Book Catalog Display
+
+    In streaming mode (CATALOG_STREAMING config or ?stream=1) the page is
+    sent while the rows are still being rendered.
     """
+    if current_app.config.get('CATALOG_STREAMING') or request.args.get('stream') == '1':
+        return _stream_catalog()
+    
     books = get_all_books()
-    return render_template('catalog.html', books=books)
+    return render_template('catalog.html', books=books, render_row=render_catalog_row)
+
+def _stream_catalog():
+    """Render catalog.html incrementally, one snapshot row at a time."""
+    books = iter(get_all_books())
+    first = next(books, None)
+    # Peek one row so the template's empty-catalog branch still works
+    books = chain([first], books) if first is not None else []
+    return Response(chunked(stream_template('catalog.html', books=books, render_row=render_catalog_row)), mimetype='text/html')
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
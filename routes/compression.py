@@ -0,0 +1,66 @@
+"""
+Response Compression - gzip/deflate negotiation for HTML and JSON responses
+"""
+
+import zlib
+from flask import current_app, request
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ('text/html', 'application/json', 'application/x-ndjson')
+
+# Default size (bytes) below which buffered responses are sent uncompressed
+DEFAULT_MIN_SIZE = 1024
+
+# zlib window bits for each supported Content-Encoding
+_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+def _negotiate_encoding():
+    """Pick the client's preferred supported encoding, or None."""
+    return request.accept_encodings.best_match(['gzip', 'deflate'])
+
+def _compress_stream(chunks, wbits):
+    """Compress an iterable of chunks, flushing after each so data is sent right away."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def compress_response(response):
+    """Compress a response if the client accepts it and it is worth compressing."""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate_encoding()
+    if encoding is None:
+        return response
+
+    wbits = _WBITS[encoding]
+    if response.is_streamed:
+        # Length is unknown up front, so streamed bodies are always compressed
+        response.response = _compress_stream(response.response, wbits)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+        compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+        response.set_data(compressor.compress(data) + compressor.flush())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def register_compression(app):
+    """Register response compression with the Flask app."""
+    app.config.setdefault('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+    app.after_request(compress_response)
@@ -0,0 +1,59 @@
+"""
+Conditional GET support - weak ETags and Last-Modified derived from the catalog version
+"""
+
+from functools import wraps
+from flask import request, session, make_response
+from database import get_catalog_version
+
+def catalog_conditional(view=None, *, validate=None):
+    """
+    Answer conditional GETs for views whose output only depends on the catalog.
+
+    The catalog version is checked before the view runs, so a matching
+    If-None-Match (or If-Modified-Since) is answered with 304 Not Modified
+    without querying the books table. Pages with pending flash messages are
+    always rendered, since the messages are part of the response body.
+
+    `validate`, if given, is called first and returns an error response for
+    invalid arguments (or None), so a bad request is never answered with
+    304. Responses vary on Accept and Accept-Encoding, since one URL can be
+    served as JSON or NDJSON, compressed or not, under the same ETag.
+    """
+    if view is None:
+        return lambda view: catalog_conditional(view, validate=validate)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if validate is not None:
+            error = validate()
+            if error is not None:
+                return error
+
+        if '_flashes' in session:
+            return view(*args, **kwargs)
+
+        version, updated_at = get_catalog_version()
+        etag = f'catalog-{version}'
+        last_modified = updated_at.replace(microsecond=0)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = (request.if_modified_since is not None
+                            and last_modified <= request.if_modified_since)
+
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        return response
+
+    return wrapper
@@ -0,0 +1,30 @@
+"""
+Developer Routes - diagnostics pages, available only in debug mode or when enabled in config
+"""
+
+from flask import Blueprint, abort, current_app, render_template, request
+
+dev_bp = Blueprint('dev', __name__, url_prefix='/dev')
+
+@dev_bp.before_request
+def require_dev_mode():
+    """Hide the diagnostics pages unless running in debug mode or DEV_TOOLS is set."""
+    if not (current_app.debug or current_app.config.get('DEV_TOOLS')):
+        abort(404)
+
+@dev_bp.route('/sql')
+def sql_dashboard():
+    """Top SQL statements by total time, and the most recent slow statements."""
+    timer = current_app.extensions['sql_timing']
+    order_by = request.args.get('order_by', 'total')
+    if order_by not in ('total', 'mean', 'max', 'count'):
+        order_by = 'total'
+
+    if request.args.get('reset') == '1':
+        timer.reset()
+
+    return render_template('sql_dashboard.html',
+                           statements=timer.top(50, order_by),
+                           slow_queries=list(timer.slow_queries)[::-1],
+                           threshold_ms=timer.slow_threshold * 1000,
+                           order_by=order_by)
@@ -0,0 +1,92 @@
+"""
+Fragment Cache - rendered HTML for catalog rows, keyed by book ID and row version
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List
+from flask import current_app
+from markupsafe import Markup
+from database import add_book_change_listener
+
+ROW_TEMPLATE = '_catalog_row.html'
+
+# Default number of rendered rows kept per application
+DEFAULT_MAX_ENTRIES = 10000
+
+class RowFragmentCache:
+    """
+    LRU cache of rendered catalog rows.
+
+    Entries are keyed by book ID and hold the row version they were rendered
+    from, so a row changed by another process is simply re-rendered. Writes
+    made by this process also drop the entry straight away through the
+    database change listener.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def render(self, book: Dict) -> Markup:
+        """Return the rendered row for a book, rendering it on a miss."""
+        book_id = book['id']
+        version = book.get('row_version')
+        with self._lock:
+            entry = self._entries.get(book_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(book_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        html = Markup(current_app.jinja_env.get_template(ROW_TEMPLATE).render(book=book))
+        if version is None:
+            return html
+
+        with self._lock:
+            self._entries[book_id] = (version, html)
+            self._entries.move_to_end(book_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def invalidate(self, book_ids: List[int]) -> None:
+        """Drop the cached rows for the given books."""
+        with self._lock:
+            for book_id in book_ids:
+                self._entries.pop(book_id, None)
+
+    def clear(self) -> None:
+        """Drop every cached row."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Every live cache, so one database listener can invalidate them all
+_caches = weakref.WeakSet()
+
+def _invalidate_caches(book_ids: List[int]) -> None:
+    for cache in list(_caches):
+        cache.invalidate(book_ids)
+
+add_book_change_listener(_invalidate_caches)
+
+def get_row_cache() -> RowFragmentCache:
+    """Get the current application's row cache, creating it on first use."""
+    cache = current_app.extensions.get('catalog_row_cache')
+    if cache is None:
+        max_entries = current_app.config.get('CATALOG_ROW_CACHE_SIZE', DEFAULT_MAX_ENTRIES)
+        cache = current_app.extensions.setdefault('catalog_row_cache', RowFragmentCache(max_entries))
+    return cache
+
+def render_catalog_row(book: Dict) -> Markup:
+    """Template helper rendering one catalog row through the cache."""
+    return get_row_cache().render(book)
@@ -0,0 +1,18 @@
+"""
+JSON Provider - serializes record types alongside the usual Flask JSON types
+"""
+
+from flask.json.provider import DefaultJSONProvider
+from records import Record
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider, extended to write book and loan records as
+    objects of their public fields.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.public_dict()
+        return DefaultJSONProvider.default(o)
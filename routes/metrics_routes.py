@@ -0,0 +1,13 @@
+"""
+Metrics Routes - Prometheus scrape endpoint
+"""
+
+from flask import Blueprint, Response, current_app
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Expose request and database metrics in the Prometheus text format."""
+    registry = current_app.extensions['metrics']
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
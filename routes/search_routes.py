@@ -3,11 +3,15 @@ Search Routes - Book search functionality
 """
 
 from flask import Blueprint, render_template, request, flash
-from library_service import search_books_in_catalog
+from services.library_service import search_books_in_catalog
+from services.search_log import logs_search
+from .conditional import catalog_conditional
 
 search_bp = Blueprint('search', __name__)
 
 @search_bp.route('/search')
+@logs_search
+@catalog_conditional
 def search_books():
     """
     Search for books in the catalog.
@@ -15,12 +19,13 @@ def search_books():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    fuzzy = request.args.get('fuzzy', '') in ('1', 'true')
     
     if not search_term:
         return render_template('search.html', books=[], search_term='', search_type=search_type)
     
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = search_books_in_catalog(search_term, search_type, fuzzy)
     
     if not books:
         flash('Search functionality is not yet implemented.', 'error')
@@ -0,0 +1,60 @@
+"""
+Streaming Responses - JSON and NDJSON serializers for list endpoints
+"""
+
+from typing import Dict, Iterable
+from flask import Response, current_app, request
+
+# Bytes of serialized rows to collect before sending a chunk
+CHUNK_SIZE = 8192
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_ndjson() -> bool:
+    """True if the client asked for newline-delimited JSON."""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def chunked(pieces: Iterable[str], chunk_size: int = CHUNK_SIZE) -> Iterable[str]:
+    """Group small string pieces into chunks of roughly chunk_size characters."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def stream_json_list(fields: Dict, rows: Iterable[Dict], list_key: str = 'results',
+                     count_key: str = 'count') -> Response:
+    """
+    Stream a JSON object whose list member is written row by row.
+
+    The output is equivalent to jsonify({**fields, list_key: rows,
+    count_key: len(rows)}), but rows are serialized as they are produced
+    so the full result set is never held in memory.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{'
+        for key, value in fields.items():
+            yield f'{dumps(key)}: {dumps(value)}, '
+        yield f'{dumps(list_key)}: ['
+        count = 0
+        for row in rows:
+            yield (', ' if count else '') + dumps(row)
+            count += 1
+        yield f'], {dumps(count_key)}: {count}}}\n'
+
+    return Response(chunked(generate()), mimetype='application/json')
+
+def stream_ndjson(rows: Iterable[Dict]) -> Response:
+    """Stream rows as newline-delimited JSON, one object per line."""
+    dumps = current_app.json.dumps
+    return Response(chunked(dumps(row) + '\n' for row in rows), mimetype=NDJSON_MIMETYPE)
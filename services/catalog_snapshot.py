@@ -0,0 +1,432 @@
+"""
+Catalog Snapshot - columnar in-memory copy of the books table for listing and search
+
+Book IDs, copy counts and row versions are kept in arrays, titles and
+authors as interned strings next to interned lower-case copies, plus the
+title order used by the catalog. Reads only ask SQLite's data_version
+whether anything was committed; when the catalog version has moved, just
+the rows with a newer row_version are fetched and merged in.
+
+Copy counts are updated in place. Inserts and text changes build new
+columns, so a view handed out earlier keeps a consistent set of rows.
+Titles and authors are trigram-indexed (services.trigram_index) on the
+first search that needs it; inserted rows are added to built indexes as
+they are merged. Completion indexes (services.prefix_index) are ranked by
+each book's number of loans plus the number of times the exact text was
+searched for (search_queries) when the index was built. Loans are counted
+once per process, then topped up from the borrow records added since, and
+added to the built indexes in place. Once books are added or renamed the
+indexes are rebuilt in a background thread while the previous ones keep
+answering.
+"""
+
+import logging
+import sqlite3
+import sys
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import Iterator, List, Optional, Tuple
+from database import CatalogWatcher, _execute_plain, get_db_connection
+from records import BOOK_COLUMNS, BookRecord
+from services.prefix_index import PrefixIndex, normalize
+from services.trigram_index import DEFAULT_SIMILARITY, TrigramIndex, build_index
+
+logger = logging.getLogger('library.catalog')
+
+class _Columns:
+    """One consistent set of catalog columns."""
+
+    __slots__ = ('ids', 'titles', 'authors', 'isbns', 'total', 'available', 'row_versions',
+                 'titles_lower', 'authors_lower', 'order', 'rank', 'positions', 'isbn_positions',
+                 'title_index', 'author_index')
+
+    # Append-only, so shared with copies; a view ignores positions beyond its own columns
+    _SHARED = ('title_index', 'author_index')
+    _INDEXED = {'title': ('title_index', 'titles_lower'), 'author': ('author_index', 'authors_lower')}
+
+    def __init__(self):
+        self.ids = array('q')
+        self.titles = []
+        self.authors = []
+        self.isbns = []
+        self.total = array('q')
+        self.available = array('q')
+        self.row_versions = array('q')
+        self.titles_lower = []
+        self.authors_lower = []
+        # Positions in title order, each position's place in that order,
+        # and book ID / ISBN -> position
+        self.order = array('q')
+        self.rank = array('q')
+        self.positions = {}
+        self.isbn_positions = {}
+        # Built on first use
+        self.title_index = None
+        self.author_index = None
+
+    def copy(self) -> '_Columns':
+        columns = _Columns()
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name not in self._SHARED:
+                value = dict(value) if isinstance(value, dict) else value[:]
+            setattr(columns, name, value)
+        return columns
+
+    def index(self, search_type: str) -> TrigramIndex:
+        """The trigram index over lower-cased titles or authors, built if needed."""
+        index_name, texts_name = self._INDEXED[search_type]
+        index = getattr(self, index_name)
+        if index is None:
+            index = build_index(getattr(self, texts_name))
+            setattr(self, index_name, index)
+        return index
+
+    def drop_indexes(self) -> None:
+        """Drop the trigram indexes, e.g. after a title or author changed."""
+        self.title_index = None
+        self.author_index = None
+
+    def append(self, row) -> None:
+        book_id, title, author, isbn, total, available, row_version = row
+        self.positions[book_id] = len(self.ids)
+        self.isbn_positions[isbn] = len(self.ids)
+        self.ids.append(book_id)
+        self.titles.append(sys.intern(title))
+        self.authors.append(sys.intern(author))
+        self.isbns.append(isbn)
+        self.total.append(total)
+        self.available.append(available)
+        self.row_versions.append(row_version)
+        self.titles_lower.append(sys.intern(title.lower()))
+        self.authors_lower.append(sys.intern(author.lower()))
+        if self.title_index is not None:
+            self.title_index.add(len(self.ids) - 1, self.titles_lower[-1])
+        if self.author_index is not None:
+            self.author_index.add(len(self.ids) - 1, self.authors_lower[-1])
+
+    def sort(self) -> None:
+        titles, ids = self.titles, self.ids
+        self.order = array('q', sorted(range(len(ids)), key=lambda p: (titles[p], ids[p])))
+        self.rank = array('q', bytes(8 * len(ids)))
+        for rank, position in enumerate(self.order):
+            self.rank[position] = rank
+
+    def record(self, position: int) -> BookRecord:
+        return BookRecord((self.ids[position], self.titles[position], self.authors[position],
+                           self.isbns[position], self.total[position], self.available[position],
+                           self.row_versions[position]))
+
+class CatalogView(Sequence):
+    """
+    Read-only sequence of book records in title order, backed by snapshot
+    columns. Records are built as they are read.
+    """
+
+    __slots__ = ('_columns', '_positions')
+
+    def __init__(self, columns: _Columns, positions=None):
+        self._columns = columns
+        self._positions = columns.order if positions is None else positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CatalogView(self._columns, self._positions[index])
+        return self._columns.record(self._positions[index])
+
+    def __iter__(self) -> Iterator[BookRecord]:
+        record = self._columns.record
+        for position in self._positions:
+            yield record(position)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, CatalogView)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def search(self, term: str, search_type: str) -> 'CatalogView':
+        """
+        Books matching an already stripped, lower-cased term: substring of the
+        title or author, or exact ISBN (compared as given).
+        """
+        columns = self._columns
+        if search_type == 'isbn':
+            position = columns.isbn_positions.get(term)
+            in_view = position is not None and (self._positions is columns.order or position in self._positions)
+            return CatalogView(columns, [position] if in_view else [])
+        haystack = columns.titles_lower if search_type == 'title' else columns.authors_lower
+        if len(term) < 3:
+            # Shorter than a trigram: scan
+            return CatalogView(columns, [p for p in self._positions if term in haystack[p]])
+        candidates = columns.index(search_type).candidates(term, limit=len(columns.ids))
+        matches = self._restrict([p for p in candidates if term in haystack[p]])
+        matches.sort(key=columns.rank.__getitem__)
+        return CatalogView(columns, matches)
+
+    def similar(self, term: str, search_type: str, threshold: float = DEFAULT_SIMILARITY) -> 'CatalogView':
+        """
+        Books whose title or author resembles a lower-cased term despite
+        typos, most similar first (see TrigramIndex.similar).
+        """
+        columns = self._columns
+        scored = columns.index(search_type).similar(term, threshold, limit=len(columns.ids))
+        return CatalogView(columns, self._restrict([position for _, position in scored]))
+
+    def _restrict(self, positions: List[int]) -> List[int]:
+        """Keep only positions that are part of this view."""
+        if self._positions is self._columns.order:
+            return positions
+        allowed = set(self._positions)
+        return [p for p in positions if p in allowed]
+
+class _PrefixEntry:
+    """A completion index and the columns it was built over."""
+
+    __slots__ = ('columns', 'search_type', 'index')
+
+    def __init__(self, columns: _Columns, search_type: str, index: PrefixIndex):
+        self.columns = columns
+        self.search_type = search_type
+        self.index = index
+
+    def add_loans(self, book_ids: List[int]) -> None:
+        """Count one more loan for each book; books added since the build are skipped."""
+        columns = self.columns
+        lowered = columns.titles_lower if self.search_type == 'title' else columns.authors_lower
+        for book_id in book_ids:
+            position = columns.positions.get(book_id)
+            if position is not None:
+                self.index.add_popularity(normalize(lowered[position]), 1)
+
+class CatalogSnapshot:
+    """The process's columnar copy of the books table, refreshed incrementally."""
+
+    def __init__(self):
+        self._columns = None
+        self._watcher = CatalogWatcher()
+        self._lock = threading.Lock()
+        # search type -> _PrefixEntry for the latest columns it was built over
+        self._prefix_indexes = {}
+        # search type -> thread rebuilding its index
+        self._prefix_builds = {}
+        self._prefix_lock = threading.Lock()
+        # Loans per book ID, counted through borrow record _loans_through
+        self._loans = None
+        self._loans_through = 0
+        # (database, catalog version) the loan counts were last topped up at
+        self._loans_synced = None
+        # Bumped by clear(), so builds started before it are discarded
+        self._generation = 0
+        # (database, catalog version) the columns reflect
+        self._synced = None
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def view(self) -> CatalogView:
+        """All books in title order, as of the latest committed catalog version."""
+        with self._lock:
+            try:
+                if self._watcher.poll() or self._columns is None:
+                    self._refresh()
+            except sqlite3.Error:
+                self._watcher.close()
+                self._synced = None
+                self._refresh()
+            return CatalogView(self._columns)
+
+    def _refresh(self) -> None:
+        database, version = self._watcher.database, self._watcher.version
+        if self._columns is None or self._synced is None or self._synced[0] != database:
+            self._full_load()
+        else:
+            self._merge(self._synced[1])
+        self._synced = (database, version) if version is not None else None
+
+    def _full_load(self) -> None:
+        conn = get_db_connection()
+        try:
+            rows = _execute_plain(conn, f'SELECT {BOOK_COLUMNS} FROM books').fetchall()
+        finally:
+            conn.close()
+        columns = _Columns()
+        for row in rows:
+            columns.append(row)
+        columns.sort()
+        self._columns = columns
+        self.full_loads += 1
+
+    def _merge(self, since_version: int) -> None:
+        conn = get_db_connection()
+        try:
+            rows = _execute_plain(conn, f'SELECT {BOOK_COLUMNS} FROM books WHERE row_version > ?',
+                                  (since_version,)).fetchall()
+        finally:
+            conn.close()
+        columns = self._columns
+        changed_text = [row for row in rows if row[0] not in columns.positions or
+                        self._text_changed(columns, columns.positions[row[0]], row)]
+        drop_indexes = False
+        if changed_text:
+            # New rows or changed titles: build new columns for later views
+            columns = columns.copy()
+        for row in rows:
+            position = columns.positions.get(row[0])
+            if position is None:
+                columns.append(row)
+                continue
+            if self._text_changed(columns, position, row):
+                drop_indexes = True
+                del columns.isbn_positions[columns.isbns[position]]
+                columns.titles[position] = sys.intern(row[1])
+                columns.authors[position] = sys.intern(row[2])
+                columns.isbns[position] = row[3]
+                columns.titles_lower[position] = sys.intern(row[1].lower())
+                columns.authors_lower[position] = sys.intern(row[2].lower())
+                columns.isbn_positions[row[3]] = position
+            columns.total[position] = row[4]
+            columns.available[position] = row[5]
+            columns.row_versions[position] = row[6]
+        if changed_text:
+            if drop_indexes:
+                columns.drop_indexes()
+            columns.sort()
+            self._columns = columns
+        self.incremental_loads += 1
+
+    def prefix_index(self, search_type: str, wait: bool = False) -> PrefixIndex:
+        """
+        Completion index over the current titles or authors, built on first
+        use. After books are added or renamed the previous index is returned
+        while a new one is built in the background, unless `wait` is set.
+        """
+        columns = self.view()._columns
+        with self._prefix_lock:
+            synced = self._synced
+            path = synced[0][0] if synced else None
+            if synced and self._loans_synced and synced[0] != self._loans_synced[0]:
+                # Another database: nothing counted or built so far applies
+                self._prefix_indexes.clear()
+                self._loans = None
+            if self._loans is None or self._loans_synced != synced:
+                self._top_up_loans(path)
+                self._loans_synced = synced
+            built = self._prefix_indexes.get(search_type)
+            if built is not None and built.columns is columns:
+                return built.index
+            if built is not None and not wait:
+                if search_type not in self._prefix_builds:
+                    thread = threading.Thread(target=self._rebuild_prefix_index, args=(columns, search_type, path),
+                                              name=f'prefix-index-{search_type}', daemon=True)
+                    self._prefix_builds[search_type] = thread
+                    thread.start()
+                return built.index
+        return self._build_prefix_index(columns, search_type, path)
+
+    def build_indexes(self) -> CatalogView:
+        """
+        Build the trigram and completion indexes of the current catalog now
+        instead of on the first search that needs them. Returns the view.
+        """
+        view = self.view()
+        for search_type in ('title', 'author'):
+            view._columns.index(search_type)
+            self.prefix_index(search_type)
+        return view
+
+    def _rebuild_prefix_index(self, columns: _Columns, search_type: str, path: Optional[str]) -> None:
+        try:
+            self._build_prefix_index(columns, search_type, path)
+        except sqlite3.Error:
+            logger.exception('Rebuilding the %s completion index failed', search_type)
+        finally:
+            with self._prefix_lock:
+                if self._prefix_builds.get(search_type) is threading.current_thread():
+                    del self._prefix_builds[search_type]
+
+    def _build_prefix_index(self, columns: _Columns, search_type: str, path: Optional[str]) -> PrefixIndex:
+        with self._prefix_lock:
+            loans, through, generation = dict(self._loans or {}), self._loans_through, self._generation
+        conn = get_db_connection(path)
+        try:
+            searches = dict(_execute_plain(conn, 'SELECT query, count FROM search_queries WHERE search_type = ?',
+                                           (search_type,)))
+        finally:
+            conn.close()
+        labels = columns.titles if search_type == 'title' else columns.authors
+        lowered = columns.titles_lower if search_type == 'title' else columns.authors_lower
+        ids = columns.ids
+        # Interning hands back the lower-cased string itself when it is already normalized
+        index = PrefixIndex(((sys.intern(normalize(lowered[p])), labels[p], loans.get(ids[p], 0))
+                             for p in range(len(ids))), searches)
+        entry = _PrefixEntry(columns, search_type, index)
+        with self._prefix_lock:
+            if generation == self._generation:
+                if through < self._loans_through:
+                    # Loans counted while this index was being built
+                    loans_since = self._loans_after(through, self._loans_through, path)
+                    entry.add_loans([book_id for _, book_id in loans_since])
+                self._prefix_indexes[search_type] = entry
+        return index
+
+    def _top_up_loans(self, path: Optional[str]) -> None:
+        """Count the loans made since the last call (all of them on the first); caller holds _prefix_lock."""
+        if self._loans is None:
+            conn = get_db_connection(path)
+            try:
+                self._loans_through = _execute_plain(
+                    conn, 'SELECT COALESCE(MAX(id), 0) FROM borrow_records').fetchone()[0]
+                self._loans = dict(_execute_plain(
+                    conn, 'SELECT book_id, COUNT(*) FROM borrow_records WHERE id <= ? GROUP BY book_id',
+                    (self._loans_through,)))
+            finally:
+                conn.close()
+            return
+        rows = self._loans_after(self._loans_through, None, path)
+        if not rows:
+            return
+        self._loans_through = rows[-1][0]
+        book_ids = [book_id for _, book_id in rows]
+        for book_id in book_ids:
+            self._loans[book_id] = self._loans.get(book_id, 0) + 1
+        for entry in self._prefix_indexes.values():
+            entry.add_loans(book_ids)
+
+    @staticmethod
+    def _loans_after(after: int, through: Optional[int], path: Optional[str]) -> List[Tuple[int, int]]:
+        """(borrow record ID, book ID) of the loans after `after` up to `through`, by rowid range."""
+        conn = get_db_connection(path)
+        try:
+            return _execute_plain(conn, 'SELECT id, book_id FROM borrow_records WHERE id > ? AND id <= ? ORDER BY id',
+                                  (after, sys.maxsize if through is None else through)).fetchall()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _text_changed(columns: _Columns, position: int, row) -> bool:
+        return (columns.titles[position] != row[1] or columns.authors[position] != row[2]
+                or columns.isbns[position] != row[3])
+
+    def clear(self) -> None:
+        """Drop the snapshot; the next read loads it again."""
+        with self._lock:
+            self._columns = None
+            self._synced = None
+            self._watcher.close()
+        with self._prefix_lock:
+            self._prefix_indexes.clear()
+            self._prefix_builds.clear()
+            self._loans = None
+            self._loans_through = 0
+            self._loans_synced = None
+            self._generation += 1
+
+# Snapshot for this process
+catalog_snapshot = CatalogSnapshot()
+
+def get_all_books() -> CatalogView:
+    """All books ordered by title, served from the in-memory catalog snapshot."""
+    return catalog_snapshot.view()
@@ -4,14 +4,39 @@ Contains all the core business logic for the Library Management System
 """
 
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 from database import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books, get_patron_borrowed_books
+    get_patron_borrowed_books, return_book_to_next_hold,
+    insert_hold, cancel_waiting_hold, get_patron_holds,
+    get_books_by_ids, get_books_by_isbns, borrow_books_batch, return_books_batch,
+    search_books, iter_search_books, BOOK_SORTS
 )
-from services.payment_service import PaymentGateway
+from services.catalog_snapshot import CatalogView, catalog_snapshot, get_all_books
+from services.trigram_index import DEFAULT_SIMILARITY, similarity
+from instrumentation.tracing import traced, tracer
 
+if TYPE_CHECKING:
+    # Imported lazily at first use: the payment stack (requests etc.) is only
+    # needed by the payment functions and is slow to import at startup
+    from services.payment_service import PaymentGateway
+
+# Maximum number of books a patron may have out at once
+MAX_BORROWED_BOOKS = 5
+
+# Completions returned by default / at most by suggest_search_terms
+SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 50
+
+# Most queries accepted by one search_books_batch call
+MAX_SEARCH_BATCH = 5000
+
+# Keyword criteria accepted by search_books_in_catalog, answered by one SQL query
+SEARCH_CRITERIA = ('title', 'author', 'isbn', 'available', 'min_copies', 'max_copies',
+                   'sort', 'limit', 'offset')
+
+@traced
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
     Add a new book to the catalog.
@@ -57,6 +82,7 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     else:
         return False, "Database error occurred while adding the book."
 
+@traced
 def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
@@ -84,8 +110,8 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     # Check patron's current borrowed books count
     current_borrowed = get_patron_borrow_count(patron_id)
     
-    if current_borrowed > 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    if current_borrowed >= MAX_BORROWED_BOOKS:
+        return False, f"You have reached the maximum borrowing limit of {MAX_BORROWED_BOOKS} books."
     
     # Create borrow record
     borrow_date = datetime.now()
@@ -105,6 +131,7 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
 
 #  Assignment 2 implementations
 
+@traced
 def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Process book return by a patron.
@@ -152,23 +179,232 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
         late_fee = (7 * 0.50) + ((days_overdue - 7) * 1.00)
     late_fee = min(late_fee, 15.00)  # Cap at $15
     
-    # update the borrow record with the return date
-    update_success = update_borrow_record_return_date(patron_id, book_id, return_date)
-    if not update_success:
+    # close the borrow record and, in the same transaction, lend the copy to
+    # the next patron waiting for it or put it back on the shelf
+    outcome = return_book_to_next_hold(patron_id, book_id, return_date,
+                                       return_date + timedelta(days=14), MAX_BORROWED_BOOKS)
+    if outcome is None:
         return False, "Database error occurred while updating return date."
-    
-    # update the book availability
-    availability_success = update_book_availability(book_id, 1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
+    if not outcome['returned']:
+        # Returned by a concurrent request since the loans were read
+        return False, f'Book "{book["title"]}" was not borrowed by patron ID {patron_id}.'
     
     # calculate any fees owed
     if late_fee > 0.00:
-        return True, f'Book "{book["title"]}" returned. Late fee owed: ${late_fee:.2f}.'
+        message = f'Book "{book["title"]}" returned. Late fee owed: ${late_fee:.2f}.'
     else:
-        return True, f'Book "{book["title"]}" returned successfully. No late fees owed.'
+        message = f'Book "{book["title"]}" returned successfully. No late fees owed.'
+    if outcome['lent_to']:
+        message += ' The copy has been lent to the next patron on the hold list.'
+    return True, message
     
 
+@traced
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Put a patron in the queue for a book with no copy available. Returned
+    copies are lent to the queue in order (see return_book_by_patron).
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to wait for
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    book = get_book_by_id(book_id)
+    if not book:
+        return False, "Book not found."
+
+    if book['available_copies'] > 0:
+        return False, "This book is available; borrow it instead of placing a hold."
+
+    if any(loan['book_id'] == book_id for loan in get_patron_borrowed_books(patron_id)):
+        return False, f'You already have "{book["title"]}" on loan.'
+
+    position = insert_hold(patron_id, book_id, datetime.now())
+    if position is None:
+        return False, f'You already have a hold on "{book["title"]}".'
+
+    return True, f'Hold placed on "{book["title"]}". You are number {position} in the queue.'
+
+@traced
+def cancel_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Take a patron out of a book's hold queue.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    cancelled_at = datetime.now()
+    if not cancel_waiting_hold(patron_id, book_id, cancelled_at, cancelled_at + timedelta(days=14),
+                               MAX_BORROWED_BOOKS):
+        return False, "No hold on this book for this patron."
+
+    return True, "Hold cancelled."
+
+def get_patron_hold_positions(patron_id: str) -> Dict:
+    """
+    A patron's waiting holds and their position in each book's queue
+    (1 is next in line).
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return {
+            'error': "Invalid patron ID."
+        }
+
+    return {
+        'patron_id': patron_id,
+        'holds': get_patron_holds(patron_id)
+    }
+
+def _late_fee_for_due_date(due_date: datetime, as_of: datetime) -> float:
+    """Late fee owed for a loan due on due_date when returned at as_of."""
+    days_overdue = max(0, (as_of - due_date).days)
+    if days_overdue <= 7:
+        late_fee = days_overdue * 0.50
+    else:
+        late_fee = (7 * 0.50) + ((days_overdue - 7) * 1.00)
+    return min(late_fee, 15.00)  # Cap at $15
+
+
+@traced
+def borrow_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Allow a patron to borrow several books at once.
+
+    Every loan is recorded in a single database transaction, which also
+    checks the borrowing limit (MAX_BORROWED_BOOKS open loans) once for the
+    whole request.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books to borrow
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-book dicts
+        with 'book_id', 'success' and 'message')
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+
+    if not book_ids:
+        return False, "No book IDs provided.", []
+
+    books = get_books_by_ids(list(dict.fromkeys(book_ids)))
+
+    results = []
+    to_borrow = []
+    for book_id in book_ids:
+        book = books.get(book_id)
+        if book_id in to_borrow:
+            message = "Duplicate book ID in request."
+        elif not book:
+            message = "Book not found."
+        elif book['available_copies'] <= 0:
+            message = "This book is currently not available."
+        else:
+            to_borrow.append(book_id)
+            results.append(None)
+            continue
+        results.append({'book_id': book_id, 'success': False, 'message': message})
+
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=14)
+    outcome = borrow_books_batch(patron_id, to_borrow, borrow_date, due_date, MAX_BORROWED_BOOKS) \
+        if to_borrow else {'borrowed': [], 'over_limit': []}
+    borrowed = outcome['borrowed'] if outcome is not None else None
+
+    for index, book_id in enumerate(book_ids):
+        if results[index] is not None:
+            continue
+        if borrowed is None:
+            result = {'success': False, 'message': "Database error occurred while creating borrow record."}
+        elif book_id in outcome['over_limit']:
+            result = {'success': False,
+                      'message': f"You have reached the maximum borrowing limit of {MAX_BORROWED_BOOKS} books."}
+        elif book_id not in borrowed:
+            result = {'success': False, 'message': "This book is currently not available."}
+        else:
+            result = {'success': True,
+                      'message': f'Successfully borrowed "{books[book_id]["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'}
+        results[index] = {'book_id': book_id, **result}
+
+    borrowed_count = len(borrowed or [])
+    return borrowed_count > 0, f"Borrowed {borrowed_count} of {len(book_ids)} books.", results
+
+
+@traced
+def return_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Process the return of several books by a patron at once.
+
+    All return dates and availability changes are recorded in a single
+    database transaction. Late fees are reported per book.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books being returned
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-book dicts
+        with 'book_id', 'success', 'message' and 'late_fee')
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+
+    if not book_ids:
+        return False, "No book IDs provided.", []
+
+    borrowed = {}
+    for borrowed_book in get_patron_borrowed_books(patron_id):
+        borrowed.setdefault(borrowed_book['book_id'], borrowed_book)
+
+    results = []
+    to_return = []
+    for book_id in book_ids:
+        if book_id not in borrowed or book_id in to_return:
+            results.append({'book_id': book_id, 'success': False, 'late_fee': 0.00,
+                            'message': f"Book ID {book_id} was not borrowed by patron ID {patron_id}."})
+        else:
+            to_return.append(book_id)
+            results.append(None)
+
+    return_date = datetime.now()
+    returned = return_books_batch(patron_id, to_return, return_date, return_date + timedelta(days=14),
+                                  MAX_BORROWED_BOOKS) if to_return else []
+
+    for index, book_id in enumerate(book_ids):
+        if results[index] is not None:
+            continue
+        book = borrowed[book_id]
+        if returned is None:
+            result = {'success': False, 'late_fee': 0.00,
+                      'message': "Database error occurred while updating return date."}
+        elif book_id not in returned:
+            result = {'success': False, 'late_fee': 0.00,
+                      'message': f"Book ID {book_id} was not borrowed by patron ID {patron_id}."}
+        else:
+            late_fee = _late_fee_for_due_date(book['due_date'], return_date)
+            if late_fee > 0.00:
+                message = f'Book "{book["title"]}" returned. Late fee owed: ${late_fee:.2f}.'
+            else:
+                message = f'Book "{book["title"]}" returned successfully. No late fees owed.'
+            result = {'success': True, 'late_fee': late_fee, 'message': message}
+        results[index] = {'book_id': book_id, **result}
+
+    returned_count = len(returned or [])
+    total_fees = sum(result['late_fee'] for result in results)
+    return returned_count > 0, f"Returned {returned_count} of {len(book_ids)} books. Total late fees owed: ${total_fees:.2f}.", results
+
+
+@traced
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     """
     Calculate late fees for a specific book.
@@ -215,12 +451,103 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     }
 
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+def _matching_books(books: Iterable[Dict], search_term: str, search_type: str,
+                    fuzzy: bool = False) -> Iterator[Dict]:
+    """
+    Yield the books matching a validated search term and type. With fuzzy,
+    titles and authors resembling the term despite typos are yielded, most
+    similar first.
+    """
+    search_term = search_term.strip().lower()
+    fuzzy = fuzzy and search_type != 'isbn'
+
+    if isinstance(books, CatalogView):
+        # Matched against the snapshot's pre-lowered columns and trigram indexes
+        if fuzzy:
+            yield from books.similar(search_term, search_type)
+        else:
+            yield from books.search(search_term, search_type)
+        return
+
+    if fuzzy:
+        scored = [(similarity(search_term, book[search_type].lower()), index, book)
+                  for index, book in enumerate(books)]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        for score, _, book in scored:
+            if score >= DEFAULT_SIMILARITY:
+                yield book
+        return
+
+    if search_type == 'title':
+        for book in books:
+            if search_term in book['title'].lower():
+                yield book
+    
+    elif search_type == 'author':
+        for book in books:
+            if search_term in book['author'].lower():
+                yield book
+    
+    elif search_type == 'isbn':
+        for book in books:
+            if search_term == book['isbn']:
+                yield book
+
+
+def _search_criteria(search_term: str, search_type: str, criteria: Dict) -> Optional[Dict]:
+    """
+    Combine the search term with further criteria into arguments for
+    database.search_books, or None if any of them is invalid.
+    """
+    if set(criteria) - set(SEARCH_CRITERIA):
+        return None
+    criteria = {name: value for name, value in criteria.items() if value is not None}
+
+    for name in ('title', 'author', 'isbn'):
+        if name in criteria:
+            criteria[name] = str(criteria[name]).strip()
+            if not criteria[name]:
+                del criteria[name]
+
+    if search_term and search_term.strip():
+        # The term is one more criterion, unless its type is already given
+        if search_type not in ['title', 'author', 'isbn'] or search_type in criteria:
+            return None
+        criteria[search_type] = search_term.strip()
+
+    for name in ('min_copies', 'max_copies', 'limit', 'offset'):
+        value = criteria.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+            return None
+
+    if not isinstance(criteria.get('available', False), bool):
+        return None
+
+    if criteria.get('sort', 'title') not in BOOK_SORTS:
+        return None
+
+    return criteria or None
+
+
+@traced
+def search_books_in_catalog(search_term: str, search_type: str, fuzzy: bool = False, **criteria) -> List[Dict]:
     """
     Search for books in the catalog.
     
     TODO: Implement R6 as per requirements
+
+    fuzzy=True matches titles and authors with typos (trigram similarity).
+
+    Further keyword criteria (SEARCH_CRITERIA) are combined with the term
+    and answered by a single SQL query: title, author (case-insensitive
+    substrings), isbn (exact), available (bool), min_copies / max_copies
+    (total copies), sort (a key of database.BOOK_SORTS), limit and offset.
+    The search term may then be empty. Fuzzy matching cannot be combined
+    with criteria.
     """
+    if criteria:
+        sql_criteria = None if fuzzy else _search_criteria(search_term, search_type, criteria)
+        return search_books(**sql_criteria) if sql_criteria is not None else []
 
     # validate the search
     if not search_term or not search_term.strip():
@@ -229,32 +556,101 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     if search_type not in ['title', 'author', 'isbn']:
         return []
     
+    return list(_matching_books(get_all_books(), search_term, search_type, fuzzy))
+
+
+def iter_search_books_in_catalog(search_term: str, search_type: str, fuzzy: bool = False,
+                                 **criteria) -> Iterator[Dict]:
+    """
+    Search for books in the catalog, yielding matches as rows are read.
+
+    Same matching rules and criteria as search_books_in_catalog, but
+    matches are turned into records one at a time instead of collected in
+    a list.
+    """
+    if criteria:
+        sql_criteria = None if fuzzy else _search_criteria(search_term, search_type, criteria)
+        return iter_search_books(**sql_criteria) if sql_criteria is not None else iter(())
+
+    if not search_term or not search_term.strip():
+        return iter(())
+
+    if search_type not in ['title', 'author', 'isbn']:
+        return iter(())
+
+    return _matching_books(get_all_books(), search_term, search_type, fuzzy)
+
+@traced
+def search_books_batch(queries: List[Tuple[str, str]]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Run many (search term, search type) searches at once, e.g. to check a
+    list of ISBNs and titles against the catalog.
+
+    ISBN searches are looked up together with IN (...) queries; title and
+    author searches all use the same catalog snapshot view, so the batch
+    sees one consistent catalog without a query per item.
+
+    Args:
+        queries: (search_term, search_type) pairs, matched like search_books_in_catalog
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-query dicts
+        with 'index', 'search_term', 'search_type' and either 'books' or 'error',
+        in input order)
+    """
+    if not queries:
+        return False, "No search queries provided.", []
+
+    if len(queries) > MAX_SEARCH_BATCH:
+        return False, f"At most {MAX_SEARCH_BATCH} search queries can be run at once.", []
 
-    # get all books
-    all_books = get_all_books()
     results = []
+    isbns = []
+    text_search = False
+    for index, (search_term, search_type) in enumerate(queries):
+        result = {'index': index, 'search_term': search_term, 'search_type': search_type}
+        if not isinstance(search_term, str) or not search_term.strip():
+            result['error'] = "Search term is required."
+        elif search_type not in ['title', 'author', 'isbn']:
+            result['error'] = "Search type must be title, author or isbn."
+        elif search_type == 'isbn':
+            isbns.append(search_term.strip())
+        else:
+            text_search = True
+        results.append(result)
 
+    books_by_isbn = get_books_by_isbns(isbns) if isbns else {}
+    catalog = get_all_books() if text_search else None
 
+    for result in results:
+        if 'error' in result:
+            continue
+        if result['search_type'] == 'isbn':
+            book = books_by_isbn.get(result['search_term'].strip())
+            result['books'] = [book] if book else []
+        else:
+            result['books'] = list(_matching_books(catalog, result['search_term'], result['search_type']))
 
-    search_term = search_term.strip().lower()
+    errors = sum(1 for result in results if 'error' in result)
+    return errors < len(results), f"Ran {len(results) - errors} of {len(results)} searches.", results
 
-    if search_type == 'title':
-        for book in all_books:
-            if search_term in book['title'].lower():
-                results.append(book)
-    
-    elif search_type == 'author':
-        for book in all_books:
-            if search_term in book['author'].lower():
-                results.append(book)
-    
-    elif search_type == 'isbn':
-        for book in all_books:
-            if search_term == book['isbn']:
-                results.append(book)
-    
-    return results
+def suggest_search_terms(prefix: str, search_type: str, limit: int = SUGGESTION_LIMIT) -> List[str]:
+    """
+    Titles or authors starting with a typed prefix, for autocomplete.
+
+    Matching ignores case and repeated spaces; the most borrowed come first.
+    """
+    if not prefix or not prefix.strip():
+        return []
+
+    if search_type not in ['title', 'author']:
+        return []
+
+    limit = max(0, min(limit, MAX_SUGGESTION_LIMIT))
+    index = catalog_snapshot.prefix_index(search_type)
+    return [label for label, _ in index.complete(prefix.lstrip(), limit)]
 
+@traced
 def get_patron_status_report(patron_id: str) -> Dict:
     """
     Get status report for a patron.
@@ -273,15 +669,17 @@ def get_patron_status_report(patron_id: str) -> Dict:
     total_late_fees = 0.00
     books_with_fees = []
 
+    # Fees come from the loans already loaded rather than one lookup per book
+    now = datetime.now()
     for book in borrowed:
-        fee_info = calculate_late_fee_for_book(patron_id, book['book_id'])
-        if fee_info['fee_amount'] > 0:
-            total_late_fees += fee_info['fee_amount']
+        fee_amount = _late_fee_for_due_date(book['due_date'], now)
+        if fee_amount > 0:
+            total_late_fees += fee_amount
             books_with_fees.append({ 
                 'book_id': book['book_id'], 
                  'title': book['title'], 
-                 'days_overdue': fee_info['days_overdue'], 
-                 'fee_amount': fee_info['fee_amount'] 
+                 'days_overdue': max(0, (now - book['due_date']).days), 
+                 'fee_amount': fee_amount 
             })
             
     return {
@@ -294,7 +692,8 @@ def get_patron_status_report(patron_id: str) -> Dict:
 
 
     
-def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+@traced
+def pay_late_fees(patron_id: str, book_id: int, payment_gateway: 'PaymentGateway' = None) -> Tuple[bool, str, Optional[str]]:
     """
     Process payment for late fees using external payment gateway.
     
@@ -338,16 +737,18 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     
     # Use provided gateway or create new one
     if payment_gateway is None:
+        from services.payment_service import PaymentGateway
         payment_gateway = PaymentGateway()
     
     # Process payment through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
     try:
-        success, transaction_id, message = payment_gateway.process_payment(
-            patron_id=patron_id,
-            amount=fee_amount,
-            description=f"Late fees for '{book['title']}'"
-        )
+        with tracer.span('payment_gateway.process_payment', patron_id=patron_id, amount=fee_amount):
+            success, transaction_id, message = payment_gateway.process_payment(
+                patron_id=patron_id,
+                amount=fee_amount,
+                description=f"Late fees for '{book['title']}'"
+            )
         
         if success:
             return True, f"Payment successful! {message}", transaction_id
@@ -359,7 +760,8 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         return False, f"Payment processing error: {str(e)}", None
 
 
-def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
+@traced
+def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: 'PaymentGateway' = None) -> Tuple[bool, str]:
     """
     Refund a late fee payment (e.g., if book was returned on time but fees were charged in error).
     
@@ -385,12 +787,14 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     
     # Use provided gateway or create new one
     if payment_gateway is None:
+        from services.payment_service import PaymentGateway
         payment_gateway = PaymentGateway()
     
     # Process refund through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN YOUR TESTS!
     try:
-        success, message = payment_gateway.refund_payment(transaction_id, amount)
+        with tracer.span('payment_gateway.refund_payment', transaction_id=transaction_id, amount=amount):
+            success, message = payment_gateway.refund_payment(transaction_id, amount)
         
         if success:
             return True, message
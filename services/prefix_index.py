@@ -0,0 +1,137 @@
+"""
+Prefix Index - most popular completions of a typed title or author prefix
+
+Distinct normalized texts are kept in a sorted list, so the texts starting
+with a prefix form one contiguous range found with two binary searches.
+A segment tree over the list holds, for every node, the position of its
+most popular text. The k most popular texts of a range are then pulled out
+with a small heap in O(k log n), however many texts share the prefix.
+Raising one text's popularity updates its path of the tree in O(log n).
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Sorts after every character a text can contain
+_MAX_CHAR = chr(0x10FFFF)
+
+def normalize(text: str) -> str:
+    """Lower-case and collapse runs of whitespace, as texts are matched."""
+    return ' '.join(text.lower().split())
+
+class PrefixIndex:
+    """
+    Completion index over (key, label, popularity) entries.
+
+    Keys must be normalized; entries sharing a key are merged, keeping the
+    first label and summing their popularity. `boosts` adds popularity to
+    keys once each, e.g. how often a text was searched for. Keys are fixed
+    once built; popularity can be raised with add_popularity.
+    """
+
+    __slots__ = ('_keys', '_labels', '_popularity', '_tree', '_leaves')
+
+    def __init__(self, entries: Iterable[Tuple[str, str, int]], boosts: Optional[Dict[str, int]] = None):
+        merged = {}
+        for key, label, popularity in entries:
+            if not key:
+                continue
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [label, popularity]
+            else:
+                entry[1] += popularity
+        for key, boost in (boosts or {}).items():
+            if key in merged:
+                merged[key][1] += boost
+        self._keys = sorted(merged)
+        self._labels = [merged[key][0] for key in self._keys]
+        self._popularity = array('q', (merged[key][1] for key in self._keys))
+        self._build_tree()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _better(self, a: int, b: int) -> int:
+        """The more popular of two positions (-1 for none); ties go to the earlier one."""
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        popularity = self._popularity
+        if popularity[b] > popularity[a] or (popularity[b] == popularity[a] and b < a):
+            return b
+        return a
+
+    def _build_tree(self) -> None:
+        leaves = 1
+        while leaves < len(self._keys):
+            leaves *= 2
+        tree = array('l', [-1]) * (2 * leaves)
+        tree[leaves:leaves + len(self._keys)] = array('l', range(len(self._keys)))
+        for node in range(leaves - 1, 0, -1):
+            tree[node] = self._better(tree[2 * node], tree[2 * node + 1])
+        self._tree = tree
+        self._leaves = leaves
+
+    def _best(self, lo: int, hi: int) -> int:
+        """Most popular position in [lo, hi), or -1 if the range is empty."""
+        tree, better = self._tree, self._better
+        best = -1
+        lo += self._leaves
+        hi += self._leaves
+        while lo < hi:
+            if lo & 1:
+                best = better(best, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = better(best, tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def add_popularity(self, key: str, amount: int) -> bool:
+        """Add to the popularity of a normalized key. Returns False if it is not indexed."""
+        position = bisect_left(self._keys, key)
+        if position == len(self._keys) or self._keys[position] != key:
+            return False
+        self._popularity[position] += amount
+        tree = self._tree
+        node = (position + self._leaves) >> 1
+        while node:
+            tree[node] = self._better(tree[2 * node], tree[2 * node + 1])
+            node >>= 1
+        return True
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        (label, popularity) of up to `limit` texts starting with the
+        normalized prefix, most popular first, then alphabetically.
+        """
+        key = normalize(prefix)
+        if not key or limit <= 0:
+            return []
+        if prefix[-1:].isspace():
+            # A typed space ends the word: "the " should not complete to "theory"
+            key += ' '
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + _MAX_CHAR, lo)
+        popularity = self._popularity
+        heap = []
+
+        def push(start: int, stop: int) -> None:
+            best = self._best(start, stop)
+            if best >= 0:
+                heapq.heappush(heap, (-popularity[best], best, start, stop))
+
+        push(lo, hi)
+        completions = []
+        while heap and len(completions) < limit:
+            _, best, start, stop = heapq.heappop(heap)
+            completions.append((self._labels[best], popularity[best]))
+            push(start, best)
+            push(best + 1, stop)
+        return completions
@@ -0,0 +1,185 @@
+"""
+Search Log - aggregated counts of the searches users run
+
+Searches are normalized (lower-cased, whitespace collapsed) and counted in
+memory, then a background thread adds the counts to the search_queries
+table every FLUSH_INTERVAL seconds, one row per distinct search. Request
+handlers never wait for the database. Counts of the last interval are lost
+if a process is killed; they are statistics, not records.
+
+After a worker starts, its catalog snapshot, trigram indexes and
+autocomplete indexes are built in a background thread (see
+prewarm_in_background). Search results themselves are not cached.
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Optional
+from flask import current_app, make_response, request
+import database
+from services.catalog_snapshot import catalog_snapshot
+from services.prefix_index import normalize
+
+logger = logging.getLogger('library.search')
+
+# Seconds between flushes of the in-memory counts
+FLUSH_INTERVAL = 5.0
+
+# Distinct searches held in memory before flushing early
+MAX_PENDING = 10000
+
+# Longer search terms are cut to this many characters before counting
+MAX_QUERY_LENGTH = 200
+
+class SearchLog:
+    """Counts searches in memory and flushes them to search_queries in the background."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        # database path -> Counter of (search_type, query)
+        self._pending: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, search_term: str, search_type: str) -> None:
+        """Count one search; written to the database by the next flush."""
+        query = normalize(search_term)[:MAX_QUERY_LENGTH].rstrip()
+        if not query or search_type not in ('title', 'author', 'isbn'):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Counts and thread inherited from a parent process are not ours
+                self._pending = {}
+                self._thread = None
+                self._pid = os.getpid()
+            pending = self._pending.setdefault(database.DATABASE, Counter())
+            pending[(search_type, query)] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='search-log', daemon=True)
+                self._thread.start()
+            if len(pending) >= MAX_PENDING:
+                self._wake.set()
+
+    def flush(self) -> int:
+        """Write the pending counts now. Returns the number of distinct searches written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        written = 0
+        searched_at = datetime.now()
+        for path, counts in pending.items():
+            try:
+                ok = database.record_search_queries(dict(counts), searched_at, path)
+            except sqlite3.Error:
+                ok = False
+            if ok:
+                written += len(counts)
+            else:
+                logger.warning('Could not record %d searches in %s', len(counts), path)
+        return written
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Search log flush failed')
+
+# Search log for this process; flushed once more at exit
+search_log = SearchLog()
+atexit.register(search_log.flush)
+
+def prewarm_search_caches() -> Dict:
+    """
+    Load the catalog snapshot and build its trigram and autocomplete indexes
+    (ranked by the search counts), so the first searches after a start
+    don't pay for them.
+    """
+    return {'books': len(catalog_snapshot.build_indexes())}
+
+# Process that started prewarm_in_background, so each process prewarms once
+_prewarm_pid = None
+_prewarm_lock = threading.Lock()
+
+def prewarm_in_background() -> Optional[threading.Thread]:
+    """
+    Run prewarm_search_caches in a background thread, once per process.
+    Call it in each worker after the fork, so the caches it fills belong to
+    the worker. Returns the thread, or None if this process already started one.
+    """
+    global _prewarm_pid
+    with _prewarm_lock:
+        if _prewarm_pid == os.getpid():
+            return None
+        _prewarm_pid = os.getpid()
+    thread = threading.Thread(target=_prewarm, name='search-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+def _prewarm() -> None:
+    try:
+        summary = prewarm_search_caches()
+    except sqlite3.Error:
+        logger.exception('Prewarming the search caches failed')
+        return
+    logger.info('Prewarmed search caches: %(books)d books', summary)
+
+def close_before_fork() -> None:
+    """
+    Drop the snapshot and book cache with their database connections, so a
+    process about to fork workers hands none of them down.
+    """
+    catalog_snapshot.clear()
+    database.clear_book_cache()
+
+def register_search_log(app) -> None:
+    """
+    Record searches (SEARCH_LOG, on unless LIBRARY_SEARCH_LOG=0) and prewarm
+    the search indexes (SEARCH_PREWARM, on unless LIBRARY_PREWARM=0).
+    Prewarming runs in the background of each process that serves requests,
+    started by its first request (or by gunicorn's post_fork hook), never
+    while creating the app. The hook starting it removes itself once it has
+    run, so later requests don't pay for it.
+    """
+    app.config.setdefault('SEARCH_LOG', os.environ.get('LIBRARY_SEARCH_LOG', '1') != '0')
+    app.config.setdefault('SEARCH_PREWARM', os.environ.get('LIBRARY_PREWARM', '1') != '0')
+    app.extensions['search_log'] = search_log
+
+    def _start_prewarm():
+        # Replace the list rather than removing from it, so requests already
+        # running the hooks in other threads iterate an unchanged list
+        hooks = app.before_request_funcs.get(None, [])
+        app.before_request_funcs[None] = [hook for hook in hooks if hook is not _start_prewarm]
+        if app.config['SEARCH_PREWARM']:
+            prewarm_in_background()
+
+    app.before_request(_start_prewarm)
+
+def log_search(search_term: str, search_type: str) -> None:
+    """Count a search made through the web or API routes, if enabled."""
+    if current_app.config.get('SEARCH_LOG'):
+        search_log.record(search_term, search_type)
+
+def logs_search(view):
+    """
+    Count the search in the q and type arguments of a view's request once
+    it is answered with 200 or 304. Goes outside catalog_conditional, so
+    searches answered Not Modified are counted too.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code in (200, 304):
+            log_search(request.args.get('q', ''), request.args.get('type', 'title'))
+        return response
+
+    return wrapper
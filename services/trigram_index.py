@@ -0,0 +1,114 @@
+"""
+Trigram Index - substring and typo-tolerant matching over catalog text
+
+Every lower-cased title (or author) is split into three-character slices.
+A substring query of three or more characters can only match texts that
+contain all of its trigrams, so intersecting those posting lists gives a
+short candidate list to confirm with a plain `in` test. Mid-word matches
+such as "ockingb" work, unlike word-based full-text search.
+
+For fuzzy matching each word is padded (as in PostgreSQL's pg_trgm), and a
+text scores by the share of the query's trigrams it contains, so a typo
+only costs the few trigrams around it.
+"""
+
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Minimum share of the query's trigrams a text must contain in fuzzy mode
+DEFAULT_SIMILARITY = 0.5
+
+def substring_trigrams(text: str) -> Set[str]:
+    """Trigrams a text must contain to have `text` as a substring."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def word_trigrams(text: str) -> Set[str]:
+    """Trigrams of each word, padded with two spaces in front and one behind."""
+    trigrams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+def similarity(query: str, text: str) -> float:
+    """Share of the (lower-cased) query's word trigrams found in the text's."""
+    wanted = word_trigrams(query)
+    if not wanted:
+        return 0.0
+    return len(wanted & word_trigrams(text)) / len(wanted)
+
+class TrigramIndex:
+    """
+    Append-only inverted index from trigrams to text positions.
+
+    Positions are added in increasing order, so every posting list is
+    sorted. Both substring and padded word trigrams are indexed.
+    """
+
+    __slots__ = ('_postings', '_word_counts', 'size')
+
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+        # Number of padded word trigrams per position, for ranking ties
+        self._word_counts = array('l')
+        self.size = 0
+
+    def add(self, position: int, text: str) -> None:
+        """Index the lower-cased text stored at `position` (the next free position)."""
+        words = word_trigrams(text)
+        for trigram in substring_trigrams(text) | words:
+            postings = self._postings.get(trigram)
+            if postings is None:
+                postings = self._postings[trigram] = array('l')
+            postings.append(position)
+        self._word_counts.append(len(words))
+        self.size = position + 1
+
+    def candidates(self, term: str, limit: Optional[int] = None) -> Optional[List[int]]:
+        """
+        Positions whose text may contain `term`, in increasing order, or None if
+        the term is too short to use the index. `limit` excludes positions
+        at or above it (texts added after a snapshot was taken).
+        """
+        trigrams = substring_trigrams(term)
+        if not trigrams:
+            return None
+        lists = sorted((self._postings.get(trigram, ()) for trigram in trigrams), key=len)
+        if not lists[0]:
+            return []
+        result = set(lists[0])
+        for postings in lists[1:]:
+            result.intersection_update(postings)
+            if not result:
+                return []
+        if limit is not None:
+            return sorted(p for p in result if p < limit)
+        return sorted(result)
+
+    def similar(self, query: str, threshold: float = DEFAULT_SIMILARITY,
+                limit: Optional[int] = None) -> List[Tuple[float, int]]:
+        """
+        (score, position) of texts containing at least `threshold` of the
+        query's word trigrams, best first; among equal scores, texts with
+        fewer trigrams (closer in length) come first.
+        """
+        wanted = word_trigrams(query)
+        if not wanted:
+            return []
+        counts = Counter()
+        for trigram in wanted:
+            counts.update(self._postings.get(trigram, ()))
+        needed = threshold * len(wanted)
+        scored = [(shared / len(wanted), position) for position, shared in counts.items()
+                  if shared >= needed and (limit is None or position < limit)]
+        word_counts = self._word_counts
+        scored.sort(key=lambda item: (-item[0], word_counts[item[1]], item[1]))
+        return scored
+
+def build_index(texts: Iterable[str]) -> TrigramIndex:
+    """Index a sequence of lower-cased texts at positions 0, 1, 2, ..."""
+    index = TrigramIndex()
+    for position, text in enumerate(texts):
+        index.add(position, text)
+    return index
@@ -0,0 +1,173 @@
+"""
+Unit tests for borrow_books_by_patron and return_books_by_patron functions
+Tests batch checkout and return for R3/R4
+"""
+
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from services.library_service import borrow_books_by_patron, return_books_by_patron
+
+
+BOOKS = {
+    1: {"id": 1, "title": "Book One", "available_copies": 2},
+    2: {"id": 2, "title": "Book Two", "available_copies": 1},
+    3: {"id": 3, "title": "Book Three", "available_copies": 0},
+}
+
+
+def test_borrow_batch_all_available():
+    """Test borrowing several available books in one transaction"""
+    with patch('services.library_service.get_books_by_ids', return_value=BOOKS), \
+         patch('services.library_service.borrow_books_batch',
+               return_value={'borrowed': [1, 2], 'over_limit': []}) as mock_batch:
+
+        success, message, results = borrow_books_by_patron("123456", [1, 2])
+
+        assert success == True
+        assert "2 of 2" in message
+        assert [r['success'] for r in results] == [True, True]
+        mock_batch.assert_called_once()
+        assert mock_batch.call_args[0][1] == [1, 2]
+        assert mock_batch.call_args[0][4] == 5
+
+
+def test_borrow_batch_per_item_failures():
+    """Test that missing, unavailable and duplicate books are reported per item"""
+    with patch('services.library_service.get_books_by_ids', return_value=BOOKS), \
+         patch('services.library_service.borrow_books_batch',
+               return_value={'borrowed': [1], 'over_limit': []}) as mock_batch:
+
+        success, message, results = borrow_books_by_patron("123456", [1, 3, 99, 1])
+
+        assert success == True
+        assert [r['book_id'] for r in results] == [1, 3, 99, 1]
+        assert results[0]['success'] == True
+        assert "not available" in results[1]['message']
+        assert "not found" in results[2]['message']
+        assert "Duplicate" in results[3]['message']
+        assert mock_batch.call_args[0][1] == [1]
+
+
+def test_borrow_batch_respects_limit():
+    """Test that books over the patron limit, as counted in the transaction, are reported"""
+    with patch('services.library_service.get_books_by_ids', return_value=BOOKS), \
+         patch('services.library_service.borrow_books_batch',
+               return_value={'borrowed': [1], 'over_limit': [2]}) as mock_batch:
+
+        success, message, results = borrow_books_by_patron("123456", [1, 2])
+
+        assert results[0]['success'] == True
+        assert "maximum borrowing limit" in results[1]['message']
+        assert mock_batch.call_args[0][1] == [1, 2]
+
+
+def test_borrow_batch_lost_race():
+    """Test a book taken by someone else before the transaction ran"""
+    with patch('services.library_service.get_books_by_ids', return_value=BOOKS), \
+         patch('services.library_service.borrow_books_batch', return_value={'borrowed': [2], 'over_limit': []}):
+
+        success, message, results = borrow_books_by_patron("123456", [1, 2])
+
+        assert results[0]['success'] == False
+        assert "not available" in results[0]['message']
+        assert results[1]['success'] == True
+
+
+def test_borrow_batch_database_error():
+    """Test that a rolled back transaction fails every item"""
+    with patch('services.library_service.get_books_by_ids', return_value=BOOKS), \
+         patch('services.library_service.borrow_books_batch', return_value=None):
+
+        success, message, results = borrow_books_by_patron("123456", [1, 2])
+
+        assert success == False
+        assert all("Database error" in r['message'] for r in results)
+
+
+def test_borrow_batch_invalid_input():
+    """Test invalid patron ID and empty book list"""
+    success, message, results = borrow_books_by_patron("12345", [1])
+    assert success == False
+    assert "Invalid patron ID" in message
+    assert results == []
+
+    success, message, results = borrow_books_by_patron("123456", [])
+    assert success == False
+    assert results == []
+
+
+def test_return_batch_with_late_fees():
+    """Test returning several books with per-item late fees"""
+    borrowed = [
+        {"book_id": 1, "title": "Book One", "due_date": datetime.now() + timedelta(days=2)},
+        {"book_id": 2, "title": "Book Two", "due_date": datetime.now() - timedelta(days=5)},
+    ]
+    with patch('services.library_service.get_patron_borrowed_books', return_value=borrowed), \
+         patch('services.library_service.return_books_batch', return_value=[1, 2]) as mock_batch:
+
+        success, message, results = return_books_by_patron("123456", [1, 2, 3])
+
+        assert success == True
+        assert "2 of 3" in message
+        assert "2.50" in message
+        assert results[0]['late_fee'] == 0.00
+        assert results[1]['late_fee'] == 2.50
+        assert results[2]['success'] == False
+        assert "not borrowed" in results[2]['message']
+        assert mock_batch.call_args[0][1] == [1, 2]
+
+
+def test_return_batch_database_error():
+    """Test that a rolled back return transaction fails every item"""
+    borrowed = [{"book_id": 1, "title": "Book One", "due_date": datetime.now()}]
+    with patch('services.library_service.get_patron_borrowed_books', return_value=borrowed), \
+         patch('services.library_service.return_books_batch', return_value=None):
+
+        success, message, results = return_books_by_patron("123456", [1])
+
+        assert success == False
+        assert "Database error" in results[0]['message']
+
+
+def test_borrow_batch_limit_holds_under_concurrency(temp_db):
+    """Test that concurrent batches for one patron never exceed the borrowing limit"""
+    import threading
+    from database import get_patron_borrow_count, insert_book
+    for number in range(1, 9):
+        insert_book(f'Book {number}', 'Author', f'97800000000{number:02d}', 1, 1)
+    barrier = threading.Barrier(2)
+    outcomes = []
+
+    def borrow(book_ids):
+        barrier.wait()
+        outcomes.append(borrow_books_by_patron("123456", book_ids))
+
+    threads = [threading.Thread(target=borrow, args=(ids,)) for ids in ([1, 2, 3, 4], [5, 6, 7, 8])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert get_patron_borrow_count("123456") == 5
+    assert sum(r['success'] for _, _, results in outcomes for r in results) == 5
+
+
+def test_single_and_batch_share_the_limit(temp_db):
+    """Test that both borrow paths allow the 5th open loan and refuse the 6th"""
+    from database import insert_book
+    from services.library_service import borrow_book_by_patron
+    for number in range(1, 8):
+        insert_book(f'Book {number}', 'Author', f'97800000000{number:02d}', 1, 1)
+    assert borrow_books_by_patron("123456", [1, 2, 3])[0]
+    assert borrow_book_by_patron("123456", 4)[0]
+
+    assert borrow_book_by_patron("123456", 5)[0]
+    success, message = borrow_book_by_patron("123456", 6)
+    assert not success
+    assert "maximum borrowing limit of 5 books" in message
+
+    return_books_by_patron("123456", [5])
+    _, _, results = borrow_books_by_patron("123456", [6, 7])
+    assert [r['success'] for r in results] == [True, False]
+    assert "maximum borrowing limit of 5 books" in results[1]['message']
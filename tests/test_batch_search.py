@@ -0,0 +1,87 @@
+"""
+Tests for batch search
+"""
+
+import pytest
+import database
+from database import get_books_by_isbns, insert_book
+from instrumentation.query_count import QueryCounter
+from services.catalog_snapshot import catalog_snapshot, get_all_books
+from services.library_service import MAX_SEARCH_BATCH, search_books_batch
+
+
+@pytest.fixture
+def books(temp_db):
+    catalog_snapshot.clear()
+    insert_book('The Hobbit', 'J.R.R. Tolkien', '9780000000001', 3, 3)
+    insert_book('The Silmarillion', 'J.R.R. Tolkien', '9780000000002', 1, 1)
+    insert_book('Dune', 'Frank Herbert', '9780000000003', 2, 2)
+    yield
+    catalog_snapshot.clear()
+
+
+def test_get_books_by_isbns_chunks(books, monkeypatch):
+    """Test that ISBNs are looked up with one IN query per chunk"""
+    monkeypatch.setattr(database, 'IN_QUERY_CHUNK_SIZE', 2)
+    isbns = ['9780000000001', '9780000000002', '9780000000003', '9789999999999', '9780000000001']
+
+    with QueryCounter() as counter:
+        books_by_isbn = get_books_by_isbns(isbns)
+
+    assert sorted(books_by_isbn) == ['9780000000001', '9780000000002', '9780000000003']
+    assert books_by_isbn['9780000000003']['title'] == 'Dune'
+    assert counter.count == 2
+
+
+def test_results_keyed_by_input_position(books):
+    """Test that each query's result is reported at its position"""
+    success, message, results = search_books_batch([
+        ('9780000000003', 'isbn'),
+        ('tolkien', 'author'),
+        ('', 'title'),
+        ('9789999999999', 'isbn'),
+        ('hobbit', 'genre'),
+        ('the', 'title'),
+    ])
+
+    assert success
+    assert message == "Ran 4 of 6 searches."
+    assert [result['index'] for result in results] == list(range(6))
+    assert [book['title'] for book in results[0]['books']] == ['Dune']
+    assert [book['title'] for book in results[1]['books']] == ['The Hobbit', 'The Silmarillion']
+    assert 'error' in results[2] and 'error' in results[4]
+    assert results[3]['books'] == []
+    assert [book['title'] for book in results[5]['books']] == ['The Hobbit', 'The Silmarillion']
+
+
+def test_batch_uses_one_query(books):
+    """Test that ISBN lookups share a query and text searches share the snapshot"""
+    get_all_books()
+    queries = [(f'97800000000{i:02d}', 'isbn') for i in range(50)] + [('dune', 'title')] * 50
+
+    with QueryCounter() as counter:
+        success, _, results = search_books_batch(queries)
+
+    assert success
+    assert counter.count == 1
+    assert sum(len(result['books']) for result in results) == 3 + 50
+
+
+def test_empty_and_oversized_batches(books):
+    """Test that empty and oversized batches are rejected"""
+    assert search_books_batch([]) == (False, "No search queries provided.", [])
+    assert search_books_batch([('dune', 'title')] * (MAX_SEARCH_BATCH + 1))[2] == []
+
+
+def test_batch_search_api(books, client):
+    """Test the batch search endpoint"""
+    response = client.post('/api/search/batch', json={'queries': [
+        {'q': '9780000000001', 'type': 'isbn'}, {'q': 'herbert', 'type': 'author'}, {'q': 'dune'}]})
+
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['count'] == 3
+    assert [[book['title'] for book in result['books']] for result in data['results']] == \
+        [['The Hobbit'], ['Dune'], ['Dune']]
+    assert client.post('/api/search/batch', json={'queries': 'dune'}).status_code == 400
+    assert client.post('/api/search/batch', json={'queries': []}).status_code == 400
@@ -0,0 +1,81 @@
+"""
+Tests for the read-through book cache behind get_book_by_id/get_book_by_isbn
+"""
+
+import sqlite3
+import pytest
+import database
+from database import get_book_by_id, get_book_by_isbn, insert_book, update_book_availability
+from instrumentation.query_count import QueryCounter
+
+
+@pytest.fixture
+def book(temp_db):
+    """A single book, looked up once so it is cached."""
+    database.clear_book_cache()
+    insert_book('Cached Book', 'Author', '9780000000001', 3, 3)
+    return get_book_by_id(1)
+
+
+def _external_write(sql, parameters=()):
+    """Write through a separate connection, the way another worker process would."""
+    conn = sqlite3.connect(database.DATABASE)
+    conn.execute(sql, parameters)
+    conn.execute('UPDATE catalog_version SET version = version + 1 WHERE id = 1')
+    conn.commit()
+    conn.close()
+
+
+def test_repeated_lookups_served_from_cache(book):
+    """Test that a cached book is returned without querying SQLite"""
+    with QueryCounter() as counter:
+        by_id = get_book_by_id(1)
+        by_isbn = get_book_by_isbn('9780000000001')
+
+    assert counter.count == 0
+    assert by_id == by_isbn == book
+
+
+def test_cached_records_are_read_only(book):
+    """Test that callers cannot modify the cached record"""
+    with pytest.raises(TypeError):
+        book['available_copies'] = 0
+
+    assert get_book_by_id(1)['available_copies'] == 3
+
+
+def test_write_in_process_invalidates(book):
+    """Test that writes made through database.py are visible immediately"""
+    update_book_availability(1, -1)
+
+    assert get_book_by_id(1)['available_copies'] == 2
+    assert get_book_by_isbn('9780000000001')['available_copies'] == 2
+
+
+def test_write_from_other_connection_invalidates(book):
+    """Test that a change committed elsewhere is noticed through data_version"""
+    _external_write(f'UPDATE books SET available_copies = 0, row_version = {database._NEXT_VERSION} WHERE id = 1')
+
+    assert get_book_by_id(1)['available_copies'] == 0
+
+
+def test_unrelated_external_write_keeps_entries(book):
+    """Test that writes not touching books leave cached books in place"""
+    conn = sqlite3.connect(database.DATABASE)
+    conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) "
+                 "VALUES ('123456', 1, '2024-01-01', '2024-01-15')")
+    conn.commit()
+    conn.close()
+
+    with QueryCounter() as counter:
+        get_book_by_id(1)
+
+    assert counter.count == 0
+
+
+def test_missing_book_not_cached(temp_db):
+    """Test that a lookup miss is not remembered"""
+    assert get_book_by_id(1) is None
+    insert_book('Late Arrival', 'Author', '9780000000002', 1, 1)
+
+    assert get_book_by_id(1)['title'] == 'Late Arrival'
@@ -59,9 +59,20 @@ def test_borrow_book_max_limit_reached():
 
 
 def test_borrow_book_at_max_limit():
-    # Test borrowing when patron has exactly 5 books (should still be allowed).
+    # Test borrowing when patron already has 5 books (the limit; a 6th is refused).
     with patch('services.library_service.get_book_by_id', return_value={"id": 1, "title": "Test Book", "available_copies": 2}), \
-         patch('services.library_service.get_patron_borrow_count', return_value=5), \
+         patch('services.library_service.get_patron_borrow_count', return_value=5):
+        
+        success, message = borrow_book_by_patron("123456", 1)
+        
+        assert success == False
+        assert "maximum borrowing limit of 5 books" in message
+
+
+def test_borrow_book_below_max_limit():
+    # Test borrowing the 5th book when patron has 4 (should still be allowed).
+    with patch('services.library_service.get_book_by_id', return_value={"id": 1, "title": "Test Book", "available_copies": 2}), \
+         patch('services.library_service.get_patron_borrow_count', return_value=4), \
          patch('services.library_service.insert_borrow_record', return_value=True), \
          patch('services.library_service.update_book_availability', return_value=True):
         
@@ -0,0 +1,95 @@
+"""
+Tests for the columnar in-memory catalog snapshot
+"""
+
+import pytest
+import database
+from database import get_all_books as query_all_books, insert_book, update_book_availability
+from instrumentation.query_count import QueryCounter
+from services.catalog_snapshot import CatalogView, catalog_snapshot, get_all_books
+from services.library_service import search_books_in_catalog
+
+
+@pytest.fixture
+def snapshot(temp_db):
+    """A fresh snapshot over a database with three books."""
+    catalog_snapshot.clear()
+    insert_book('Moby Dick', 'Herman Melville', '9780000000001', 2, 2)
+    insert_book('Anna Karenina', 'Leo Tolstoy', '9780000000002', 1, 1)
+    insert_book('War and Peace', 'Leo Tolstoy', '9780000000003', 3, 3)
+    yield catalog_snapshot
+    catalog_snapshot.clear()
+
+
+def test_matches_database_order_and_contents(snapshot):
+    """Test that the snapshot lists the same books as the books table, in title order"""
+    books = get_all_books()
+
+    assert isinstance(books, CatalogView)
+    assert list(books) == query_all_books()
+    assert [book['title'] for book in books] == ['Anna Karenina', 'Moby Dick', 'War and Peace']
+
+
+def test_reads_do_not_query_when_unchanged(snapshot):
+    """Test that repeated reads are served without SQL statements"""
+    get_all_books()
+
+    with QueryCounter() as counter:
+        get_all_books()
+        search_books_in_catalog('tolstoy', 'author')
+
+    assert counter.count == 0
+
+
+def test_copy_change_merged_incrementally(snapshot):
+    """Test that a write only fetches the changed rows"""
+    get_all_books()
+    full_loads = snapshot.full_loads
+
+    update_book_availability(1, -1)
+    with QueryCounter() as counter:
+        books = get_all_books()
+
+    assert snapshot.full_loads == full_loads
+    assert 'WHERE row_version > ?' in counter.statements[0][0]
+    assert [book['available_copies'] for book in books if book['id'] == 1] == [1]
+
+
+def test_bulk_insert_appears(snapshot):
+    """Test that books added with insert_books show up in order after one version bump"""
+    before = get_all_books()
+    version = database.get_catalog_version()[0]
+
+    book_ids = database.insert_books([
+        ('Bleak House', 'Charles Dickens', '9780000000004', 1, 1),
+        ('Emma', 'Jane Austen', '9780000000005', 2, 2),
+    ])
+    after = get_all_books()
+
+    assert len(before) == 3
+    assert database.get_catalog_version()[0] == version + 1
+    assert [book['title'] for book in after] == ['Anna Karenina', 'Bleak House', 'Emma',
+                                                 'Moby Dick', 'War and Peace']
+    titles = {book['id']: book['title'] for book in after}
+    assert [titles[book_id] for book_id in book_ids] == ['Bleak House', 'Emma']
+
+
+def test_search_uses_snapshot_columns(snapshot):
+    """Test title, author and ISBN search against the snapshot"""
+    assert [b['id'] for b in search_books_in_catalog('  PEACE ', 'title')] == [3]
+    assert [b['id'] for b in search_books_in_catalog('tolstoy', 'author')] == [2, 3]
+    assert [b['id'] for b in search_books_in_catalog('9780000000001', 'isbn')] == [1]
+    assert search_books_in_catalog('missing', 'title') == []
+
+
+def test_sample_data_seeded_after_load_appears(temp_db):
+    """Test that sample data added after the snapshot loaded an empty catalog shows up"""
+    catalog_snapshot.clear()
+    assert len(get_all_books()) == 0
+
+    database.add_sample_data()
+
+    assert [book['title'] for book in get_all_books()] == ['1984', 'The Great Gatsby', 'To Kill a Mockingbird']
+    assert [book['id'] for book in search_books_in_catalog('gatsby', 'title')] == [1]
+    assert [book['available_copies'] for book in get_all_books() if book['id'] == 3] == [0]
+    catalog_snapshot.clear()
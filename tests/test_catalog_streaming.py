@@ -0,0 +1,51 @@
+"""
+Tests for the streamed catalog rendering mode
+"""
+
+import pytest
+import database
+from database import insert_book
+
+
+def test_streamed_catalog_matches_buffered(client):
+    """Test that streaming mode renders the same rows as the buffered page"""
+    buffered = client.get('/catalog')
+    streamed = client.get('/catalog?stream=1')
+
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.mimetype == 'text/html'
+    assert streamed.get_data() == buffered.get_data()
+
+
+def test_streamed_catalog_from_config(client):
+    """Test that CATALOG_STREAMING turns on streaming for every request"""
+    client.application.config['CATALOG_STREAMING'] = True
+    response = client.get('/catalog')
+    assert response.is_streamed
+    assert b"The Great Gatsby" in response.get_data()
+
+
+def test_streamed_catalog_empty(client):
+    """Test that the empty-catalog message is shown in streaming mode"""
+    conn = database.get_db_connection()
+    conn.execute('DELETE FROM borrow_records')
+    conn.execute('DELETE FROM books')
+    conn.commit()
+    conn.close()
+
+    response = client.get('/catalog?stream=1')
+    assert b"No books in catalog" in response.get_data()
+
+
+def test_streamed_catalog_sends_page_before_all_rows(client):
+    """Test that the page header arrives in the first chunk of a large catalog"""
+    for i in range(300):
+        insert_book(f"Streamed Book {i:03d}", "Test Author", f"{2000000000000 + i}", 1, 1)
+
+    response = client.get('/catalog?stream=1')
+    chunks = iter(response.response)
+    first = next(chunks)
+    assert "Book Catalog".encode() in first
+    assert b"Streamed Book 299" not in first
+    response.close()
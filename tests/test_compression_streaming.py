@@ -0,0 +1,82 @@
+"""
+Tests for response compression and streamed JSON / NDJSON search results
+"""
+
+import gzip
+import json
+import zlib
+import pytest
+from database import insert_book
+
+
+@pytest.fixture
+def large_client(client):
+    """Client whose catalog is large enough to exceed the compression threshold."""
+    for i in range(50):
+        insert_book(f"Python Book {i}", "Test Author", f"{1000000000000 + i}", 1, 1)
+    return client
+
+
+def test_api_search_streamed_json_format(large_client):
+    """Test that the streamed JSON matches the documented response shape"""
+    response = large_client.get('/api/search?q=python&type=title')
+    assert response.status_code == 200
+    assert response.is_streamed
+
+    data = json.loads(response.get_data())
+    assert data['search_term'] == 'python'
+    assert data['search_type'] == 'title'
+    assert data['count'] == 50
+    assert len(data['results']) == 50
+    assert data['results'][0]['title'].startswith("Python Book")
+
+
+def test_api_search_empty_result_is_valid_json(client):
+    """Test a streamed response with no matching rows"""
+    data = json.loads(client.get('/api/search?q=zzzz').get_data())
+    assert data['results'] == []
+    assert data['count'] == 0
+
+
+def test_api_search_ndjson(large_client):
+    """Test newline-delimited JSON output"""
+    response = large_client.get('/api/search?q=python', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 50
+    assert json.loads(lines[0])['author'] == "Test Author"
+
+
+def test_gzip_streamed_json(large_client):
+    """Test that streamed JSON is gzip-compressed when accepted"""
+    response = large_client.get('/api/search?q=python', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.get_data()))['count'] == 50
+
+
+def test_deflate_html(large_client):
+    """Test deflate negotiation for a buffered HTML page"""
+    response = large_client.get('/catalog', headers={'Accept-Encoding': 'deflate'})
+    assert response.headers['Content-Encoding'] == 'deflate'
+    assert b"Python Book 0" in zlib.decompress(response.get_data())
+
+
+def test_preferred_encoding_by_quality(large_client):
+    """Test that q-values decide between gzip and deflate"""
+    response = large_client.get('/catalog', headers={'Accept-Encoding': 'gzip;q=0.5, deflate'})
+    assert response.headers['Content-Encoding'] == 'deflate'
+
+
+def test_small_response_not_compressed(client):
+    """Test that responses below the size threshold are sent as-is"""
+    response = client.get('/api/search?q=', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 400
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_no_compression_without_accept_encoding(large_client):
+    """Test that clients that do not ask for compression get plain responses"""
+    response = large_client.get('/catalog')
+    assert 'Content-Encoding' not in response.headers
+    assert b"Python Book 0" in response.data
@@ -0,0 +1,87 @@
+"""
+Tests for ETag / Last-Modified conditional GET support on catalog and search responses
+"""
+
+import pytest
+from database import get_catalog_version, insert_book, update_book_availability
+
+
+def test_catalog_version_bumped_by_writes(temp_db):
+    """Test that write paths bump the catalog version"""
+    version, _ = get_catalog_version()
+    insert_book("Test Book", "Test Author", "1234567890123", 2, 2)
+    assert get_catalog_version()[0] == version + 1
+    update_book_availability(1, -1)
+    assert get_catalog_version()[0] == version + 2
+
+
+@pytest.mark.parametrize("url", ["/catalog", "/search?q=gatsby&type=title", "/api/search?q=gatsby"])
+def test_if_none_match_returns_304(client, url):
+    """Test that a matching ETag is answered with 304"""
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert 'Last-Modified' in response.headers
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_etag_changes_after_catalog_write(client):
+    """Test that a stale ETag gets a full response after the catalog changes"""
+    etag = client.get('/catalog').headers['ETag']
+    insert_book("Test Book", "Test Author", "1234567890123", 2, 2)
+
+    response = client.get('/catalog', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert b"Test Book" in response.data
+
+
+def test_if_modified_since(client):
+    """Test If-Modified-Since when no ETag is sent"""
+    last_modified = client.get('/catalog').headers['Last-Modified']
+    response = client.get('/catalog', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+
+def test_pending_flash_disables_304(client):
+    """Test that flashed messages are never hidden behind a 304"""
+    etag = client.get('/catalog').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('error', 'Invalid book ID.')]
+
+    response = client.get('/catalog', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b"Invalid book ID." in response.data
+
+
+def test_error_responses_have_no_etag(client):
+    """Test that a 400 from the search API is not given an ETag"""
+    response = client.get('/api/search?q=')
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
+
+
+def test_invalid_arguments_never_get_304(client):
+    """Test that a bad request is answered 400 even with a current ETag"""
+    etag = client.get('/api/search?q=gatsby').headers['ETag']
+
+    for url in ('/api/search?q=gatsby&limit=ten', '/api/search?q=gatsby&type=colour',
+                '/api/search', '/api/suggest?q='):
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 400, url
+
+
+def test_responses_vary_on_accept(client):
+    """Test that JSON and NDJSON variants sharing an ETag tell caches to vary on Accept"""
+    response = client.get('/api/search?q=gatsby')
+    etag = response.headers['ETag']
+    not_modified = client.get('/api/search?q=gatsby', headers={'If-None-Match': etag,
+                                                               'Accept': 'application/x-ndjson'})
+
+    for headers in (response.headers, not_modified.headers):
+        assert {'Accept', 'Accept-Encoding'} <= {v.strip() for v in headers['Vary'].split(',')}
+    assert not_modified.status_code == 304
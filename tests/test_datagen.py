@@ -0,0 +1,76 @@
+"""
+Tests for the synthetic data generator
+"""
+
+import random
+import sqlite3
+from datetime import datetime
+import database
+from services.library_service import MAX_BORROWED_BOOKS, get_patron_status_report
+from tools.datagen import generate_books, generate_library, is_valid_isbn13, isbn13
+
+
+def test_isbn13_check_digit():
+    """Test that generated ISBNs carry a correct check digit"""
+    assert isbn13(30640615) == '9780306406157'
+    assert is_valid_isbn13('9780306406157')
+    assert not is_valid_isbn13('9780306406158')
+
+
+def test_generate_books_is_deterministic():
+    """Test that the same seed produces the same books"""
+    first = list(generate_books(200, random.Random(3)))
+    second = list(generate_books(200, random.Random(3)))
+
+    assert first == second
+    assert first != list(generate_books(200, random.Random(4)))
+    assert len({isbn for _, _, isbn, _ in first}) == 200
+    assert all(is_valid_isbn13(isbn) for _, _, isbn, _ in first)
+
+
+def test_same_seed_same_database(tmp_path):
+    """Test that two databases built with the same arguments are identical"""
+    now = datetime(2024, 6, 1, 12, 0)
+    dumps = []
+    for name in ('a.db', 'b.db'):
+        generate_library(str(tmp_path / name), books=100, patrons=20, loans=400, seed=5, now=now)
+        conn = sqlite3.connect(str(tmp_path / name))
+        dumps.append((conn.execute('SELECT * FROM books').fetchall(),
+                      conn.execute('SELECT * FROM borrow_records').fetchall()))
+        conn.close()
+
+    assert dumps[0] == dumps[1]
+
+
+def test_loans_respect_library_rules(synthetic_db):
+    """Test that copies, per-patron limits and open-loan uniqueness hold"""
+    conn = sqlite3.connect(synthetic_db['path'])
+    mismatched = conn.execute('''
+        SELECT COUNT(*) FROM books b WHERE available_copies < 0 OR available_copies !=
+            total_copies - (SELECT COUNT(*) FROM borrow_records r
+                            WHERE r.book_id = b.id AND r.return_date IS NULL)
+    ''').fetchone()[0]
+    most_open = conn.execute('''
+        SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM borrow_records
+                            WHERE return_date IS NULL GROUP BY patron_id)
+    ''').fetchone()[0]
+    duplicates = conn.execute('''
+        SELECT COUNT(*) FROM (SELECT 1 FROM borrow_records WHERE return_date IS NULL
+                              GROUP BY patron_id, book_id HAVING COUNT(*) > 1)
+    ''').fetchone()[0]
+    conn.close()
+
+    assert synthetic_db['loans'] == 1500
+    assert synthetic_db['open_loans'] > 0
+    assert 0 < synthetic_db['overdue_loans'] < synthetic_db['open_loans']
+    assert mismatched == 0
+    assert most_open <= MAX_BORROWED_BOOKS
+    assert duplicates == 0
+
+
+def test_generated_data_usable_by_service(synthetic_db):
+    """Test that the service layer reads the generated loans"""
+    assert len(database.get_all_books()) == 300
+
+    report = get_patron_status_report(synthetic_db['patrons'][0])
+    assert report['currently_borrowed_books']
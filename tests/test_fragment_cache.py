@@ -0,0 +1,68 @@
+"""
+Tests for the rendered catalog row fragment cache
+"""
+
+import pytest
+from database import get_book_by_id, insert_book, update_book_availability
+from routes.fragment_cache import RowFragmentCache
+
+
+def _row_cache(client):
+    return client.application.extensions['catalog_row_cache']
+
+
+def test_rows_cached_between_page_views(client):
+    """Test that a second page view renders every row from the cache"""
+    first = client.get('/catalog').data
+    cache = _row_cache(client)
+    assert cache.misses == 3
+    assert cache.hits == 0
+
+    second = client.get('/catalog').data
+    assert cache.hits == 3
+    assert second == first
+
+
+def test_availability_update_invalidates_row(client):
+    """Test that update_book_availability re-renders only that row"""
+    client.get('/catalog')
+    cache = _row_cache(client)
+    update_book_availability(1, -1)
+    assert len(cache) == 2
+
+    response = client.get('/catalog')
+    assert b"2/3 Available" in response.data
+    assert cache.misses == 4
+
+
+def test_insert_book_adds_row(client):
+    """Test that a newly inserted book is rendered and cached"""
+    client.get('/catalog')
+    insert_book("Cached Book", "Test Author", "1234567890123", 1, 1)
+
+    response = client.get('/catalog')
+    assert b"Cached Book" in response.data
+    assert len(_row_cache(client)) == 4
+
+
+def test_row_version_mismatch_rerenders(client):
+    """Test that a row changed by another process is detected by its version"""
+    with client.application.test_request_context():
+        cache = RowFragmentCache()
+        book = get_book_by_id(1)
+        cache.render(book)
+        changed = dict(book, available_copies=0, row_version=book['row_version'] + 1)
+        html = cache.render(changed)
+
+    assert "Not Available" in html
+    assert cache.misses == 2
+
+
+def test_cache_is_bounded(client):
+    """Test that least recently used rows are evicted past max_entries"""
+    with client.application.test_request_context():
+        cache = RowFragmentCache(max_entries=2)
+        for book_id in (1, 2, 3):
+            cache.render(get_book_by_id(book_id))
+
+    assert len(cache) == 2
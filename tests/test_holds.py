@@ -0,0 +1,215 @@
+"""
+Tests for the holds queue and hold assignment on return
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+import database
+from database import (
+    _NEXT_HOLD, get_book_by_id, get_patron_borrowed_books, insert_book, insert_borrow_record,
+    update_book_availability
+)
+from services.library_service import (
+    borrow_book_by_patron, cancel_hold, get_patron_hold_positions, place_hold,
+    return_book_by_patron, return_books_by_patron
+)
+from tools.stress import check_invariants
+
+
+@pytest.fixture
+def book(temp_db):
+    """A single-copy book, on loan to patron 100001."""
+    insert_book('Dune', 'Frank Herbert', '9780000000001', 1, 1)
+    insert_book('Emma', 'Jane Austen', '9780000000002', 2, 2)
+    assert borrow_book_by_patron('100001', 1)[0]
+    return 1
+
+
+def loaned_book_ids(patron_id):
+    return [loan['book_id'] for loan in get_patron_borrowed_books(patron_id)]
+
+
+def positions(patron_id):
+    return [(hold['book_id'], hold['position']) for hold in get_patron_hold_positions(patron_id)['holds']]
+
+
+def borrow_up_to_limit(patron_id):
+    """Lend the patron five more books (IDs 3 to 7), reaching the borrowing limit."""
+    book_ids = list(range(3, 8))
+    for book_id in book_ids:
+        insert_book(f'Book {book_id}', 'Author', f'97800000001{book_id:02d}', 1, 1)
+        assert borrow_book_by_patron(patron_id, book_id)[0]
+    return book_ids
+
+
+def test_holds_queue_in_order(book):
+    """Test that holds are queued first come first served"""
+    assert place_hold('100002', book) == (True, 'Hold placed on "Dune". You are number 1 in the queue.')
+    assert place_hold('100003', book)[1].endswith('number 2 in the queue.')
+
+    assert positions('100002') == [(book, 1)]
+    assert positions('100003') == [(book, 2)]
+
+
+def test_hold_rejections(book):
+    """Test that holds are refused when they make no sense"""
+    place_hold('100002', book)
+
+    assert place_hold('100002', book) == (False, 'You already have a hold on "Dune".')
+    assert place_hold('100001', book) == (False, 'You already have "Dune" on loan.')
+    assert place_hold('100002', 2)[0] is False
+    assert place_hold('100002', 999) == (False, "Book not found.")
+    assert place_hold('12345', book)[0] is False
+
+
+def test_return_lends_copy_to_next_hold(book):
+    """Test that a returned copy goes to the first patron in the queue"""
+    place_hold('100002', book)
+    place_hold('100003', book)
+
+    success, message = return_book_by_patron('100001', book)
+
+    assert success
+    assert 'lent to the next patron' in message
+    assert loaned_book_ids('100002') == [book]
+    assert get_book_by_id(book)['available_copies'] == 0
+    assert positions('100002') == []
+    assert positions('100003') == [(book, 1)]
+    assert not any(check_invariants(database.DATABASE).values())
+
+
+def test_return_without_holds_shelves_copy(book):
+    """Test that a copy nobody waits for becomes available again"""
+    success, message = return_book_by_patron('100001', book)
+
+    assert success
+    assert 'lent' not in message
+    assert get_book_by_id(book)['available_copies'] == 1
+
+
+def test_patron_at_borrowing_limit_is_skipped(book):
+    """Test that the copy goes to the next patron who can still borrow"""
+    place_hold('100002', book)
+    place_hold('100003', book)
+    now = datetime.now()
+    for i in range(5):
+        insert_borrow_record('100002', 100 + i, now, now + timedelta(days=14))
+
+    return_book_by_patron('100001', book)
+
+    assert book not in loaned_book_ids('100002')
+    assert loaned_book_ids('100003') == [book]
+    assert positions('100002') == [(book, 1)]
+
+
+def test_copy_reserved_while_whole_queue_at_limit(book):
+    """Test that a copy waits for the queue instead of going to a walk-in"""
+    fillers = borrow_up_to_limit('100002')
+    place_hold('100002', book)
+
+    return_book_by_patron('100001', book)
+
+    assert get_book_by_id(book)['available_copies'] == 0
+    assert borrow_book_by_patron('100003', book) == (False, "This book is currently not available.")
+    assert positions('100002') == [(book, 1)]
+    assert not any(check_invariants(database.DATABASE).values())
+
+    assert return_book_by_patron('100002', fillers[0])[0]
+
+    assert book in loaned_book_ids('100002')
+    assert positions('100002') == []
+    assert get_book_by_id(book)['available_copies'] == 0
+    assert not any(check_invariants(database.DATABASE).values())
+
+
+def test_reserved_copy_shelved_once_nobody_waits(book):
+    """Test that cancelling the last hold puts a reserved copy back on the shelf"""
+    borrow_up_to_limit('100002')
+    place_hold('100002', book)
+    return_book_by_patron('100001', book)
+
+    assert cancel_hold('100002', book) == (True, "Hold cancelled.")
+
+    assert get_book_by_id(book)['available_copies'] == 1
+    assert not any(check_invariants(database.DATABASE).values())
+
+
+def test_borrowing_closes_own_hold(book):
+    """Test that a patron who borrows a book directly leaves its queue"""
+    place_hold('100002', book)
+    place_hold('100003', book)
+    update_book_availability(book, 1)
+
+    assert borrow_book_by_patron('100002', book)[0]
+
+    assert positions('100002') == []
+    assert positions('100003') == [(book, 1)]
+
+
+def test_concurrent_double_return_rejected(book):
+    """Test that losing a race to return the same loan is a normal rejection"""
+    stale = get_patron_borrowed_books('100001')
+    assert return_book_by_patron('100001', book)[0]
+
+    with patch('services.library_service.get_patron_borrowed_books', return_value=stale):
+        assert return_book_by_patron('100001', book) == \
+            (False, 'Book "Dune" was not borrowed by patron ID 100001.')
+
+
+def test_cancelled_hold_leaves_queue(book):
+    """Test that cancelling moves the patrons behind forward"""
+    place_hold('100002', book)
+    place_hold('100003', book)
+
+    assert cancel_hold('100002', book) == (True, "Hold cancelled.")
+    assert cancel_hold('100002', book)[0] is False
+    assert positions('100003') == [(book, 1)]
+
+    return_book_by_patron('100001', book)
+    assert loaned_book_ids('100003') == [book]
+
+
+def test_batch_return_lends_copy_to_next_hold(book):
+    """Test that batch returns serve the queue too"""
+    place_hold('100002', book)
+
+    success, _, results = return_books_by_patron('100001', [book])
+
+    assert success and results[0]['success']
+    assert loaned_book_ids('100002') == [book]
+    assert get_book_by_id(book)['available_copies'] == 0
+    assert not any(check_invariants(database.DATABASE).values())
+
+
+def test_next_hold_found_through_queue_index(book):
+    """Test that the next hold is an index seek, not a scan of all holds"""
+    conn = database.get_db_connection()
+    plan = ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + _NEXT_HOLD, (book, 5)))
+    conn.close()
+
+    assert 'idx_holds_queue' in plan
+
+
+def test_holds_api(book, client):
+    """Test placing, listing and cancelling holds through the API"""
+    response = client.post('/api/holds', json={'patron_id': '100002', 'book_id': book})
+    assert response.status_code == 200
+    assert response.get_json()['success']
+
+    response = client.get('/api/holds/100002')
+    assert [(hold['title'], hold['position']) for hold in response.get_json()['holds']] == [('Dune', 1)]
+
+    assert client.delete('/api/holds', json={'patron_id': '100002', 'book_id': book}).status_code == 200
+    assert client.get('/api/holds/100002').get_json()['holds'] == []
+    assert client.get('/api/holds/abc').status_code == 400
+    assert client.post('/api/holds', json={'patron_id': '100002'}).status_code == 400
+
+
+def test_catalog_offers_hold_for_unavailable_book(book, client):
+    """Test that unavailable books get a hold form instead of a dead end"""
+    assert b'Place Hold' in client.get('/catalog').get_data()
+
+    response = client.post('/hold', data={'patron_id': '100002', 'book_id': str(book)}, follow_redirects=True)
+
+    assert b'number 1 in the queue' in response.get_data()
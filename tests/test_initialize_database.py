@@ -0,0 +1,36 @@
+"""
+Tests for locked database initialization shared by worker processes
+"""
+
+import multiprocessing
+import pytest
+import database
+
+
+def _initialize(path):
+    database.DATABASE = path
+    database.initialize_database()
+
+
+def test_concurrent_initialization_seeds_once(tmp_path):
+    """Test that workers starting together create the schema and sample data once"""
+    path = str(tmp_path / 'library.db')
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_initialize, args=(path,)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    conn = database.sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM books').fetchone()[0] == 3
+    assert conn.execute('SELECT COUNT(*) FROM borrow_records').fetchone()[0] == 1
+    conn.close()
+
+
+def test_initialize_without_sample_data(tmp_path, monkeypatch):
+    """Test that sample data can be skipped"""
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'library.db'))
+    database.initialize_database(sample_data=False)
+    assert database.get_all_books() == []
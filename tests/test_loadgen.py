@@ -0,0 +1,37 @@
+"""
+Tests for the mixed-workload load generator
+"""
+
+import pytest
+from app import create_app
+from tools.loadgen import in_process_sender, parse_mix, percentile, run_stage
+
+
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles of sorted latencies"""
+    values = [i / 100 for i in range(1, 101)]
+
+    assert percentile(values, 0.50) == 0.50
+    assert percentile(values, 0.99) == 0.99
+    assert percentile([0.2], 0.95) == 0.2
+
+
+def test_parse_mix_rejects_unknown_action():
+    """Test that the mix only accepts known actions"""
+    assert parse_mix('catalog=1,search=3') == {'catalog': 1.0, 'search': 3.0}
+    with pytest.raises(ValueError):
+        parse_mix('catalog=1,delete=2')
+
+
+def test_run_stage_in_process(synthetic_db):
+    """Test a short in-process stage reports every endpoint in the mix"""
+    app = create_app(fast_startup=True)
+    mix = parse_mix('catalog=1,search=1,borrow=1,return=1,fees=1')
+
+    stage = run_stage(in_process_sender(app), users=2, duration=1.0, mix=mix,
+                      patrons=synthetic_db['patrons'], books=synthetic_db['books'], seed=1)
+
+    assert stage['totals']['all']['requests'] > 0
+    assert stage['totals']['all']['errors'] == 0
+    assert set(stage['totals']) <= set(mix) | {'all'}
+    assert stage['intervals']
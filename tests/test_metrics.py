@@ -0,0 +1,81 @@
+"""
+Tests for per-endpoint request metrics and the /metrics endpoint
+"""
+
+import pytest
+from instrumentation.metrics import Histogram
+
+
+def _metric_lines(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    return response.get_data(as_text=True).splitlines()
+
+
+def test_request_counts_by_endpoint(client):
+    """Test that requests are counted per blueprint endpoint and status"""
+    client.get('/catalog')
+    client.get('/catalog')
+    client.get('/api/search?q=')
+
+    lines = _metric_lines(client)
+    assert 'library_http_requests_total{endpoint="catalog.catalog",method="GET",status="200"} 2' in lines
+    assert 'library_http_requests_total{endpoint="api.search_books_api",method="GET",status="400"} 1' in lines
+
+
+def test_latency_histogram(client):
+    """Test that the latency histogram has cumulative buckets, sum and count"""
+    client.get('/catalog')
+    lines = _metric_lines(client)
+
+    assert 'library_http_request_duration_seconds_bucket{endpoint="catalog.catalog",le="+Inf"} 1' in lines
+    assert 'library_http_request_duration_seconds_count{endpoint="catalog.catalog"} 1' in lines
+    assert any(line.startswith('library_http_request_duration_seconds_sum{endpoint="catalog.catalog"}')
+               for line in lines)
+
+
+def test_database_queries_recorded(client):
+    """Test that SQL statements are attributed to the request that ran them"""
+    client.get('/catalog')
+    lines = _metric_lines(client)
+
+    assert 'library_db_queries_per_request_count{endpoint="catalog.catalog"} 1' in lines
+    # get_catalog_version and get_all_books: two statements, none in the "0" or "1" buckets
+    assert 'library_db_queries_per_request_bucket{endpoint="catalog.catalog",le="1"} 0' in lines
+    assert 'library_db_queries_per_request_bucket{endpoint="catalog.catalog",le="2"} 1' in lines
+
+
+def test_streamed_response_recorded_on_close(client):
+    """Test that streamed responses are measured once the body is sent"""
+    response = client.get('/api/search?q=gatsby')
+    response.get_data()
+    response.close()
+    lines = _metric_lines(client)
+    assert 'library_http_request_duration_seconds_count{endpoint="api.search_books_api"} 1' in lines
+
+
+def test_errors_counted(client):
+    """Test that 5xx responses are counted as errors"""
+    client.application.config['PROPAGATE_EXCEPTIONS'] = False
+
+    @client.application.route('/boom')
+    def boom():
+        raise RuntimeError("boom")
+
+    response = client.get('/boom')
+    assert response.status_code == 500
+    response.close()
+    lines = _metric_lines(client)
+    assert 'library_http_request_errors_total{endpoint="boom"} 1' in lines
+
+
+def test_histogram_buckets():
+    """Test bucket placement of observations"""
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [2, 3]
+    assert histogram.count == 4
+    assert histogram.total == pytest.approx(5.65)
@@ -0,0 +1,50 @@
+"""
+Tests for the on-demand request profiling hook
+"""
+
+import os
+import pstats
+import pytest
+
+
+@pytest.fixture
+def profiling_client(client, tmp_path):
+    client.application.config['ADMIN_TOKEN'] = 'secret'
+    client.application.config['PROFILE_DIR'] = str(tmp_path / 'profiles')
+    return client
+
+
+def test_no_profile_by_default(profiling_client, tmp_path):
+    """Test that requests are not profiled unless asked for"""
+    response = profiling_client.get('/catalog')
+    assert 'X-Profile-Id' not in response.headers
+    assert not os.path.exists(tmp_path / 'profiles')
+
+
+def test_profile_header_requires_admin_token(profiling_client):
+    """Test that X-Profile is ignored without a valid admin token"""
+    response = profiling_client.get('/catalog', headers={'X-Profile': '1', 'X-Admin-Token': 'wrong'})
+    assert 'X-Profile-Id' not in response.headers
+
+
+def test_admin_profile_writes_dumps(profiling_client, tmp_path):
+    """Test that an admin-requested profile covers the route and database layers"""
+    response = profiling_client.get('/catalog', headers={'X-Profile': '1', 'X-Admin-Token': 'secret'})
+    name = response.headers['X-Profile-Id']
+    directory = tmp_path / 'profiles'
+
+    stats = pstats.Stats(str(directory / (name + '.prof')))
+    functions = {func for _, _, func in stats.stats}
+    assert 'catalog' in functions
+    assert 'get_all_books' in functions
+
+    summary = (directory / (name + '.txt')).read_text()
+    assert summary.startswith('GET /catalog? -> 200')
+    assert 'catalog_routes.py' in summary
+
+
+def test_sampled_profiling(profiling_client):
+    """Test that a sample rate of 1.0 profiles every request"""
+    profiling_client.application.config['PROFILE_SAMPLE_RATE'] = 1.0
+    response = profiling_client.get('/catalog')
+    assert 'X-Profile-Id' in response.headers
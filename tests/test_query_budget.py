@@ -0,0 +1,116 @@
+"""
+Tests for statement budgets and N+1 detection, plus the budgets of the main service calls
+"""
+
+import pytest
+from database import get_book_by_id, get_patron_borrowed_books, insert_book
+from instrumentation.query_count import QUERY_COUNT_HEADER, QueryCounter, assert_max_queries
+from services.library_service import (
+    borrow_book_by_patron, borrow_books_by_patron, get_patron_status_report, return_book_by_patron
+)
+
+
+@pytest.fixture
+def books(temp_db):
+    """Three books with two copies each."""
+    for number in range(1, 4):
+        insert_book(f'Book {number}', 'Author', f'978000000000{number}', 2, 2)
+    return [1, 2, 3]
+
+
+def test_counter_records_statements(temp_db):
+    """Test that statements run inside the block are counted"""
+    with QueryCounter() as counter:
+        get_book_by_id(1)
+        get_book_by_id(2)
+
+    get_book_by_id(3)
+    assert counter.count == 2
+    assert counter.repeated() == []
+
+
+def test_repeated_statements_flagged_as_n_plus_one(temp_db):
+    """Test that one statement run per row with different parameters is flagged"""
+    with QueryCounter() as counter:
+        for book_id in (1, 2, 3):
+            get_book_by_id(book_id)
+
+    assert [(sql.split(' FROM ')[1], count) for sql, count in counter.repeated()] == \
+        [('books WHERE id = ?', 3)]
+
+
+def test_same_parameters_not_flagged(temp_db):
+    """Test that re-running the identical query is not reported as N+1"""
+    with QueryCounter() as counter:
+        for _ in range(3):
+            get_book_by_id(1)
+
+    assert counter.repeated() == []
+
+
+def test_budget_exceeded_raises(temp_db):
+    """Test that exceeding the budget fails with the statements listed"""
+    with pytest.raises(AssertionError, match='budget of 1 exceeded'):
+        with assert_max_queries(1):
+            get_book_by_id(1)
+            get_book_by_id(2)
+
+
+def test_budget_rejects_n_plus_one(temp_db):
+    """Test that allow_repeats=False fails on a likely N+1 pattern"""
+    with pytest.raises(AssertionError, match='N\\+1'):
+        with assert_max_queries(10, allow_repeats=False):
+            for book_id in (1, 2, 3):
+                get_book_by_id(book_id)
+
+
+def test_borrow_budget(books):
+    """Test the statement budget of a single borrow"""
+    # Five, not three: the book lookup, the open-loan count, the loan insert,
+    # the availability update and the catalog version bump. The single borrow
+    # keeps these as the separate database calls its unit tests mock; the
+    # batch path below is the one that merges the check into the update.
+    with assert_max_queries(5):
+        assert borrow_book_by_patron('123456', 1)[0]
+
+
+def test_batch_borrow_budget(books):
+    """Test that a batch borrow costs two statements per book plus a fixed overhead"""
+    with assert_max_queries(3 + 2 * 3):
+        success, _, _ = borrow_books_by_patron('123456', [1, 2, 3])
+    assert success
+
+
+def test_return_budget(books):
+    """Test the statement budget of a single return"""
+    borrow_book_by_patron('123456', 1)
+    # Includes the lookup of copies reserved for the patron's own holds,
+    # which become theirs once the return takes them below the limit
+    with assert_max_queries(6):
+        assert return_book_by_patron('123456', 1)[0]
+
+
+def test_patron_status_without_per_book_queries(books):
+    """Test that the status report loads all loans in one query"""
+    borrow_books_by_patron('123456', [1, 2, 3])
+    assert len(get_patron_borrowed_books('123456')) == 3
+
+    with assert_max_queries(1, allow_repeats=False):
+        report = get_patron_status_report('123456')
+    assert report['total_books_borrowed'] == 3
+
+
+def test_query_count_header_in_dev_mode(client):
+    """Test that development mode reports statements per request"""
+    client.application.config['DEV_TOOLS'] = True
+
+    response = client.get('/api/late_fee/123456/1')
+
+    assert response.headers[QUERY_COUNT_HEADER] == '1'
+
+
+def test_no_query_count_header_in_production(client):
+    """Test that the header is absent outside development mode"""
+    response = client.get('/api/late_fee/123456/1')
+
+    assert QUERY_COUNT_HEADER not in response.headers
@@ -0,0 +1,103 @@
+"""
+Tests for the compact book and loan record types
+"""
+
+import pickle
+from datetime import datetime, timedelta
+import pytest
+from flask import render_template_string
+from database import get_all_books, get_patron_borrowed_books, insert_book
+from records import BookRecord, LoanRecord
+from services.library_service import borrow_book_by_patron
+
+BOOK_ROW = (1, 'The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3, 2, 4)
+
+
+def test_book_record_behaves_like_dict():
+    """Test mapping access, iteration and equality with the equivalent dict"""
+    book = BookRecord(BOOK_ROW)
+    expected = dict(zip(BookRecord.fields, BOOK_ROW))
+
+    assert book['title'] == 'The Great Gatsby'
+    assert book.get('missing', 'default') == 'default'
+    assert 'isbn' in book and 'missing' not in book
+    assert list(book) == list(expected)
+    assert dict(book) == expected
+    assert book == expected
+    with pytest.raises(KeyError):
+        book['missing']
+
+
+def test_book_record_is_read_only_and_compact():
+    """Test that records have no per-instance dict and reject assignment"""
+    book = BookRecord(BOOK_ROW)
+
+    assert not hasattr(book, '__dict__')
+    with pytest.raises(TypeError):
+        book['title'] = 'Changed'
+
+
+def test_records_pickle():
+    """Test that records survive pickling (e.g. to worker processes)"""
+    book = BookRecord(BOOK_ROW)
+
+    assert pickle.loads(pickle.dumps(book)) == book
+
+
+def test_loan_record_parses_dates_lazily():
+    """Test that loan dates are parsed on first access only"""
+    due = datetime.now() - timedelta(days=1)
+    loan = LoanRecord((1, 'Title', 'Author', (due - timedelta(days=14)).isoformat(), due.isoformat()))
+
+    assert loan._due_date is None
+    assert loan['due_date'] == due
+    assert loan['due_date'] is loan['due_date']
+    assert loan['is_overdue'] is True
+    assert loan._borrow_date is None
+
+
+def test_database_returns_records(temp_db):
+    """Test that catalog and loan queries return records with the previous keys"""
+    insert_book('Record Book', 'Author', '9780000000001', 2, 2)
+    borrow_book_by_patron('123456', 1)
+
+    books = get_all_books()
+    loans = get_patron_borrowed_books('123456')
+
+    assert isinstance(books[0], BookRecord)
+    assert books[0]['available_copies'] == 1
+    assert isinstance(loans[0], LoanRecord)
+    assert set(loans[0]) == {'book_id', 'title', 'author', 'borrow_date', 'due_date', 'is_overdue'}
+    assert isinstance(loans[0]['due_date'], datetime)
+
+
+def test_records_in_templates_and_json(client):
+    """Test that templates and jsonify accept records"""
+    app = client.application
+    book = BookRecord(BOOK_ROW)
+    with app.test_request_context():
+        assert render_template_string('{{ book.title }}/{{ book["isbn"] }}', book=book) == \
+            'The Great Gatsby/9780743273565'
+        book_json = dict(book)
+        del book_json['row_version']
+        assert app.json.loads(app.json.dumps({'book': book})) == {'book': book_json}
+
+
+@pytest.mark.parametrize('request_args', [
+    ('get', '/api/search?q=gatsby', None),
+    ('get', '/api/search?q=gatsby&limit=5', None),
+    ('get', '/api/search?q=gatsby&format=ndjson', None),
+    ('post', '/api/search/batch', {'queries': [{'q': 'gatsby'}]}),
+])
+def test_api_book_keys_exclude_internal_fields(client, request_args):
+    """Test that API responses show the public book fields only, without row_version"""
+    method, url, body = request_args
+    response = getattr(client, method)(url, json=body)
+
+    if 'ndjson' in url:
+        book = client.application.json.loads(response.data.splitlines()[0])
+    elif 'batch' in url:
+        book = response.get_json()['results'][0]['books'][0]
+    else:
+        book = response.get_json()['results'][0]
+    assert set(book) == {'id', 'title', 'author', 'isbn', 'total_copies', 'available_copies'}
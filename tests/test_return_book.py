@@ -12,8 +12,8 @@ def test_return_book_valid_no_late_fee():
     """Test successful retuen with no late fees"""
     with patch('services.library_service.get_book_by_id') as mock_get_book, \
         patch('services.library_service.get_patron_borrowed_books') as mock_get_borrowed, \
-        patch('services.library_service.update_borrow_record_return_date', return_value = True), \
-        patch('services.library_service.update_book_availability', return_value = True):
+        patch('services.library_service.return_book_to_next_hold',
+              return_value = {'returned': True, 'lent_to': None}):
 
         mock_get_book.return_value = {
             "id": 1, 
@@ -39,8 +39,8 @@ def test_return_book_with_late_fee():
         
     with patch('services.library_service.get_book_by_id') as mock_get_book, \
         patch('services.library_service.get_patron_borrowed_books') as mock_get_borrowed, \
-        patch('services.library_service.update_borrow_record_return_date', return_value = True), \
-        patch('services.library_service.update_book_availability', return_value = True):
+        patch('services.library_service.return_book_to_next_hold',
+              return_value = {'returned': True, 'lent_to': None}):
         mock_get_book.return_value = {
             "id": 1, 
             "title": "Test Book",
@@ -65,8 +65,8 @@ def test_return_book_late_fee_cap():
 
     with patch('services.library_service.get_book_by_id') as mock_get_book, \
         patch('services.library_service.get_patron_borrowed_books') as mock_get_borrowed, \
-        patch('services.library_service.update_borrow_record_return_date', return_value = True), \
-        patch('services.library_service.update_book_availability', return_value = True):
+        patch('services.library_service.return_book_to_next_hold',
+              return_value = {'returned': True, 'lent_to': None}):
         mock_get_book.return_value = {
             "id": 1, 
             "title": "Test Book",
@@ -121,7 +121,7 @@ def test_return_book_database_error():
     """Test return when database update fails"""
     with patch('services.library_service.get_book_by_id') as mock_get_book, \
          patch('services.library_service.get_patron_borrowed_books') as mock_get_borrowed, \
-         patch('services.library_service.update_borrow_record_return_date', return_value=False):
+         patch('services.library_service.return_book_to_next_hold', return_value=None):
         
         mock_get_book.return_value = {
             "id": 1, 
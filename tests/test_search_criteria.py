@@ -0,0 +1,106 @@
+"""
+Tests for multi-criteria search answered by SQL
+"""
+
+import pytest
+from database import _book_search_query, insert_book, search_books, update_book_availability
+from instrumentation.query_count import QueryCounter
+from services.library_service import iter_search_books_in_catalog, search_books_in_catalog
+
+
+@pytest.fixture
+def books(temp_db):
+    insert_book('The Hobbit', 'J.R.R. Tolkien', '9780000000001', 3, 3)
+    insert_book('The Silmarillion', 'J.R.R. Tolkien', '9780000000002', 1, 1)
+    insert_book('Dune', 'Frank Herbert', '9780000000003', 2, 2)
+    insert_book('100% Done_Right', 'Ann Other', '9780000000004', 5, 5)
+    update_book_availability(2, -1)
+
+
+def titles(books):
+    return [book['title'] for book in books]
+
+
+def test_query_is_parameterized():
+    """Test that criteria values are passed as parameters, not spliced into SQL"""
+    sql, parameters = _book_search_query(title="x' OR 1=1 --", min_copies=2, limit=10, offset=5)
+
+    assert "OR 1=1" not in sql
+    assert parameters == ("%x' OR 1=1 --%", 2, 10, 5)
+
+
+def test_combined_criteria(books):
+    """Test that all given criteria must hold"""
+    assert titles(search_books(author='tolkien')) == ['The Hobbit', 'The Silmarillion']
+    assert titles(search_books(author='tolkien', available=True)) == ['The Hobbit']
+    assert titles(search_books(available=False)) == ['The Silmarillion']
+    assert titles(search_books(min_copies=2, max_copies=3)) == ['Dune', 'The Hobbit']
+    assert titles(search_books(title='the', author='tolkien', isbn='9780000000002')) == ['The Silmarillion']
+
+
+def test_wildcards_match_literally(books):
+    """Test that % and _ in a term are not LIKE wildcards"""
+    assert titles(search_books(title='100%')) == ['100% Done_Right']
+    assert titles(search_books(title='e_r')) == ['100% Done_Right']
+    assert titles(search_books(title='dun_')) == []
+
+
+def test_sort_limit_offset(books):
+    """Test sort orders and paging"""
+    assert titles(search_books(sort='author')) == ['100% Done_Right', 'Dune', 'The Hobbit', 'The Silmarillion']
+    assert titles(search_books(sort='newest', limit=2)) == ['100% Done_Right', 'Dune']
+    assert titles(search_books(sort='newest', limit=2, offset=2)) == ['The Silmarillion', 'The Hobbit']
+    assert titles(search_books(sort='available', offset=3)) == ['The Silmarillion']
+
+
+def test_service_uses_one_query(books):
+    """Test that the service combines the term and criteria in a single statement"""
+    with QueryCounter() as counter:
+        results = search_books_in_catalog('tolkien', 'author', available=True, sort='title')
+
+    assert titles(results) == ['The Hobbit']
+    assert counter.count == 1
+    assert titles(iter_search_books_in_catalog('', 'title', author='herbert')) == ['Dune']
+
+
+def test_service_rejects_invalid_criteria(books):
+    """Test that invalid criteria give no results"""
+    assert search_books_in_catalog('', 'title', sort='random') == []
+    assert search_books_in_catalog('', 'title', limit=-1) == []
+    assert search_books_in_catalog('', 'title', colour='red') == []
+    assert search_books_in_catalog('dune', 'title', title='dune') == []
+    assert search_books_in_catalog('dune', 'title', True, available=True) == []
+    assert search_books_in_catalog('', 'title', title=None) == []
+
+
+def test_api_search_criteria(books, client):
+    """Test criteria on the search API"""
+    response = client.get('/api/search?author=tolkien&available=true&sort=title&limit=5')
+
+    data = response.get_json()
+    assert response.status_code == 200
+    assert titles(data['results']) == ['The Hobbit']
+    assert data['criteria'] == {'author': 'tolkien', 'available': True, 'sort': 'title', 'limit': 5}
+
+
+def test_api_search_invalid_criteria(books, client):
+    """Test that malformed criteria are rejected"""
+    assert client.get('/api/search?author=x&limit=ten').status_code == 400
+    assert client.get('/api/search?available=maybe').status_code == 400
+    assert client.get('/api/search?title=x&sort=random').status_code == 400
+    assert client.get('/api/search?q=x&type=title&title=y').status_code == 400
+    assert client.get('/api/search?q=x&type=colour&limit=10').status_code == 400
+    assert client.get('/api/search?q=x&type=colour').status_code == 400
+
+
+def test_non_ascii_terms_match_like_plain_search(temp_db):
+    """Test that criteria searches fold case beyond ASCII, as plain searches do"""
+    insert_book('Die Brücke', 'Hanna Müller', '9780000000005', 1, 1)
+    insert_book('Über Alles', 'ÉMILE ZOLA', '9780000000006', 1, 1)
+
+    for term, search_type in (('MÜLLER', 'author'), ('brÜcke', 'title'), ('émile', 'author'), ('über', 'title')):
+        plain = search_books_in_catalog(term, search_type)
+        assert len(plain) == 1
+        assert search_books_in_catalog(term, search_type, limit=10) == plain
+    assert search_books(author='müller') == search_books(author='MÜLLER')
+    assert search_books(author='muller') == []
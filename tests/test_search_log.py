@@ -0,0 +1,170 @@
+"""
+Tests for the search query log and search cache prewarming
+"""
+
+import time
+from datetime import datetime
+import pytest
+import database
+from database import get_top_search_queries, insert_book, record_search_queries
+from services.catalog_snapshot import catalog_snapshot
+from services.library_service import suggest_search_terms
+from services.search_log import SearchLog, prewarm_search_caches, search_log
+
+
+@pytest.fixture
+def books(temp_db):
+    catalog_snapshot.clear()
+    search_log.flush()
+    insert_book('The Hobbit', 'J.R.R. Tolkien', '9780000000001', 3, 3)
+    insert_book('The Histories', 'Herodotus', '9780000000002', 1, 1)
+    yield
+    catalog_snapshot.clear()
+
+
+def top():
+    return [(q['search_type'], q['query'], q['count']) for q in get_top_search_queries()]
+
+
+def test_searches_are_normalized_and_aggregated(books):
+    """Test that equal searches share one counter row"""
+    log = SearchLog()
+    log.record('The  Hobbit', 'title')
+    log.record(' the hobbit ', 'title')
+    log.record('tolkien', 'author')
+    log.record('   ', 'title')
+    log.record('hobbit', 'genre')
+
+    assert log.flush() == 2
+    log.record('THE HOBBIT', 'title')
+    log.flush()
+
+    assert top() == [('title', 'the hobbit', 3), ('author', 'tolkien', 1)]
+
+
+def test_counts_are_flushed_in_background(books):
+    """Test that the flush thread writes counts without an explicit flush"""
+    log = SearchLog(flush_interval=0.05)
+    log.record('hobbit', 'title')
+
+    deadline = time.time() + 5
+    while not top() and time.time() < deadline:
+        time.sleep(0.05)
+    assert top() == [('title', 'hobbit', 1)]
+
+
+def test_counts_go_to_the_database_they_were_recorded_for(books, tmp_path, monkeypatch):
+    """Test that pending counts are written to the database that was current when recorded"""
+    log = SearchLog()
+    log.record('hobbit', 'title')
+    recorded_in = database.DATABASE
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'other.db'))
+    database.init_database()
+
+    log.flush()
+
+    assert top() == []
+    monkeypatch.setattr(database, 'DATABASE', recorded_in)
+    assert top() == [('title', 'hobbit', 1)]
+
+
+def test_routes_record_searches(books, client):
+    """Test that page and API searches are counted"""
+    client.get('/search?q=Hobbit&type=title')
+    client.get('/api/search?q=hobbit&type=title')
+    client.get('/api/search?author=tolkien')
+    search_log.flush()
+
+    assert top() == [('title', 'hobbit', 2)]
+
+
+def test_not_modified_searches_are_counted(books, client):
+    """Test that repeated searches answered 304 Not Modified are counted"""
+    etag = client.get('/api/search?q=hobbit&type=title').headers['ETag']
+    response = client.get('/api/search?q=hobbit&type=title', headers={'If-None-Match': etag})
+    client.get('/search?q=hobbit&type=title', headers={'If-None-Match': etag})
+    client.get('/api/search?q=hobbit&type=title&limit=ten')
+    search_log.flush()
+
+    assert response.status_code == 304
+    assert top() == [('title', 'hobbit', 3)]
+
+
+def test_top_searches_require_admin(books, client):
+    """Test that top searches are only shown to administrators"""
+    client.get('/api/search?q=hobbit&type=title')
+    assert client.get('/api/search/top').status_code == 403
+
+    client.application.config['ADMIN_TOKEN'] = 'secret'
+    response = client.get('/api/search/top?limit=5', headers={'X-Admin-Token': 'secret'})
+
+    assert response.status_code == 200
+    assert [(q['query'], q['count']) for q in response.get_json()['queries']] == [('hobbit', 1)]
+    assert client.get('/api/search/top?type=genre', headers={'X-Admin-Token': 'secret'}).status_code == 400
+
+
+def test_prewarm_builds_search_caches(books):
+    """Test that prewarming loads the snapshot and builds its indexes"""
+    summary = prewarm_search_caches()
+
+    columns = catalog_snapshot.view()._columns
+    assert summary == {'books': 2}
+    assert columns.title_index is not None and columns.author_index is not None
+    assert catalog_snapshot._prefix_indexes.keys() == {'title', 'author'}
+
+
+def test_searches_boost_suggestions(books):
+    """Test that frequently searched titles are suggested first"""
+    assert suggest_search_terms('the h', 'title') == ['The Histories', 'The Hobbit']
+
+    record_search_queries({('title', 'the hobbit'): 3}, datetime.now())
+    catalog_snapshot.clear()
+
+    assert suggest_search_terms('the h', 'title') == ['The Hobbit', 'The Histories']
+
+
+def test_app_prewarms_in_background_after_start(books, monkeypatch):
+    """Test that the app prewarms on its first request, in a background thread, not when created"""
+    import threading
+    from app import create_app
+    from services import search_log as search_log_module
+    monkeypatch.setenv('LIBRARY_PREWARM', '1')
+    monkeypatch.setattr(search_log_module, '_prewarm_pid', None)
+    app = create_app(fast_startup=True)
+
+    assert catalog_snapshot._prefix_indexes == {}
+
+    app.test_client().get('/search')
+    for thread in threading.enumerate():
+        if thread.name == 'search-prewarm':
+            thread.join(timeout=10)
+
+    assert catalog_snapshot._prefix_indexes.keys() == {'title', 'author'}
+
+
+def test_prewarm_hook_removed_after_first_request(client, monkeypatch):
+    """Test that only the first request runs the prewarm hook"""
+    from services import search_log as search_log_module
+    calls = []
+    monkeypatch.setattr(search_log_module, 'prewarm_in_background', lambda: calls.append(1))
+    client.application.config['SEARCH_PREWARM'] = True
+
+    client.get('/search')
+    client.get('/search')
+    client.get('/catalog')
+
+    assert calls == [1]
+    assert all(hook.__name__ != '_start_prewarm'
+               for hook in client.application.before_request_funcs.get(None, []))
+
+
+def test_prewarm_runs_once_per_process(books, monkeypatch):
+    """Test that only the first call in a process starts prewarming"""
+    from services import search_log as search_log_module
+    monkeypatch.setattr(search_log_module, '_prewarm_pid', None)
+
+    thread = search_log_module.prewarm_in_background()
+    thread.join(timeout=10)
+
+    assert search_log_module.prewarm_in_background() is None
+    assert catalog_snapshot._prefix_indexes.keys() == {'title', 'author'}
@@ -0,0 +1,91 @@
+"""
+Tests for SQL statement timing, the slow-query log and the /dev/sql dashboard
+"""
+
+import logging
+import pytest
+from database import get_db_connection, get_books_by_ids, search_books
+from instrumentation.sql_timing import (
+    StatementTimer, explain_query_plan, is_full_scan, normalize_sql, statement_timer
+)
+
+
+@pytest.fixture
+def timer(client):
+    """The process statement timer, reset, with every statement treated as slow."""
+    statement_timer.reset()
+    previous = statement_timer.slow_threshold
+    statement_timer.slow_threshold = 0.0
+    yield statement_timer
+    statement_timer.slow_threshold = previous
+    statement_timer.reset()
+
+
+def test_normalize_sql():
+    """Test that whitespace and placeholder lists are folded"""
+    assert normalize_sql("SELECT *\n   FROM books WHERE id IN (?, ?,?)") == \
+        "SELECT * FROM books WHERE id IN (...)"
+
+
+def test_statements_aggregated(timer):
+    """Test that the same statement with different parameters is counted together"""
+    get_books_by_ids([1])
+    get_books_by_ids([1, 2, 3])
+
+    stats = [s for s in timer.top(order_by='count') if 'WHERE id IN' in s.sql]
+    assert len(stats) == 1
+    assert stats[0].count == 2
+    assert stats[0].total >= stats[0].max > 0
+
+
+def test_slow_query_logged_with_full_scan(timer, caplog):
+    """Test that slow statements are logged with their query plan and full scans flagged"""
+    with caplog.at_level(logging.WARNING, logger='library.sql'):
+        conn = get_db_connection()
+        conn.execute('SELECT * FROM borrow_records WHERE due_date < ?', ('2024-01-01',)).fetchall()
+        conn.close()
+
+    slow = [q for q in timer.slow_queries if 'FROM borrow_records' in q['sql']]
+    assert slow
+    assert slow[0]['plan']
+    assert slow[0]['full_scan'] is True
+    assert any('FULL SCAN' in record.getMessage() for record in caplog.records)
+
+
+def test_slow_query_explained_on_its_own_connection(timer):
+    """Test that statements using connection SQL functions still get a plan"""
+    search_books(title='Müller')
+
+    slow = [q for q in timer.slow_queries if 'py_lower' in q['sql']]
+    assert slow
+    assert not any(step.startswith('EXPLAIN failed') for step in slow[0]['plan'])
+
+
+def test_fast_statements_not_logged(client):
+    """Test that statements under the threshold are only aggregated"""
+    timer = StatementTimer(slow_threshold=10.0)
+    timer.record("SELECT 1", (), 0.001)
+    assert len(timer.slow_queries) == 0
+    assert timer.top()[0].count == 1
+
+
+def test_index_lookup_is_not_full_scan(temp_db):
+    """Test full scan detection against an indexed lookup"""
+    assert not is_full_scan(explain_query_plan('SELECT * FROM books WHERE id = ?', (1,)))
+    assert is_full_scan(explain_query_plan('SELECT * FROM books WHERE total_copies = ?', (1,)))
+
+
+def test_dashboard_requires_dev_mode(client):
+    """Test that the dashboard is hidden outside dev mode"""
+    assert client.get('/dev/sql').status_code == 404
+
+
+def test_dashboard_lists_statements(client, timer):
+    """Test that the dashboard shows the recorded statements"""
+    client.application.config['DEV_TOOLS'] = True
+    client.get('/catalog')
+
+    response = client.get('/dev/sql')
+    assert response.status_code == 200
+    assert b"row_version FROM books" in response.data
+    assert b"FULL SCAN" in response.data
@@ -0,0 +1,47 @@
+"""
+Tests for the fast application startup mode
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+import database
+from app import create_app
+
+
+def test_fast_startup_skips_sample_data(tmp_path, monkeypatch):
+    """Test that fast startup creates the schema but no sample books"""
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'library.db'))
+    create_app(fast_startup=True)
+
+    assert database.schema_is_current()
+    assert database.get_all_books() == []
+
+
+def test_fast_startup_skips_init_when_current(temp_db, monkeypatch):
+    """Test that an up-to-date schema is not re-initialized"""
+    def fail():
+        raise AssertionError("init_database should not run")
+    monkeypatch.setattr(database, 'init_database', fail)
+
+    create_app(fast_startup=True)
+
+
+def test_fast_startup_from_environment(tmp_path, monkeypatch):
+    """Test that LIBRARY_FAST_STARTUP selects fast startup"""
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'library.db'))
+    monkeypatch.setenv('LIBRARY_FAST_STARTUP', '1')
+    create_app()
+
+    assert database.get_all_books() == []
+
+
+def test_payment_stack_imported_lazily():
+    """Test that creating the app does not import the payment gateway or requests"""
+    code = ("import sys, app; "
+            "print('services.payment_service' in sys.modules, 'requests' in sys.modules)")
+    repo_root = os.path.dirname(os.path.abspath(database.__file__))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True, cwd=repo_root).stdout
+    assert output.split() == ['False', 'False']
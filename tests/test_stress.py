@@ -0,0 +1,63 @@
+"""
+Tests for the concurrency stress harness
+"""
+
+import sqlite3
+from tools.stress import check_invariants, run
+
+
+def test_check_invariants_clean(synthetic_db):
+    """Test that generated data passes every invariant"""
+    violations = check_invariants(synthetic_db['path'])
+
+    assert violations == {'available_mismatch': [], 'negative_available': [], 'duplicate_open_loans': []}
+
+
+def test_check_invariants_reports_violations(synthetic_db):
+    """Test that broken counts and duplicate loans are reported"""
+    conn = sqlite3.connect(synthetic_db['path'])
+    conn.execute('UPDATE books SET available_copies = -1 WHERE id = 1')
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES ('123456', 2, '2024-06-01T00:00:00', '2024-06-15T00:00:00')
+    ''', [(), ()])
+    conn.commit()
+    conn.close()
+
+    violations = check_invariants(synthetic_db['path'])
+
+    assert len(violations['negative_available']) == 1
+    assert {v.split(':')[0] for v in violations['available_mismatch']} == {'book 1', 'book 2'}
+    assert violations['duplicate_open_loans'] == ['patron 123456 has 2 open loans of book 2']
+
+
+def test_batch_path_keeps_copies_consistent(temp_db):
+    """Test that concurrent transactional borrows and returns never lose a copy"""
+    from tools.datagen import generate_library
+    summary = generate_library(temp_db, books=3, patrons=20, loans=0, seed=2)
+
+    report = run(temp_db, processes=0, threads=4, operations=50, books=3,
+                 patrons=summary['patrons'], seed=2, call_path='batch')
+
+    assert report['operations'] == 200
+    assert report['ops_per_second'] > 0
+    assert report['violations']['available_mismatch'] == []
+    assert report['violations']['negative_available'] == []
+
+
+def test_run_uses_books_added_to_existing_database(temp_db):
+    """Test that only the books added for the run are borrowed when the database already had books"""
+    from tools.datagen import generate_library
+    generate_library(temp_db, books=4, patrons=5, loans=0, seed=1)
+    summary = generate_library(temp_db, books=2, patrons=20, loans=0, seed=2)
+
+    report = run(temp_db, processes=0, threads=2, operations=40, books=2,
+                 patrons=summary['patrons'], seed=2, call_path='batch',
+                 first_book_id=summary['first_book_id'])
+
+    conn = sqlite3.connect(temp_db)
+    borrowed = {row[0] for row in conn.execute('SELECT DISTINCT book_id FROM borrow_records')}
+    conn.close()
+    assert summary['first_book_id'] == 5
+    assert report['outcomes'].get('borrow_succeeded', 0) > 0
+    assert borrowed <= {5, 6}
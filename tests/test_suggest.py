@@ -0,0 +1,107 @@
+"""
+Tests for prefix autocomplete
+"""
+
+import pytest
+from database import insert_book
+from instrumentation.query_count import QueryCounter
+from services.catalog_snapshot import catalog_snapshot
+from services.library_service import borrow_book_by_patron, suggest_search_terms
+from services.prefix_index import PrefixIndex
+
+
+@pytest.fixture
+def catalog(temp_db):
+    """A fresh snapshot over a few books, 'The Hobbit' borrowed twice."""
+    catalog_snapshot.clear()
+    insert_book('The Great Gatsby', 'F. Scott Fitzgerald', '9780000000001', 3, 3)
+    insert_book('The Hobbit', 'J.R.R. Tolkien', '9780000000002', 3, 3)
+    insert_book('The Silmarillion', 'J.R.R. Tolkien', '9780000000003', 3, 3)
+    insert_book('Theory of Everything', 'Stephen Hawking', '9780000000004', 3, 3)
+    borrow_book_by_patron('123456', 2)
+    borrow_book_by_patron('654321', 2)
+    yield catalog_snapshot
+    catalog_snapshot.clear()
+
+
+def test_complete_ranks_by_popularity_then_alphabetically():
+    """Test that the most popular completions come first"""
+    index = PrefixIndex([('apple', 'Apple', 1), ('apricot', 'Apricot', 5),
+                         ('banana', 'Banana', 9), ('avocado', 'Avocado', 1)])
+
+    assert index.complete('a') == [('Apricot', 5), ('Apple', 1), ('Avocado', 1)]
+    assert index.complete('A', limit=1) == [('Apricot', 5)]
+    assert index.complete('ap') == [('Apricot', 5), ('Apple', 1)]
+    assert index.complete('c') == []
+
+
+def test_duplicate_keys_are_merged():
+    """Test that texts normalizing equal appear once with summed popularity"""
+    index = PrefixIndex([('dune', 'Dune', 2), ('dune', 'DUNE', 3), ('dubliners', 'Dubliners', 4)])
+
+    assert len(index) == 2
+    assert index.complete('du') == [('Dune', 5), ('Dubliners', 4)]
+
+
+def test_large_range_returns_top_k():
+    """Test top-k extraction from a range holding many texts"""
+    entries = [(f'book {i:05d}', f'Book {i:05d}', i % 1000) for i in range(20000)]
+    index = PrefixIndex(entries)
+
+    top = index.complete('book', limit=5)
+    assert [popularity for _, popularity in top] == [999] * 5
+    assert [label for label, _ in top] == ['Book 00999', 'Book 01999', 'Book 02999', 'Book 03999', 'Book 04999']
+
+
+def test_suggest_titles_by_loans(catalog):
+    """Test title completions from the catalog, most borrowed first"""
+    assert suggest_search_terms('the', 'title') == \
+        ['The Hobbit', 'The Great Gatsby', 'The Silmarillion', 'Theory of Everything']
+    assert suggest_search_terms('THE  ', 'title') == ['The Hobbit', 'The Great Gatsby', 'The Silmarillion']
+    assert suggest_search_terms('the', 'title', limit=1) == ['The Hobbit']
+
+
+def test_suggest_authors_are_distinct(catalog):
+    """Test that an author with several books is suggested once"""
+    assert suggest_search_terms('j', 'author') == ['J.R.R. Tolkien']
+
+
+def test_suggest_invalid_input(catalog):
+    """Test that empty prefixes and ISBN searches give no suggestions"""
+    assert suggest_search_terms('', 'title') == []
+    assert suggest_search_terms('   ', 'title') == []
+    assert suggest_search_terms('978', 'isbn') == []
+
+
+def test_new_book_is_suggested(catalog):
+    """Test that the index is rebuilt off the request path once a book is added"""
+    assert suggest_search_terms('dune', 'title') == []
+
+    insert_book('Dune', 'Frank Herbert', '9780000000005', 1, 1)
+
+    # The previous index answers while the new one is built
+    assert suggest_search_terms('dune', 'title') == []
+    catalog.prefix_index('title', wait=True)
+    assert suggest_search_terms('dune', 'title') == ['Dune']
+
+
+def test_loans_raise_popularity_without_recounting(catalog):
+    """Test that new loans reorder completions without counting every loan again"""
+    assert suggest_search_terms('the', 'title', limit=1) == ['The Hobbit']
+
+    for patron_id in ('111111', '222222', '333333'):
+        borrow_book_by_patron(patron_id, 3)
+    with QueryCounter() as counter:
+        suggestions = suggest_search_terms('the', 'title', limit=2)
+
+    assert suggestions == ['The Silmarillion', 'The Hobbit']
+    assert not any('GROUP BY' in statement[0] for statement in counter.statements)
+
+
+def test_suggest_api(catalog, client):
+    """Test the suggest endpoint"""
+    response = client.get('/api/suggest?q=the%20h&type=title')
+
+    assert response.status_code == 200
+    assert response.get_json()['suggestions'] == ['The Hobbit']
+    assert client.get('/api/suggest?q=&type=title').status_code == 400
@@ -0,0 +1,108 @@
+"""
+Tests for tracing spans across routes, services, SQL and the payment gateway
+"""
+
+import json
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+import database
+from instrumentation.tracing import InMemoryCollector, JsonlExporter, tracer
+from services.library_service import pay_late_fees
+from services.payment_service import PaymentGateway
+
+
+@pytest.fixture
+def collector():
+    collector = InMemoryCollector()
+    tracer.set_exporter(collector)
+    yield collector
+    tracer.set_exporter(None)
+
+
+def _overdue_loan(patron_id, book_id):
+    conn = database.get_db_connection()
+    conn.execute('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)',
+                 (patron_id, book_id, (datetime.now() - timedelta(days=20)).isoformat(),
+                  (datetime.now() - timedelta(days=6)).isoformat()))
+    conn.commit()
+    conn.close()
+
+
+def test_no_spans_when_disabled(client):
+    """Test that nothing is recorded or echoed without an exporter"""
+    response = client.get('/catalog')
+    assert 'X-Trace-Id' not in response.headers
+
+
+def test_pay_late_fees_nested_spans(client, collector):
+    """Test that service, SQL and gateway spans nest under the calling span"""
+    _overdue_loan("654321", 1)
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, 'txn_1', 'Success')
+
+    with tracer.span('test') as root:
+        success, _, _ = pay_late_fees("654321", 1, gateway)
+    assert success
+
+    spans = {span.name: span for span in collector.trace(root.trace_id)}
+    pay = spans['services.library_service.pay_late_fees']
+    fee = spans['services.library_service.calculate_late_fee_for_book']
+    gateway_span = spans['payment_gateway.process_payment']
+
+    assert pay.parent_id == root.span_id
+    assert fee.parent_id == pay.span_id
+    assert gateway_span.parent_id == pay.span_id
+    assert pay.attributes == {'patron_id': "654321", 'book_id': 1}
+    assert gateway_span.attributes['amount'] == 3.00
+
+    sql = [span for span in collector.trace(root.trace_id) if span.name == 'sql']
+    assert any(span.parent_id == fee.span_id and 'borrow_records' in span.attributes['db.statement']
+               for span in sql)
+
+
+def test_route_span_continues_incoming_traceparent(client, collector):
+    """Test that a W3C traceparent header is continued by the route span"""
+    trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+    parent_id = '00f067aa0ba902b7'
+    response = client.get('/api/late_fee/123456/3', headers={'traceparent': f'00-{trace_id}-{parent_id}-01'})
+
+    assert response.headers['X-Trace-Id'] == trace_id
+    spans = collector.trace(trace_id)
+    route = [span for span in spans if span.name == 'GET api.get_late_fee'][0]
+    assert route.parent_id == parent_id
+    assert route.attributes['http.status_code'] == 200
+    service = [span for span in spans if span.name.endswith('calculate_late_fee_for_book')][0]
+    assert service.parent_id == route.span_id
+
+
+def test_service_error_marks_span(collector, monkeypatch):
+    """Test that an exception is recorded on the span and re-raised"""
+    def fail(*args):
+        raise RuntimeError("database down")
+    monkeypatch.setattr('services.library_service.get_patron_borrowed_books', fail)
+
+    from services.library_service import calculate_late_fee_for_book
+    with pytest.raises(RuntimeError):
+        calculate_late_fee_for_book("123456", 1)
+
+    assert collector.spans[-1].status == 'error'
+    assert 'database down' in collector.spans[-1].attributes['error']
+
+
+def test_jsonl_exporter(tmp_path, temp_db):
+    """Test that spans are written one JSON object per line"""
+    path = tmp_path / 'traces' / 'spans.jsonl'
+    exporter = JsonlExporter(str(path))
+    tracer.set_exporter(exporter)
+    try:
+        with tracer.span('outer', book_id=7):
+            database.get_book_by_id(1)
+    finally:
+        tracer.set_exporter(None)
+        exporter.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['name'] for record in records] == ['sql', 'outer']
+    assert records[0]['parent_id'] == records[1]['span_id']
+    assert records[1]['attributes'] == {'book_id': 7}
@@ -0,0 +1,94 @@
+"""
+Tests for trigram substring and fuzzy search
+"""
+
+import pytest
+from database import insert_book
+from services.catalog_snapshot import catalog_snapshot, get_all_books
+from services.library_service import search_books_in_catalog
+from services.trigram_index import build_index, similarity
+
+
+@pytest.fixture
+def catalog(temp_db):
+    """A fresh snapshot over a database with a few books."""
+    catalog_snapshot.clear()
+    insert_book('To Kill a Mockingbird', 'Harper Lee', '9780000000001', 2, 2)
+    insert_book('The Great Gatsby', 'F. Scott Fitzgerald', '9780000000002', 1, 1)
+    insert_book('Mockingjay', 'Suzanne Collins', '9780000000003', 1, 1)
+    insert_book('1984', 'George Orwell', '9780000000004', 1, 1)
+    yield catalog_snapshot
+    catalog_snapshot.clear()
+
+
+def test_candidates_intersect_posting_lists():
+    """Test that only texts containing every trigram of the term are candidates"""
+    index = build_index(['to kill a mockingbird', 'mockingjay', 'the great gatsby'])
+
+    assert index.candidates('mocking') == [0, 1]
+    assert index.candidates('ockingb') == [0]
+    assert index.candidates('zebra') == []
+    assert index.candidates('mo') is None
+    assert index.candidates('mocking', limit=1) == [0]
+
+
+def test_similarity_tolerates_typos():
+    """Test that a misspelled word keeps most of its trigrams"""
+    assert similarity('mockingbird', 'to kill a mockingbird') == 1.0
+    assert similarity('mockngbird', 'to kill a mockingbird') >= 0.5
+    assert similarity('mockngbird', 'the great gatsby') < 0.5
+
+
+def test_mid_word_substring_search(catalog):
+    """Test that substrings inside a word are found through the index"""
+    results = search_books_in_catalog('ockingb', 'title')
+
+    assert [book['title'] for book in results] == ['To Kill a Mockingbird']
+    assert [book['title'] for book in search_books_in_catalog('MOCKING', 'title')] == \
+        ['Mockingjay', 'To Kill a Mockingbird']
+
+
+def test_short_terms_fall_back_to_scan(catalog):
+    """Test that terms shorter than a trigram still match"""
+    assert [book['title'] for book in search_books_in_catalog('19', 'title')] == ['1984']
+
+
+def test_fuzzy_search_ranks_closest_first(catalog):
+    """Test that fuzzy search finds misspelled titles and authors"""
+    assert search_books_in_catalog('mockngbird', 'title') == []
+
+    results = search_books_in_catalog('mockngbird', 'title', fuzzy=True)
+    assert results[0]['title'] == 'To Kill a Mockingbird'
+    assert [book['author'] for book in search_books_in_catalog('orwel', 'author', fuzzy=True)] == \
+        ['George Orwell']
+
+
+def test_fuzzy_isbn_search_stays_exact(catalog):
+    """Test that fuzzy has no effect on ISBN searches"""
+    assert search_books_in_catalog('9780000000004', 'isbn', fuzzy=True)[0]['title'] == '1984'
+    assert search_books_in_catalog('9780000000005', 'isbn', fuzzy=True) == []
+
+
+def test_inserted_book_is_indexed(catalog):
+    """Test that a book added after the snapshot loaded is found by substring and fuzzy search"""
+    before = get_all_books()
+    # Build the indexes, so the insert below is added to them incrementally
+    before.search('mockingbird', 'title')
+    before.similar('mockingbird', 'title')
+    insert_book('The Mockingbird Next Door', 'Marja Mills', '9780000000005', 1, 1)
+
+    assert [book['title'] for book in search_books_in_catalog('mockingbird', 'title')] == \
+        ['The Mockingbird Next Door', 'To Kill a Mockingbird']
+    assert 'The Mockingbird Next Door' in [
+        book['title'] for book in search_books_in_catalog('mokingbird', 'title', fuzzy=True)]
+    # Views taken earlier keep their own rows
+    assert [book['title'] for book in before.search('mockingbird', 'title')] == ['To Kill a Mockingbird']
+
+
+def test_api_search_fuzzy(catalog, client):
+    """Test the fuzzy flag on the search API"""
+    response = client.get('/api/search?q=gatsbyy&type=title&fuzzy=1')
+
+    data = response.get_json()
+    assert data['fuzzy'] is True
+    assert [book['title'] for book in data['results']] == ['The Great Gatsby']
@@ -0,0 +1,251 @@
+"""
+Synthetic Data Generator - deterministic books, patrons and loan histories for load testing
+
+The same seed always produces the same database. Titles and authors are
+drawn from Zipf-weighted vocabularies, so a few words and surnames are
+common and most are rare, as in a real catalog. ISBNs are valid, unique
+ISBN-13s. Loans respect the library's rules: open loans never exceed a
+book's copies, a patron has at most MAX_BORROWED_BOOKS open loans and never
+two open loans of the same book. A configurable share of the open loans is
+overdue.
+
+From the command line:
+
+    python -m tools.datagen --books 100000 --patrons 20000 --loans 1000000 --output library.db
+
+From tests:
+
+    summary = generate_library(str(tmp_path / 'library.db'), books=500, loans=2000, seed=1)
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import database
+from services.library_service import MAX_BORROWED_BOOKS
+
+LOAN_DAYS = 14
+MINUTES_PER_DAY = 24 * 60
+
+ADJECTIVES = ('Silent', 'Lost', 'Golden', 'Hidden', 'Last', 'Broken', 'Secret', 'Dark', 'Little', 'Wild',
+              'Forgotten', 'Burning', 'Quiet', 'Crimson', 'Distant', 'Endless', 'Frozen', 'Bright',
+              'Northern', 'Hollow', 'Restless', 'Painted', 'Midnight', 'Invisible', 'Bitter')
+NOUNS = ('River', 'House', 'Garden', 'Night', 'City', 'Sea', 'Mountain', 'Kingdom', 'Letter', 'Road',
+         'Island', 'Storm', 'Mirror', 'Forest', 'Song', 'Winter', 'Empire', 'Shadow', 'Heart', 'Bridge',
+         'Lighthouse', 'Orchard', 'Harbor', 'Fire', 'Stone', 'Window', 'Daughter', 'Clockmaker', 'Map', 'Wolf')
+PLACES = ('Paris', 'the North', 'Venice', 'the Valley', 'Kyoto', 'the Desert', 'Lagos', 'the Moor',
+          'Prague', 'the Coast', 'Lisbon', 'the Hills')
+FIRST_NAMES = ('James', 'Maria', 'Wei', 'Aisha', 'John', 'Elena', 'Hiroshi', 'Fatima', 'David', 'Olga',
+               'Carlos', 'Priya', 'Thomas', 'Amara', 'Lucas', 'Ingrid', 'Kofi', 'Sofia', 'Ahmed', 'Grace',
+               'Mateo', 'Yuki', 'Samuel', 'Leila', 'Henry', 'Nadia', 'Arjun', 'Clara', 'Tomas', 'Zara')
+SURNAMES = ('Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Haddad', 'Silva', 'Kowalski', 'Tanaka', 'Brown',
+            'Nguyen', 'Müller', 'Rossi', 'Ivanova', 'Mensah', 'Khan', 'Dubois', 'Larsen', 'Moreau', 'Park',
+            'Lee', 'Walker', 'Hughes', 'Fischer', 'Costa', 'Sato', 'Adeyemi', 'Petrov', 'Andersen', 'Cruz')
+TITLE_PATTERNS = ('The {adj} {noun}', '{noun} of {noun2}', 'A {noun} in {place}', 'The {noun} and the {noun2}',
+                  '{adj} {noun}s', 'The Last {noun} of {place}', '{noun}', 'When the {noun} Falls')
+
+def _zipf_weights(count: int, exponent: float = 1.0) -> List[float]:
+    """Cumulative Zipf weights for choosing among `count` ranked items."""
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+def isbn13(number: int, prefix: str = '978') -> str:
+    """Valid ISBN-13 for a 9-digit number under the given EAN prefix."""
+    digits = f'{prefix}{number:09d}'
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+def is_valid_isbn13(isbn: str) -> bool:
+    """True if isbn is 13 digits with a correct check digit."""
+    if len(isbn) != 13 or not isbn.isdigit():
+        return False
+    return sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(isbn)) % 10 == 0
+
+def generate_books(count: int, rng: random.Random) -> Iterator[Tuple[str, str, str, int]]:
+    """Yield (title, author, isbn, total_copies) for `count` books with unique ISBNs."""
+    adjective_weights = _zipf_weights(len(ADJECTIVES))
+    noun_weights = _zipf_weights(len(NOUNS))
+    first_weights = _zipf_weights(len(FIRST_NAMES), 0.7)
+    surname_weights = _zipf_weights(len(SURNAMES), 0.9)
+    pattern_weights = _zipf_weights(len(TITLE_PATTERNS), 0.5)
+    # A fixed multiplier coprime to 10**9 spreads sequential numbers over the ISBN range
+    offset = rng.randrange(10 ** 9)
+
+    for index in range(count):
+        pattern = rng.choices(TITLE_PATTERNS, cum_weights=pattern_weights)[0]
+        noun, noun2 = rng.choices(NOUNS, cum_weights=noun_weights, k=2)
+        title = pattern.format(adj=rng.choices(ADJECTIVES, cum_weights=adjective_weights)[0],
+                               noun=noun, noun2=noun2, place=rng.choice(PLACES))
+        if rng.random() < 0.3:
+            title += f': Book {rng.randint(2, 9)}'
+        author = (f'{rng.choices(FIRST_NAMES, cum_weights=first_weights)[0]} '
+                  f'{rng.choices(SURNAMES, cum_weights=surname_weights)[0]}')
+        isbn = isbn13((index * 7919 + offset) % 10 ** 9)
+        # Most books have one to three copies, a few popular ones have many
+        total_copies = min(10, 1 + int(rng.expovariate(0.8)))
+        yield title, author, isbn, total_copies
+
+def generate_patrons(count: int, rng: random.Random) -> List[str]:
+    """`count` distinct, shuffled 6-digit patron IDs."""
+    if count > 900000:
+        raise ValueError("At most 900000 distinct 6-digit patron IDs exist.")
+    return [f'{number:06d}' for number in rng.sample(range(100000, 1000000), count)]
+
+def patron_seed(seed: int) -> str:
+    """Seed of the patron ID stream, independent of the number of books generated."""
+    return f'{seed}:patrons'
+
+def generate_loans(copies: Sequence[int], patrons: Sequence[str], count: int, open_ratio: float,
+                   overdue_ratio: float, history_days: int, rng: random.Random,
+                   now: datetime) -> Tuple[List[Tuple], List[int]]:
+    """
+    Build `count` borrow records for books 1..len(copies).
+
+    Returns the records as (patron_id, book_id, borrow_date, due_date,
+    return_date) tuples and the number of open loans per book (index 0 unused).
+    Popular books and heavy readers are chosen more often (Zipf weights).
+    """
+    book_weights = _zipf_weights(len(copies), 0.8)
+    patron_weights = _zipf_weights(len(patrons), 0.6)
+    book_ids = range(1, len(copies) + 1)
+    random_float = rng.random
+    # Dates have minute resolution and are assembled from precomputed day and clock strings
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=history_days + 60)
+    base = int((now - start).total_seconds()) // 60
+    days = [(start + timedelta(days=day)).strftime('%Y-%m-%dT') for day in range(history_days + LOAN_DAYS + 62)]
+    clock = [f'{minute // 60:02d}:{minute % 60:02d}:00' for minute in range(MINUTES_PER_DAY)]
+
+    def date_at(minutes_ago: int) -> str:
+        day, minute = divmod(base - minutes_ago, MINUTES_PER_DAY)
+        return days[day] + clock[minute]
+
+    loan_minutes = LOAN_DAYS * MINUTES_PER_DAY
+    open_per_book = [0] * (len(copies) + 1)
+    open_per_patron = {}
+    open_pairs = set()
+    records = []
+
+    # Open loans: draw candidates in batches and skip those that would break a rule
+    target_open = int(count * open_ratio)
+    for _ in range(20):
+        missing = target_open - len(records)
+        if missing <= 0:
+            break
+        candidates = zip(rng.choices(book_ids, cum_weights=book_weights, k=missing * 2),
+                         rng.choices(patrons, cum_weights=patron_weights, k=missing * 2))
+        for book_id, patron_id in candidates:
+            if len(records) == target_open:
+                break
+            if (open_per_book[book_id] >= copies[book_id - 1]
+                    or open_per_patron.get(patron_id, 0) >= MAX_BORROWED_BOOKS
+                    or (patron_id, book_id) in open_pairs):
+                continue
+            if random_float() < overdue_ratio:
+                borrowed = loan_minutes + 1 + int(random_float() * 45 * MINUTES_PER_DAY)
+            else:
+                borrowed = int(random_float() * (loan_minutes - 1))
+            records.append((patron_id, book_id, date_at(borrowed), date_at(borrowed - loan_minutes), None))
+            open_per_book[book_id] += 1
+            open_per_patron[patron_id] = open_per_patron.get(patron_id, 0) + 1
+            open_pairs.add((patron_id, book_id))
+
+    # Returned loans: kept between one day and ten days past the due date
+    returned = count - len(records)
+    history_minutes = history_days * MINUTES_PER_DAY
+    for book_id, patron_id in zip(rng.choices(book_ids, cum_weights=book_weights, k=returned),
+                                  rng.choices(patrons, cum_weights=patron_weights, k=returned)):
+        borrowed = MINUTES_PER_DAY + int(random_float() * history_minutes)
+        kept = min(borrowed, MINUTES_PER_DAY + int(random_float() * (loan_minutes + 9 * MINUTES_PER_DAY)))
+        records.append((patron_id, book_id, date_at(borrowed), date_at(borrowed - loan_minutes),
+                        date_at(borrowed - kept)))
+
+    return records, open_per_book
+
+def generate_library(path: Optional[str] = None, books: int = 1000, patrons: int = 200, loans: int = 5000,
+                     open_ratio: float = 0.1, overdue_ratio: float = 0.3, history_days: int = 365,
+                     seed: int = 0, now: Optional[datetime] = None) -> Dict:
+    """
+    Create (or extend) a database at `path` (default: database.DATABASE) with
+    synthetic books, patrons and loans. The books are bulk inserted in one
+    transaction (through database.insert_books, which stamps the catalog
+    version) and the loans in a second one, so a failure while inserting the
+    loans leaves the books in place.
+
+    Args:
+        books: number of books
+        patrons: number of distinct patrons
+        loans: total borrow records, open and returned
+        open_ratio: share of the loans that are still open
+        overdue_ratio: share of the open loans that are past their due date
+        history_days: how far back returned loans go
+        seed: random seed; the same arguments always produce the same data
+        now: reference time for loan dates (default: current time)
+
+    Returns:
+        dict: summary with the patron IDs and counts of what was inserted
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    path = path or database.DATABASE
+    started = time.perf_counter()
+
+    previous, database.DATABASE = database.DATABASE, path
+    try:
+        database.init_database()
+    finally:
+        database.DATABASE = previous
+
+    book_rows = list(generate_books(books, rng))
+    patron_ids = generate_patrons(patrons, random.Random(patron_seed(seed)))
+
+    records, open_per_book = generate_loans([row[3] for row in book_rows], patron_ids, loans,
+                                            open_ratio, overdue_ratio, history_days, rng, now)
+
+    book_ids = database.insert_books(
+        [(title, author, isbn, copies, copies - open_per_book[index + 1])
+         for index, (title, author, isbn, copies) in enumerate(book_rows)], path)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executemany(
+        'INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) VALUES (?, ?, ?, ?, ?)',
+        ((patron_id, book_ids[book_id - 1], borrow_date, due_date, return_date)
+         for patron_id, book_id, borrow_date, due_date, return_date in records))
+    conn.commit()
+    conn.close()
+
+    open_loans = sum(open_per_book)
+    return {
+        'path': path,
+        'books': books,
+        'first_book_id': book_ids[0] if book_ids else None,
+        'patrons': patron_ids,
+        'loans': len(records),
+        'open_loans': open_loans,
+        'overdue_loans': sum(1 for record in records
+                             if record[4] is None and record[3] < now.isoformat()),
+        'seconds': time.perf_counter() - started,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', default='library.db', help='database file to create or extend')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--patrons', type=int, default=2000)
+    parser.add_argument('--loans', type=int, default=50000)
+    parser.add_argument('--open-ratio', type=float, default=0.1, help='share of loans still open')
+    parser.add_argument('--overdue-ratio', type=float, default=0.3, help='share of open loans that are overdue')
+    parser.add_argument('--history-days', type=int, default=365, help='age of the oldest returned loans')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate_library(args.output, args.books, args.patrons, args.loans, args.open_ratio,
+                               args.overdue_ratio, args.history_days, args.seed)
+    print(f"Wrote {summary['books']} books, {len(summary['patrons'])} patrons and {summary['loans']} loans "
+          f"({summary['open_loans']} open, {summary['overdue_loans']} overdue) to {summary['path']} "
+          f"in {summary['seconds']:.1f}s")
+
+if __name__ == '__main__':
+    main()
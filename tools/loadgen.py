@@ -0,0 +1,275 @@
+"""
+Load Generator - mixed desk and kiosk workload with per-endpoint latency percentiles
+
+Simulated users pick actions from a weighted mix (catalog views, searches,
+borrows, returns and fee lookups) and send them back to back. Requests go
+either to an in-process app built on a synthetic database, or to a running
+server over HTTP. Throughput and p50/p95/p99 latency are reported per
+endpoint for every interval and per stage, so stepping up the number of
+users shows where the instance saturates.
+
+    python -m tools.loadgen --users 1 4 16 64 --duration 20
+    python -m tools.loadgen --url http://127.0.0.1:5000 --books 100000 --mix catalog=1,search=5,borrow=2,return=2,fees=1
+
+Against a server, --books and --seed must match the database it serves
+(e.g. one built by tools.datagen) so that book IDs and patrons exist.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from tools.datagen import NOUNS, SURNAMES, generate_library, generate_patrons, patron_seed
+
+# Default share of each action, by relative weight
+DEFAULT_MIX = {'catalog': 2, 'search': 5, 'borrow': 2, 'return': 2, 'fees': 2}
+
+# A request: (method, path, JSON body or None)
+Request = Tuple[str, str, Optional[Dict]]
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values (nan when empty)."""
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict:
+    """Throughput and latency percentiles (in milliseconds) for one endpoint."""
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': len(ordered) / seconds if seconds else 0.0,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': ordered[-1] * 1000 if ordered else float('nan'),
+    }
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse 'catalog=2,search=5' into weights; unknown actions are rejected."""
+    mix = {}
+    for part in filter(None, text.split(',')):
+        name, _, weight = part.partition('=')
+        if name not in ACTIONS:
+            raise ValueError(f"Unknown action '{name}'; choose from {', '.join(ACTIONS)}.")
+        mix[name] = float(weight or 1)
+    return mix
+
+class VirtualUser:
+    """One desk or kiosk user: a patron ID and the books it currently holds."""
+
+    def __init__(self, patron_id: str, books: int, rng: random.Random):
+        self.patron_id = patron_id
+        self.books = books
+        self.rng = rng
+        self.holding = []
+
+    def catalog(self) -> Request:
+        return 'GET', '/catalog', None
+
+    def search(self) -> Request:
+        if self.rng.random() < 0.7:
+            term, search_type = self.rng.choice(NOUNS).lower(), 'title'
+        else:
+            term, search_type = self.rng.choice(SURNAMES), 'author'
+        return 'GET', f'/api/search?q={urllib.request.quote(term)}&type={search_type}', None
+
+    def borrow(self) -> Request:
+        book_id = self.rng.randint(1, self.books)
+        self.holding.append(book_id)
+        return 'POST', '/api/borrow', {'patron_id': self.patron_id, 'book_ids': [book_id]}
+
+    def return_(self) -> Request:
+        if self.holding:
+            book_id = self.holding.pop(self.rng.randrange(len(self.holding)))
+        else:
+            book_id = self.rng.randint(1, self.books)
+        return 'POST', '/api/return', {'patron_id': self.patron_id, 'book_ids': [book_id]}
+
+    def fees(self) -> Request:
+        book_id = self.rng.choice(self.holding) if self.holding else self.rng.randint(1, self.books)
+        return 'GET', f'/api/late_fee/{self.patron_id}/{book_id}', None
+
+# Action name -> VirtualUser method building its request
+ACTIONS = {
+    'catalog': VirtualUser.catalog,
+    'search': VirtualUser.search,
+    'borrow': VirtualUser.borrow,
+    'return': VirtualUser.return_,
+    'fees': VirtualUser.fees,
+}
+
+def in_process_sender(app) -> Callable[[], Callable[[Request], int]]:
+    """Factory of per-thread senders that call the app through its test client."""
+    def make_sender():
+        client = app.test_client()
+
+        def send(req: Request) -> int:
+            method, path, body = req
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            response.close()
+            return response.status_code
+        return send
+    return make_sender
+
+def http_sender(base_url: str, timeout: float = 30.0) -> Callable[[], Callable[[Request], int]]:
+    """Factory of senders that talk to a running server over HTTP."""
+    def make_sender():
+        def send(req: Request) -> int:
+            method, path, body = req
+            data = json.dumps(body).encode() if body is not None else None
+            request = urllib.request.Request(base_url + path, data=data, method=method,
+                                             headers={'Content-Type': 'application/json'} if data else {})
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                e.read()
+                return e.code
+        return send
+    return make_sender
+
+class Recorder:
+    """Latencies and errors per endpoint and per time interval."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def record(self, action: str, seconds: float, failed: bool) -> None:
+        bucket = int((time.perf_counter() - self.started) / self.interval)
+        with self._lock:
+            latencies, errors = self._buckets.setdefault((bucket, action), ([], [0]))
+            latencies.append(seconds)
+            if failed:
+                errors[0] += 1
+
+    def intervals(self) -> List[Dict]:
+        """Per-interval summaries, each with a per-endpoint breakdown."""
+        with self._lock:
+            buckets = dict(self._buckets)
+        report = []
+        for bucket in sorted({key[0] for key in buckets}):
+            endpoints = {action: summarize(latencies, errors[0], self.interval)
+                         for (index, action), (latencies, errors) in sorted(buckets.items()) if index == bucket}
+            report.append({'start': bucket * self.interval, 'endpoints': endpoints})
+        return report
+
+    def totals(self, seconds: float) -> Dict[str, Dict]:
+        """Whole-run summary per endpoint, plus an 'all' entry."""
+        merged = {}
+        with self._lock:
+            for (_, action), (latencies, errors) in self._buckets.items():
+                entry = merged.setdefault(action, ([], [0]))
+                entry[0].extend(latencies)
+                entry[1][0] += errors[0]
+        result = {action: summarize(latencies, errors[0], seconds)
+                  for action, (latencies, errors) in sorted(merged.items())}
+        result['all'] = summarize([x for latencies, _ in merged.values() for x in latencies],
+                                  sum(errors[0] for _, errors in merged.values()), seconds)
+        return result
+
+def run_stage(make_sender, users: int, duration: float, mix: Dict[str, float], patrons: Sequence[str],
+              books: int, seed: int, interval: float = 1.0) -> Dict:
+    """Drive the target with `users` concurrent users for `duration` seconds."""
+    recorder = Recorder(interval)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stop_at = time.perf_counter() + duration
+
+    def worker(index: int):
+        rng = random.Random(seed * 100003 + index)
+        user = VirtualUser(patrons[index % len(patrons)], books, rng)
+        send = make_sender()
+        while time.perf_counter() < stop_at:
+            action = rng.choices(names, weights)[0]
+            req = ACTIONS[action](user)
+            start = time.perf_counter()
+            try:
+                failed = send(req) >= 500
+            except Exception:
+                failed = True
+            recorder.record(action, time.perf_counter() - start, failed)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - recorder.started
+    return {'users': users, 'seconds': elapsed, 'totals': recorder.totals(elapsed),
+            'intervals': recorder.intervals()}
+
+def _print_stage(stage: Dict, interval: float) -> None:
+    print(f"--- {stage['users']} users, {stage['seconds']:.1f}s ---")
+    for entry in stage['intervals']:
+        done = sum(e['requests'] for e in entry['endpoints'].values())
+        worst = max(e['p95_ms'] for e in entry['endpoints'].values())
+        print(f"  t={entry['start']:6.1f}s  {done / interval:8.1f} req/s"
+              f"  worst p95 {worst:9.2f} ms")
+    print(f"  {'endpoint':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, total in stage['totals'].items():
+        print(f"  {name:<10} {total['rps']:>9.1f} {total['p50_ms']:>9.2f} {total['p95_ms']:>9.2f}"
+              f" {total['p99_ms']:>9.2f} {total['errors']:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', help='base URL of a running server (default: in-process app)')
+    parser.add_argument('--users', type=int, nargs='+', default=[8],
+                        help='concurrent users; several values run as successive stages')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per stage')
+    parser.add_argument('--interval', type=float, default=1.0, help='reporting interval in seconds')
+    parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+                        help='action weights, e.g. catalog=2,search=5,borrow=2,return=2,fees=2')
+    parser.add_argument('--books', type=int, default=10000, help='books in the (generated) catalog')
+    parser.add_argument('--patrons', type=int, default=2000, help='patrons in the (generated) database')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write all results as JSON to this file')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            # The patrons tools.datagen created for this seed
+            patrons = generate_patrons(args.patrons, random.Random(patron_seed(args.seed)))
+            make_sender = http_sender(args.url.rstrip('/'))
+        else:
+            import database
+            from app import create_app
+            path = os.path.join(workdir, 'library.db')
+            print(f'Generating {args.books} books ...')
+            patrons = generate_library(path, books=args.books, patrons=args.patrons,
+                                       loans=args.books * 2, seed=args.seed)['patrons']
+            database.DATABASE = path
+            make_sender = in_process_sender(create_app(fast_startup=True))
+
+        stages = []
+        for users in args.users:
+            stage = run_stage(make_sender, users, args.duration, mix, patrons, args.books,
+                              args.seed, args.interval)
+            _print_stage(stage, args.interval)
+            stages.append(stage)
+
+    if len(stages) > 1:
+        print(f"\n{'users':>6} {'req/s':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage in stages:
+            total = stage['totals']['all']
+            print(f"{stage['users']:>6} {total['rps']:>9.1f} {total['p95_ms']:>9.2f} {total['p99_ms']:>9.2f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'mix': mix, 'target': args.url or 'in-process', 'stages': stages}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
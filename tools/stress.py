@@ -0,0 +1,169 @@
+"""
+Stress Harness - concurrent borrows and returns against one database, then an invariant check
+
+Worker threads (optionally spread over several processes) hammer a small
+catalog with borrows and returns so that many of them contend for the same
+copies. Afterwards the database is checked for:
+
+- available_copies equal to total_copies minus the book's open loans and
+  the copies reserved for its hold queue
+- available_copies never below zero
+- no patron holding two open loans of the same book
+
+    python -m tools.stress --processes 4 --threads 8 --operations 500
+    python -m tools.stress --path batch --books 5 --copies 2
+
+--path single uses borrow_book_by_patron/return_book_by_patron, --path batch
+uses the transactional borrow_books_by_patron/return_books_by_patron.
+With --database the books are added to an existing database and only
+they are borrowed and returned.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+import database
+from services.library_service import (
+    borrow_book_by_patron, borrow_books_by_patron, return_book_by_patron, return_books_by_patron
+)
+from tools.datagen import generate_library
+
+def _single(operation: str, patron_id: str, book_id: int) -> bool:
+    if operation == 'borrow':
+        return borrow_book_by_patron(patron_id, book_id)[0]
+    return return_book_by_patron(patron_id, book_id)[0]
+
+def _batch(operation: str, patron_id: str, book_id: int) -> bool:
+    if operation == 'borrow':
+        return borrow_books_by_patron(patron_id, [book_id])[0]
+    return return_books_by_patron(patron_id, [book_id])[0]
+
+# Service call paths under test
+PATHS = {'single': _single, 'batch': _batch}
+
+def run_threads(path: str, threads: int, operations: int, books: int, patrons: List[str],
+                seed: int, call_path: str = 'single', first_book_id: int = 1) -> Counter:
+    """
+    Run `threads` threads doing `operations` random borrows/returns each
+    against the database at `path`, on the `books` books numbered from
+    `first_book_id`. Returns outcome counts: succeeded, rejected (the service
+    said no) and errors (exceptions).
+    """
+    database.DATABASE = path
+    call = PATHS[call_path]
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker(index: int):
+        rng = random.Random(seed * 7919 + index)
+        local = Counter()
+        for _ in range(operations):
+            operation = 'borrow' if rng.random() < 0.5 else 'return'
+            try:
+                ok = call(operation, rng.choice(patrons), rng.randint(first_book_id, first_book_id + books - 1))
+                local[f'{operation}_succeeded' if ok else f'{operation}_rejected'] += 1
+            except Exception as e:
+                local['errors'] += 1
+                local[f'error: {type(e).__name__}: {e}'] += 1
+        with lock:
+            outcomes.update(local)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return outcomes
+
+def _process_main(args: Tuple) -> Counter:
+    """Entry point of a worker process (top level so it can be pickled)."""
+    return run_threads(*args)
+
+def check_invariants(path: str) -> Dict[str, List[str]]:
+    """Inventory invariant violations in the database at `path`, by kind."""
+    conn = sqlite3.connect(path)
+    try:
+        mismatched = conn.execute('''
+            SELECT b.id, b.total_copies, b.available_copies, COUNT(r.id), b.reserved_copies
+            FROM books b LEFT JOIN borrow_records r ON r.book_id = b.id AND r.return_date IS NULL
+            GROUP BY b.id
+            HAVING b.available_copies != b.total_copies - COUNT(r.id) - b.reserved_copies
+        ''').fetchall()
+        negative = conn.execute('SELECT id, available_copies FROM books WHERE available_copies < 0').fetchall()
+        duplicates = conn.execute('''
+            SELECT patron_id, book_id, COUNT(*) FROM borrow_records
+            WHERE return_date IS NULL GROUP BY patron_id, book_id HAVING COUNT(*) > 1
+        ''').fetchall()
+    finally:
+        conn.close()
+    return {
+        'available_mismatch': [f'book {book_id}: {available} available, expected {total} - {loans} open loans'
+                               f' - {reserved} reserved'
+                               for book_id, total, available, loans, reserved in mismatched],
+        'negative_available': [f'book {book_id}: {available} available' for book_id, available in negative],
+        'duplicate_open_loans': [f'patron {patron_id} has {count} open loans of book {book_id}'
+                                 for patron_id, book_id, count in duplicates],
+    }
+
+def run(path: str, processes: int, threads: int, operations: int, books: int, patrons: List[str],
+        seed: int = 0, call_path: str = 'single', first_book_id: int = 1) -> Dict:
+    """
+    Run the whole workload (in this process if `processes` is 0) and check
+    the invariants. Returns outcomes, throughput and violations.
+    """
+    started = time.perf_counter()
+    if processes:
+        jobs = [(path, threads, operations, books, patrons, seed + i, call_path, first_book_id)
+                for i in range(processes)]
+        with multiprocessing.Pool(processes) as pool:
+            outcomes = sum(pool.map(_process_main, jobs), Counter())
+    else:
+        outcomes = run_threads(path, threads, operations, books, patrons, seed, call_path, first_book_id)
+    seconds = time.perf_counter() - started
+    total = max(processes, 1) * threads * operations
+    return {
+        'operations': total,
+        'seconds': seconds,
+        'ops_per_second': total / seconds if seconds else 0.0,
+        'outcomes': dict(outcomes),
+        'violations': check_invariants(path),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--processes', type=int, default=2, help='worker processes (0: threads in this process)')
+    parser.add_argument('--threads', type=int, default=8, help='threads per process')
+    parser.add_argument('--operations', type=int, default=250, help='borrows/returns per thread')
+    parser.add_argument('--books', type=int, default=10, help='books in the catalog; fewer means more contention')
+    parser.add_argument('--patrons', type=int, default=50)
+    parser.add_argument('--path', choices=sorted(PATHS), default='single', help='service functions to exercise')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', help='database file to add the books to (default: a fresh temporary one)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.database or os.path.join(workdir, 'library.db')
+        summary = generate_library(path, books=args.books, patrons=args.patrons, loans=0, seed=args.seed)
+        report = run(path, args.processes, args.threads, args.operations, args.books,
+                     summary['patrons'], args.seed, args.path, summary['first_book_id'])
+
+    print(f"{report['operations']} operations in {report['seconds']:.1f}s "
+          f"({report['ops_per_second']:.0f} ops/s) on the {args.path} path")
+    for outcome, count in sorted(report['outcomes'].items()):
+        print(f'  {outcome:<40} {count}')
+    found = sum(len(items) for items in report['violations'].values())
+    for kind, items in report['violations'].items():
+        print(f'{kind}: {len(items)}')
+        for item in items[:10]:
+            print(f'  {item}')
+    raise SystemExit(1 if found else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers.
+
+Serve with gunicorn using the settings in gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import create_app
+
+app = create_app()